@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import HouseModel, Lead, Promo, HouseImage
+from django.db.models import Q
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from .models import FaqEntry, GeminiUsage, HouseModel, Lead, LeadArchive, Promo, HouseImage, QueuedAlert, QueuedComment
+from . import pagination, routers, usage
 
 
 
@@ -27,8 +33,8 @@ class LeadAdmin(admin.ModelAdmin):
     # Filter sidebar (Helpful for Jeric to find HOT leads quickly)
     list_filter = ('status', 'current_step', 'financing_type', 'location_pref')
     
-    # Search by name or phone
-    search_fields = ('full_name', 'phone_number', 'psid')
+    # Search by name or phone (trigram-indexed on Postgres); PSIDs are matched exactly
+    search_fields = ('full_name', 'phone_number', '=psid')
     
     # Make status editable directly from the list view
     list_editable = ('status',)
@@ -36,8 +42,113 @@ class LeadAdmin(admin.ModelAdmin):
     # SYSTEM PROTECTION: Prevent Jeric from breaking the bot's state tracking
     readonly_fields = ('psid', 'created_at', 'updated_at', 'last_alert_sent', 'followed_up')
 
+    # Big-table manners: one JOIN for the house column, no exact COUNT(*) on every page
+    list_select_related = ('interested_house',)
+    paginator = pagination.EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/bot_engine/lead/change_list.html'
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Prefix match on the normalized, indexed columns first ('juan dela', '0917 123');
+        only when that finds nothing fall back to the substring search ('dela').
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if pagination.looks_like_phone(term):
+            match = pagination.prefix_filter('search_phone', pagination.normalize_phone(term))
+        else:
+            name = pagination.normalize_name(term)
+            match = pagination.prefix_filter('search_name', name) if name else Q(pk__in=[])
+        results = queryset.filter(match | Q(psid=term))
+        if results.exists():
+            return results, False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_urls(self):
+        hot = path('hot/', self.admin_site.admin_view(self.hot_leads_view), name='bot_engine_lead_hot')
+        return [hot] + super().get_urls()
+
+    def hot_leads_view(self, request):
+        """HOT leads, most recently active first, paged by keyset (?after=<cursor>) instead of OFFSET."""
+        if not self.has_view_permission(request):
+            raise Http404
+        try:
+            with routers.reading_replica():
+                rows, next_cursor = pagination.keyset_page(
+                    Lead.objects.filter(status='HOT').select_related('interested_house'),
+                    request.GET.get('after'),
+                )
+        except ValueError:
+            raise Http404("Bad cursor")
+        return TemplateResponse(request, 'admin/bot_engine/lead/hot_leads.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "HOT leads",
+            'leads': rows,
+            'next_cursor': next_cursor,
+            'is_first_page': not request.GET.get('after'),
+        })
+
+@admin.register(LeadArchive)
+class LeadArchiveAdmin(admin.ModelAdmin):
+    # Batches moved out by `manage.py archive_leads`; the leads themselves are in `data` (see retention.decode)
+    list_display = ('created_at', 'lead_count', 'first_lead_id', 'last_lead_id', 'raw_bytes')
+    exclude = ('data',)
+    readonly_fields = ('created_at', 'lead_count', 'first_lead_id', 'last_lead_id', 'raw_bytes')
+
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(Promo)
 class PromoAdmin(admin.ModelAdmin):
-    list_display = ('name', 'discount_amount', 'start_date', 'end_date', 'is_active')
+    list_display = ('name', 'discount_amount', 'start_date', 'end_date', 'priority', 'stackable', 'is_active')
     filter_horizontal = ('applicable_houses',) # Makes selecting houses easier
-    list_filter = ('is_active',)
\ No newline at end of file
+    list_filter = ('is_active',)
+
+@admin.register(FaqEntry)
+class FaqEntryAdmin(admin.ModelAdmin):
+    # What the bot knows besides the house data; edits are picked up on the next question
+    list_display = ('question', 'keywords', 'answer_directly', 'is_active', 'updated_at')
+    list_editable = ('answer_directly', 'is_active')
+    search_fields = ('question', 'keywords', 'answer')
+    list_filter = ('is_active', 'answer_directly')
+
+@admin.register(QueuedAlert)
+class QueuedAlertAdmin(admin.ModelAdmin):
+    # Telegram alerts waiting for Telegram to come back
+    list_display = ('created_at', 'attempts', 'sent_at', 'message')
+    list_filter = ('sent_at',)
+    readonly_fields = ('message', 'created_at', 'attempts', 'sent_at')
+
+@admin.register(QueuedComment)
+class QueuedCommentAdmin(admin.ModelAdmin):
+    # Page comments waiting for (or done with) their private reply
+    list_display = ('created_at', 'commenter_name', 'message', 'attempts', 'replied_at', 'last_error')
+    list_filter = ('replied_at',)
+    search_fields = ('commenter_name', 'comment_id', 'post_id')
+    readonly_fields = ('comment_id', 'post_id', 'commenter_id', 'commenter_name', 'message', 'created_at',
+                       'claimed_until', 'attempts', 'replied_at', 'last_error')
+
+@admin.register(GeminiUsage)
+class GeminiUsageAdmin(admin.ModelAdmin):
+    # Gemini spend per lead per day; the totals above the list follow the filters/search
+    list_display = ('day', 'psid', 'calls', 'input_tokens', 'output_tokens', 'cost', 'budget_hits')
+    list_filter = ('day',)
+    search_fields = ('psid',)
+    date_hierarchy = 'day'
+    ordering = ('-day', '-cost')
+    readonly_fields = ('psid', 'day', 'calls', 'input_tokens', 'output_tokens', 'latency_ms', 'cost', 'budget_hits')
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None:
+            response.context_data['usage_totals'] = usage.totals(changelist.queryset)
+            response.context_data['usage_today'] = usage.totals(GeminiUsage.objects.filter(day=timezone.localdate()))
+            response.context_data['budgets'] = {'lead': usage.LEAD_DAILY_TOKENS, 'daily': usage.DAILY_TOKENS}
+        return response
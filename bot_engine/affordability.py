@@ -0,0 +1,102 @@
+"""
+"Which models can I afford?" answered from precomputed tables.
+
+For every active house x financing type x term we compute the net TCP, the
+monthly DP and the monthly amortization once (same formulas as the
+computation cards) and keep each (financing, term) table sorted by monthly
+amortization. A monthly budget is then a bisect into a sorted list:
+
+    table = affordability.get_tables()[('PAGIBIG', 30)]
+    rows = table.affordable(25_000)   # best model that fits first
+
+Price-range questions use the by-price ordering of the same rows.
+
+The tables hang off the catalog index (catalog.get_index()), so they are
+rebuilt exactly when it is: any house/promo edit (prices, rates, discounts)
+or a new day.
+"""
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from decimal import Decimal
+
+from . import catalog
+from .financing import house_bank_quote, house_cash_quote, house_pagibig_quote, to_decimal
+
+
+# Terms (years) offered per financing type, as on the computation cards
+TERMS = {
+    'BANK': (5, 10, 15),
+    'PAGIBIG': (10, 20, 30),
+    'CASH': (0,),
+}
+# Term used when a lead only tells us a monthly budget: the longest (cheapest monthly)
+DEFAULT_TERMS = {'BANK': 15, 'PAGIBIG': 30}
+
+Row = namedtuple('Row', 'house_id net_tcp total_dp monthly_dp loan_amount monthly')
+
+
+class AffordabilityTable:
+    """Rows for one (financing, term), sorted by monthly and by net TCP."""
+
+    def __init__(self, rows):
+        self.by_monthly = sorted(rows, key=lambda row: (row.monthly, row.house_id))
+        self.monthlies = [row.monthly for row in self.by_monthly]
+        self.by_price = sorted(rows, key=lambda row: (row.net_tcp, row.house_id))
+        self.prices = [row.net_tcp for row in self.by_price]
+
+    def affordable(self, max_monthly, limit=None):
+        """Rows with monthly <= max_monthly, priciest first (the most house for the money)."""
+        cut = bisect_right(self.monthlies, max_monthly)
+        ranked = self.by_monthly[cut - 1::-1] if cut else []
+        return ranked[:limit] if limit else ranked
+
+    def in_price_range(self, low=0, high=None):
+        """Rows with low <= net TCP < high, cheapest first."""
+        start = bisect_left(self.prices, low)
+        end = bisect_left(self.prices, high) if high is not None else len(self.prices)
+        return self.by_price[start:end]
+
+    def cheapest(self):
+        return self.by_monthly[0] if self.by_monthly else None
+
+
+def house_rows(house, discount):
+    """(financing, term) -> Row for one house."""
+    rows = {}
+    for financing, quote_for in (('BANK', house_bank_quote), ('PAGIBIG', house_pagibig_quote)):
+        for years in TERMS[financing]:
+            quote = quote_for(house, discount, years)
+            rows[(financing, years)] = Row(house.id, quote.net_tcp, quote.total_dp, quote.monthly_dp,
+                                           quote.loan_amount, quote.monthly)
+    # Cash has no monthly: the 'monthly' column holds the cash price so the same bisect works
+    cash = house_cash_quote(house, discount)
+    rows[('CASH', 0)] = Row(house.id, cash.net_tcp, cash.cash_price, Decimal(0), Decimal(0), cash.cash_price)
+    return rows
+
+
+def build_tables(index):
+    grouped = {}
+    for house_id, house in index.houses.items():
+        for key, row in house_rows(house, index.discounts[house_id]).items():
+            grouped.setdefault(key, []).append(row)
+    return {
+        (financing, years): AffordabilityTable(grouped.get((financing, years), []))
+        for financing, terms in TERMS.items() for years in terms
+    }
+
+
+_tables = None   # (CatalogIndex, tables)
+
+
+def get_tables():
+    global _tables
+    index = catalog.get_index()
+    if _tables is None or _tables[0] is not index:
+        _tables = (index, build_tables(index))
+    return _tables[1]
+
+
+def recommend(max_monthly, financing='BANK', years=None, limit=catalog.PAGE_SIZE):
+    """Ranked rows a lead can afford at max_monthly pesos/month."""
+    years = years or DEFAULT_TERMS.get(financing, 0)
+    return get_tables()[(financing, years)].affordable(to_decimal(max_monthly), limit)
@@ -0,0 +1,69 @@
+"""
+Telegram alerts to Jeric (hot leads, agent requests).
+
+If Telegram is down an alert is queued as a QueuedAlert instead of lost, and
+flushed the next time a send works (or by `manage.py send_queued_alerts`).
+"""
+import logging
+
+import requests
+from decouple import config
+from django.utils import timezone
+
+from . import outbound
+from .models import QueuedAlert
+
+
+logger = logging.getLogger(__name__)
+
+
+def deliver_telegram_alert(message_text):
+    """Sends one alert to Jeric's Telegram. Returns True if Telegram accepted it."""
+    bot_token = config('TELEGRAM_BOT_TOKEN')
+    chat_id = config('TELEGRAM_CHAT_ID')
+    url = f"{outbound.TELEGRAM_API_URL}/bot{bot_token}/sendMessage"
+    payload = {
+        "chat_id": chat_id,
+        "text": message_text,
+        "parse_mode": "Markdown"
+    }
+    
+    try:
+        response = outbound.post('telegram', url, json=payload)
+        
+        # PROPER LOGGING LOGIC
+        if response.status_code == 200:
+            logger.info(f"Telegram alert sent successfully to chat_id {chat_id}.")
+            return True
+        logger.error(f"Telegram API Failed. Status: {response.status_code} | Response: {response.text}")
+            
+    except outbound.CircuitOpenError:
+        logger.warning("Telegram circuit is open, skipping the call.")
+    except requests.exceptions.RequestException as e:
+        # Catches network-level failures (e.g., your server loses internet connection)
+        logger.error(f"Failed to connect to Telegram API: {e}", exc_info=True)
+    return False
+
+def send_telegram_alert(message_text):
+    """Alerts Jeric. If Telegram is down the alert is queued instead of lost."""
+    if not deliver_telegram_alert(message_text):
+        QueuedAlert.objects.create(message=message_text, attempts=1)
+        logger.warning("Telegram alert queued for retry.")
+        return
+
+    # Telegram is back: catch up on anything that was queued while it was down
+    if QueuedAlert.objects.filter(sent_at__isnull=True).exists():
+        send_queued_alerts(limit=10)
+
+def send_queued_alerts(limit=50):
+    """Retries queued alerts oldest first. Stops at the first failure. Returns how many were sent."""
+    sent = 0
+    for alert in QueuedAlert.objects.filter(sent_at__isnull=True).order_by('created_at')[:limit]:
+        if not deliver_telegram_alert(alert.message):
+            QueuedAlert.objects.filter(pk=alert.pk).update(attempts=alert.attempts + 1)
+            break
+        alert.sent_at = timezone.now()
+        alert.attempts += 1
+        alert.save(update_fields=['sent_at', 'attempts'])
+        sent += 1
+    return sent
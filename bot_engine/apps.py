@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class BotEngineConfig(AppConfig):
     name = 'bot_engine'
+
+    def ready(self):
+        # Cache invalidation when Jeric edits houses/promos in the admin
+        from . import signals  # noqa: F401
@@ -0,0 +1,674 @@
+"""
+Webhook load-test harness.
+
+- EventFactory builds realistic, signed Messenger webhook bodies
+  (text, quick replies, postbacks, comments and batched entries).
+- MetaStub is a local HTTP server standing in for Graph, Telegram and Gemini
+  with configurable latency per service.
+- run_benchmark() pushes events through the real webhook view and reports
+  p50/p95/p99 latency, throughput and DB queries per event for each route.
+
+- run_replay() does the same with real traffic captured by capture.py,
+  at the original or an accelerated pace.
+
+Run it with `python manage.py bench_webhook` or `replay_webhook <captures>`
+(results are saved as JSON).
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from decimal import Decimal
+
+
+BENCH_PAGE_ID = '100000000000001'
+BENCH_APP_SECRET = 'bench-app-secret'
+WEBHOOK_PATH = '/messenger/webhook/'
+
+# Everything the bot reads through decouple, so a bare checkout can run the bench
+BENCH_ENV = {
+    'META_APP_SECRET': BENCH_APP_SECRET,
+    'FB_PAGE_ACCESS_TOKEN': 'bench-page-token',
+    'FB_PAGE_ID': BENCH_PAGE_ID,
+    'FB_VERIFY_TOKEN': 'bench-verify-token',
+    'TELEGRAM_BOT_TOKEN': 'bench-telegram-token',
+    'TELEGRAM_CHAT_ID': '1',
+    'GEMINI_API_KEY': 'bench-gemini-key',
+}
+
+
+def sign_payload(raw_body, app_secret=BENCH_APP_SECRET):
+    """Returns the X-Hub-Signature-256 header Meta would send for raw_body."""
+    digest = hmac.new(app_secret.encode('utf-8'), raw_body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+# --- PAYLOAD GENERATOR ---
+
+class EventFactory:
+    """Builds Messenger webhook bodies shaped like the ones Meta sends."""
+
+    def __init__(self, house_ids, psid_pool=200, seed=0):
+        self.house_ids = list(house_ids)
+        self.psids = [f"9{n:015d}" for n in range(psid_pool)]
+        self.rng = random.Random(seed)
+        self._seq = 0
+
+    def _mid(self):
+        self._seq += 1
+        return f"m_bench{self._seq:012d}"
+
+    def _now(self):
+        return int(time.time() * 1000)
+
+    def psid(self):
+        return self.rng.choice(self.psids)
+
+    def fresh_psid(self):
+        self._seq += 1
+        return f"8{self._seq:015d}"
+
+    def messaging(self, psid, **event):
+        return {
+            "sender": {"id": psid},
+            "recipient": {"id": BENCH_PAGE_ID},
+            "timestamp": self._now(),
+            **event,
+        }
+
+    def text(self, psid, text):
+        return self.messaging(psid, message={"mid": self._mid(), "text": text})
+
+    def quick_reply(self, psid, title, payload):
+        return self.messaging(psid, message={"mid": self._mid(), "text": title, "quick_reply": {"payload": payload}})
+
+    def postback(self, psid, title, payload):
+        return self.messaging(psid, postback={"mid": self._mid(), "title": title, "payload": payload})
+
+    def attachment(self, psid):
+        return self.messaging(psid, message={"mid": self._mid(), "attachments": [
+            {"type": "image", "payload": {"url": "https://example.com/photo.jpg"}}
+        ]})
+
+    def comment(self, user_id, message, post_id=None):
+        post_id = post_id or f"{BENCH_PAGE_ID}_{self.rng.randint(1, 20)}"
+        return {
+            "field": "feed",
+            "value": {
+                "from": {"id": user_id, "name": "Bench Commenter"},
+                "item": "comment",
+                "verb": "add",
+                "post_id": post_id,
+                "comment_id": f"{post_id}_{self._mid()}",
+                "message": message,
+                "created_time": int(time.time()),
+            },
+        }
+
+    def body(self, messaging=(), changes=()):
+        """Wraps events in a single-entry page webhook body."""
+        entry = {"id": BENCH_PAGE_ID, "time": self._now()}
+        if messaging:
+            entry["messaging"] = list(messaging)
+        if changes:
+            entry["changes"] = list(changes)
+        return {"object": "page", "entry": [entry]}
+
+    def batch(self, entries):
+        """Several entries in one POST, which Meta does under load."""
+        return {"object": "page", "entry": [body["entry"][0] for body in entries]}
+
+    # --- SCENARIOS ---
+    # Each returns a list of (route_label, body) posted in order.
+
+    def house_id(self):
+        return self.rng.choice(self.house_ids)
+
+    def scenario_greeting(self):
+        return [("text:greeting", self.body([self.text(self.psid(), self.rng.choice(['hi', 'hello', 'start']))]))]
+
+    def scenario_house(self):
+        return [("text:house", self.body([self.text(self.psid(), "may house pa ba kayo?")]))]
+
+    def scenario_media(self):
+        return [("text:media", self.body([self.text(self.psid(), "pa send ng pics ng calista mid")]))]
+
+    def scenario_question(self):
+        question = self.rng.choice(["saan location nyo?", "ano requirements pag OFW?", "kailan turnover?"])
+        return [("text:gemini", self.body([self.text(self.psid(), question)]))]
+
+    def scenario_funnel(self):
+        psid = self.fresh_psid()
+        return [
+            ("postback:GET_STARTED", self.body([self.postback(psid, "Get Started", "GET_STARTED")])),
+            ("quick_reply:BUDGET", self.body([self.quick_reply(psid, "3M-4M", "BUDGET_3_4")])),
+            ("quick_reply:FIN", self.body([self.quick_reply(psid, "Pag-IBIG", "FIN_PAGIBIG")])),
+            ("quick_reply:TIME", self.body([self.quick_reply(psid, "1-3 Months", "TIME_1_3")])),
+        ]
+
+    def scenario_computation(self):
+        psid, house_id = self.psid(), self.house_id()
+        plan = self.rng.choice(['BANK', 'PAGIBIG'])
+        return [
+            ("postback:COMPUTE", self.body([self.postback(psid, "Computation 📊", f"COMPUTE_{house_id}")])),
+            (f"quick_reply:CALC_{plan}", self.body([self.quick_reply(psid, plan, f"CALC_{plan}_{house_id}")])),
+        ]
+
+    def scenario_view_models(self):
+        return [("postback:VIEW_MODELS", self.body([self.postback(self.psid(), "View House Models 🏠", "VIEW_MODELS")]))]
+
+    def scenario_handover(self):
+        psid, house_id = self.fresh_psid(), self.house_id()
+        return [
+            ("postback:RESERVE", self.body([self.postback(psid, "Reserve Now 📝", f"RESERVE_{house_id}")])),
+            ("text:phone", self.body([self.text(psid, "09171234567")])),
+        ]
+
+    def scenario_attachment(self):
+        return [("message:attachment", self.body([self.attachment(self.psid())]))]
+
+    def scenario_comment(self):
+        message = self.rng.choice(["hm po", "how much?", "interested", "ganda!"])
+        return [("comment", self.body(changes=[self.comment(f"7{self.rng.randint(0, 10**14):015d}", message)]))]
+
+    def scenario_batch(self):
+        entries = [self.body([self.text(self.psid(), "hi")]) for _ in range(3)]
+        entries.append(self.body(changes=[self.comment(f"7{self.rng.randint(0, 10**14):015d}", "hm")]))
+        return [("batch", self.batch(entries))]
+
+    def stream(self, count, weights=None):
+        """Yields (label, body) pairs until `count` webhook POSTs have been produced."""
+        weights = weights or DEFAULT_MIX
+        names = list(weights)
+        produced = 0
+        while produced < count:
+            name = self.rng.choices(names, weights=[weights[n] for n in names])[0]
+            for label, body in getattr(self, f"scenario_{name}")():
+                if produced >= count:
+                    return
+                produced += 1
+                yield label, body
+
+
+# Rough shape of real traffic: lots of typed questions, a steady funnel, some comments
+DEFAULT_MIX = {
+    'greeting': 10,
+    'house': 8,
+    'media': 6,
+    'question': 15,
+    'funnel': 10,
+    'computation': 12,
+    'view_models': 6,
+    'handover': 3,
+    'attachment': 4,
+    'comment': 8,
+    'batch': 3,
+}
+
+
+# --- LOCAL META / TELEGRAM / GEMINI STUB ---
+
+class MetaStub:
+    """
+    Tiny threaded HTTP server that answers like Graph, Telegram and Gemini.
+    latency is in seconds per service, e.g. {'graph': 0.05, 'gemini': 0.8}.
+    """
+
+    def __init__(self, latency=None, host='127.0.0.1', port=0):
+        self.latency = {'graph': 0.0, 'telegram': 0.0, 'gemini': 0.0}
+        self.latency.update(latency or {})
+        self.calls = defaultdict(int)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @staticmethod
+    def service_for(path):
+        if path.startswith('/bot'):
+            return 'telegram'
+        if path.startswith('/v1beta') or path.startswith('/v1/'):
+            return 'gemini'
+        return 'graph'
+
+    @staticmethod
+    def response_for(service, method, path):
+        if service == 'telegram':
+            return {"ok": True, "result": {"message_id": 1}}
+        if service == 'gemini':
+            return {
+                "candidates": [{
+                    "content": {"role": "model", "parts": [{"text": "Stub reply po. Gusto mo bang kausapin si Jeric?"}]},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }],
+                "usageMetadata": {"promptTokenCount": 420, "candidatesTokenCount": 24, "totalTokenCount": 444},
+            }
+        if method == 'GET':
+            return {"first_name": "Bench", "last_name": "User", "id": path.strip('/').split('?')[0]}
+        return {"recipient_id": "stub", "message_id": "m_stub"}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out as two writes; on a keep-alive connection Nagle
+            # would hold the body back for the client's delayed ACK (~40ms a call)
+            disable_nagle_algorithm = True
+
+            def _reply(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                service = stub.service_for(self.path)
+                with stub._lock:
+                    stub.calls[service] += 1
+                delay = stub.latency.get(service, 0)
+                if delay:
+                    time.sleep(delay)
+                body = json.dumps(stub.response_for(service, method, self.path)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply('GET')
+
+            def do_POST(self):
+                self._reply('POST')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def point_bot_at(stub_url):
+    """Sends every outbound Graph/Telegram/Gemini call to stub_url."""
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ['GRAPH_API_URL'] = stub_url
+    os.environ['TELEGRAM_API_URL'] = stub_url
+    os.environ['GEMINI_API_ENDPOINT'] = stub_url
+
+    from . import clients, outbound
+
+    outbound.GRAPH_API_URL = stub_url
+    outbound.TELEGRAM_API_URL = stub_url
+    # Rebuilt on next use, reading the endpoints above
+    clients.reset()
+
+
+def seed_catalog():
+    """Makes sure there is something to show in the carousel. Returns the active house ids."""
+    from .models import HouseImage, HouseModel
+
+    if not HouseModel.objects.filter(is_active=True).exists():
+        specs = [
+            ('Calista Mid', 'Magalang', '2450000'), ('Calista End', 'Magalang', '2890000'),
+            ('Calista Pair', 'Tanza', '4100000'), ('Unna Regular', 'GenTri', '3650000'),
+        ]
+        for name, location, tcp in specs:
+            house = HouseModel.objects.create(
+                name=name, description=f"{name} unit", location=location,
+                image_url='https://example.com/house.jpg', details_link='https://example.com/details',
+                total_contract_price=Decimal(tcp), dressed_gallery_link='https://example.com/gallery',
+            )
+            for n in range(3):
+                HouseImage.objects.create(house=house, category='DRESSED', image_url=f'https://example.com/{house.id}/{n}.jpg')
+    return list(HouseModel.objects.filter(is_active=True).values_list('id', flat=True))
+
+
+# --- RUNNER ---
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, queries, outbound=None):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    summary = {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(total / len(latencies) * 1000, 3) if latencies else 0.0,
+        'throughput_eps': round(len(latencies) / total, 2) if total else 0.0,
+        'queries_per_event': round(sum(queries) / len(queries), 2) if queries else 0.0,
+    }
+    if outbound is not None:
+        summary['outbound_per_event'] = round(sum(outbound) / len(outbound), 2) if outbound else 0.0
+    return summary
+
+
+def make_poster(url=None, secret=None):
+    """
+    post(body) -> status code. In-process through the test client by default,
+    or over HTTP to a running server at url.
+    """
+    secret = secret or os.environ['META_APP_SECRET']
+    if url:
+        import requests
+
+        session = requests.Session()
+
+        def post(body):
+            raw = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+            headers = {'Content-Type': 'application/json', 'X-Hub-Signature-256': sign_payload(raw, secret)}
+            return session.post(url, data=raw, headers=headers, timeout=30).status_code
+        return post
+
+    from django.db import close_old_connections
+    from django.test import Client
+
+    client = Client()
+
+    def post(body):
+        raw = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+        # The test client skips the connection housekeeping a real request does at start/end
+        close_old_connections()
+        try:
+            return client.post(WEBHOOK_PATH, raw, content_type='application/json',
+                               HTTP_X_HUB_SIGNATURE_256=sign_payload(raw, secret)).status_code
+        finally:
+            close_old_connections()
+    return post
+
+
+def measure(stream, post, stub=None):
+    """
+    Posts every (label, body) from stream and returns (overall, routes) stats.
+    DB numbers only mean something when post() runs in this process.
+    """
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+    from django.test.utils import CaptureQueriesContext
+
+    latencies = defaultdict(list)
+    queries = defaultdict(list)
+    outbound = defaultdict(list)
+    errors = defaultdict(int)
+    db = {'connects': 0, 'seconds': 0.0}
+
+    def count_connect(**kwargs):
+        db['connects'] += 1
+
+    def time_query(execute, sql, params, many, context):
+        t = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            db['seconds'] += time.perf_counter() - t
+
+    connection_created.connect(count_connect)
+    started = time.perf_counter()
+    try:
+        for label, body in stream:
+            calls_before = sum(stub.calls.values()) if stub else 0
+            with CaptureQueriesContext(connection) as ctx, connection.execute_wrapper(time_query):
+                t0 = time.perf_counter()
+                status = post(body)
+                elapsed = time.perf_counter() - t0
+            if status != 200:
+                errors[label] += 1
+            latencies[label].append(elapsed)
+            queries[label].append(len(ctx.captured_queries))
+            outbound[label].append(sum(stub.calls.values()) - calls_before if stub else 0)
+    finally:
+        connection_created.disconnect(count_connect)
+    wall = time.perf_counter() - started
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    all_queries = [v for values in queries.values() for v in values]
+    all_outbound = [v for values in outbound.values() for v in values]
+    overall = summarize(all_latencies, all_queries, all_outbound)
+    overall['wall_s'] = round(wall, 3)
+    overall['throughput_eps'] = round(len(all_latencies) / wall, 2) if wall else 0.0
+    overall['errors'] = sum(errors.values())
+    # Connection reuse: with per-request connections every event pays a connect
+    overall['connections_per_event'] = round(db['connects'] / len(all_latencies), 3) if all_latencies else 0.0
+    overall['db_ms_per_event'] = round(db['seconds'] * 1000 / len(all_latencies), 3) if all_latencies else 0.0
+
+    routes = {
+        label: dict(summarize(latencies[label], queries[label], outbound[label]), errors=errors[label])
+        for label in sorted(latencies)
+    }
+    return overall, routes
+
+
+def run_benchmark(events=500, latency=None, seed=0, psid_pool=200, mix=None, warmup=20):
+    """
+    Posts `events` signed webhook bodies through the real view and returns a report dict.
+    Expects an (empty or test) database; it seeds a few houses if there are none.
+    """
+    with MetaStub(latency=latency) as stub:
+        point_bot_at(stub.url)
+        factory = EventFactory(seed_catalog(), psid_pool=psid_pool, seed=seed)
+        post = make_poster()
+
+        for _, body in factory.stream(warmup, mix):
+            post(body)
+
+        overall, routes = measure(factory.stream(events, mix), post, stub)
+
+    return {
+        'config': {
+            'events': events, 'seed': seed, 'psid_pool': psid_pool, 'warmup': warmup,
+            'latency_ms': {k: round(v * 1000, 1) for k, v in stub.latency.items()},
+            'mix': mix or DEFAULT_MIX,
+        },
+        'overall': overall,
+        'routes': routes,
+    }
+
+
+# --- REPLAY OF CAPTURED TRAFFIC ---
+
+def paced(records, speed=1.0, limit=0, lag=None):
+    """
+    (label, raw body) for each captured record, sleeping so they go out with
+    the original gaps divided by speed (speed=0: as fast as possible).
+    lag, if given, collects how late each send was against the schedule.
+    """
+    from . import capture
+
+    first = started = None
+    for sent, record in enumerate(records):
+        if limit and sent >= limit:
+            return
+        raw = record['body'].encode('utf-8')
+        try:
+            label = capture.label(json.loads(raw))
+        except ValueError:
+            label = 'invalid'
+        if speed:
+            if first is None:
+                first, started = record['t'], time.monotonic()
+            due = started + (record['t'] - first) / speed
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            elif lag is not None:
+                lag.append(-wait)
+        yield label, raw
+
+
+def run_replay(records, speed=1.0, limit=0, latency=None, url=None, secret=None, stub_port=0):
+    """
+    Re-sends captured webhook bodies (see capture.py), re-signed with secret, and
+    returns a report shaped like run_benchmark's. In-process (against the current,
+    normally test, database) unless url points at a running server; that server
+    should have GRAPH_API_URL/TELEGRAM_API_URL/GEMINI_API_ENDPOINT aimed at the
+    stub this starts on stub_port.
+    """
+    lag = []
+    with MetaStub(latency=latency, port=stub_port) as stub:
+        if url:
+            for key, value in BENCH_ENV.items():
+                os.environ.setdefault(key, value)
+        else:
+            point_bot_at(stub.url)
+            seed_catalog()
+        post = make_poster(url, secret)
+        overall, routes = measure(paced(records, speed, limit, lag), post, stub)
+
+    overall['behind_schedule'] = len(lag)
+    overall['max_lag_ms'] = round(max(lag) * 1000, 1) if lag else 0.0
+    return {
+        'config': {
+            'speed': speed, 'limit': limit, 'target': url or 'in-process',
+            'latency_ms': {k: round(v * 1000, 1) for k, v in stub.latency.items()},
+        },
+        'overall': overall,
+        'routes': routes,
+    }
+
+
+def compare(baseline, current):
+    """Per-route deltas (current - baseline) for two saved reports."""
+    keys = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_eps', 'queries_per_event')
+    diff = {}
+    for label, stats in current['routes'].items():
+        old = baseline['routes'].get(label)
+        if old:
+            diff[label] = {key: round(stats[key] - old[key], 3) for key in keys}
+    diff['overall'] = {key: round(current['overall'][key] - baseline['overall'][key], 3) for key in keys}
+    return diff
+
+
+# --- FINANCING CALCULATOR ---
+
+def legacy_bank_quote(price, discount, dp_percent, rate, years, reservation_fee):
+    """The float math the computation cards used before financing.py, for comparison."""
+    net_tcp = float(price) - float(discount)
+    total_dp = net_tcp * float(dp_percent) / 100
+    monthly_dp = (total_dp - float(reservation_fee)) / 12
+    loan_amount = net_tcp * 0.90
+    monthly_rate = (float(rate) / 100) / 12
+    total_months = years * 12
+    monthly = loan_amount * (monthly_rate * (1 + monthly_rate)**total_months) / ((1 + monthly_rate)**total_months - 1)
+    return net_tcp, total_dp, monthly_dp, loan_amount, monthly
+
+
+def run_financing_benchmark(iterations=20000, houses=30, seed=0):
+    """
+    Times the old float path against financing.bank_quote() on a catalog-sized
+    pool of inputs, the way the webhook hits them (the same few houses over and
+    over). Reports microseconds per quote for float, cold Decimal and memoized Decimal.
+    """
+    from . import financing
+
+    rng = random.Random(seed)
+    pool = [
+        (Decimal(rng.randrange(1_800_000, 6_000_000, 1000)), Decimal(rng.choice([0, 50_000, 120_000])),
+         Decimal('10.00'), Decimal(rng.choice(['6.50', '7.00', '8.00'])), rng.choice([5, 10, 15]), Decimal('15000.00'))
+        for _ in range(houses)
+    ]
+    calls = [pool[rng.randrange(houses)] for _ in range(iterations)]
+
+    def timed(quote):
+        started = time.perf_counter()
+        for args in calls:
+            quote(*args)
+        return (time.perf_counter() - started) / iterations * 1_000_000
+
+    float_us = timed(legacy_bank_quote)
+    financing.clear()
+    started = time.perf_counter()
+    for args in pool:
+        financing.bank_quote(*args)
+    cold_us = (time.perf_counter() - started) / houses * 1_000_000
+    memo_us = timed(financing.bank_quote)
+
+    return {
+        'iterations': iterations,
+        'distinct_inputs': houses,
+        'float_us': round(float_us, 3),
+        'decimal_cold_us': round(cold_us, 3),
+        'decimal_memo_us': round(memo_us, 3),
+        'memo_vs_float': round(memo_us / float_us, 3),
+    }
+
+
+# --- DATABASE CONNECTION MODES ---
+
+# Env overrides per mode (see DB_CONNECTIONS in core/settings.py)
+DB_MODES = {
+    'per-request': {'DB_CONNECTIONS': 'per-request'},
+    'persistent': {'DB_CONNECTIONS': 'persistent'},
+    'pooler': {'DB_CONNECTIONS': 'pooler'},
+    'pool': {'DB_CONNECTIONS': 'pool'},
+    'sqlite-rollback-journal': {'DB_CONNECTIONS': 'persistent', 'DB_SQLITE_WAL': 'False'},
+    'sqlite-wal': {'DB_CONNECTIONS': 'persistent', 'DB_SQLITE_WAL': 'True'},
+}
+DEFAULT_DB_MODES = {
+    'postgresql': ('per-request', 'persistent', 'pool'),
+    'sqlite': ('per-request', 'sqlite-rollback-journal', 'sqlite-wal'),
+}
+
+
+def run_db_benchmark(modes, events=300, seed=0, workdir=None):
+    """
+    Runs bench_webhook once per connection mode, each in its own process (the
+    database settings are read at startup), and returns {mode: overall stats}.
+    SQLite runs use a file database so journal mode and reconnects actually matter.
+    """
+    import subprocess
+    import sys
+    import tempfile
+
+    from django.conf import settings
+    from django.db import connection
+
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for mode in modes:
+            output = os.path.join(tmp, f"{mode}.json")
+            env = dict(os.environ, **DB_MODES[mode])
+            if connection.vendor == 'sqlite':
+                env['DB_TEST_NAME'] = os.path.join(tmp, f"{mode}.sqlite3")
+            completed = subprocess.run(
+                [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_webhook',
+                 '--events', str(events), '--seed', str(seed), '--output', output],
+                env=env, capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                results[mode] = {'error': (completed.stderr.strip().splitlines() or ['failed'])[-1]}
+                continue
+            with open(output) as report:
+                results[mode] = json.load(report)['overall']
+    return results
@@ -0,0 +1,142 @@
+"""
+Circuit breakers for the bot's external dependencies (Graph, Telegram, Gemini).
+
+State lives in the Django cache so every gunicorn worker sees the same breaker:
+
+    breaker:<name>:failures   -- failures (or slow calls) inside the current window
+    breaker:<name>:open_until -- set while the breaker is OPEN; once it has passed
+                                 the breaker is HALF-OPEN and lets one probe through
+    breaker:<name>:probe      -- held by the worker running the half-open probe
+
+Only that probe can close an open breaker: a call that was already in flight
+when the breaker tripped may well succeed, but that says nothing about
+whether the service has recovered. The probe's token is kept thread-locally
+between allow() and record(), so callers don't have to pass anything along.
+
+A closed breaker costs one cache read per call (in allow(); a successful
+record() doesn't touch the cache). Failures cost a few more.
+"""
+import logging
+import threading
+import time
+import uuid
+
+from decouple import config
+from django.core.cache import cache
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = metrics.register(metrics.Gauge('bot_breaker_state', 'Circuit breaker state (0=closed, 1=half-open, 2=open)', ('name',)))
+BREAKER_TRANSITIONS = metrics.register(metrics.Counter('bot_breaker_transitions_total', 'Circuit breaker state changes', ('name', 'to')))
+BREAKER_REJECTED = metrics.register(metrics.Counter('bot_breaker_rejected_total', 'Calls short-circuited by an open breaker', ('name',)))
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, slow_call_seconds=5.0, window_seconds=60, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.window_seconds = window_seconds
+        self.reset_timeout = reset_timeout
+        self.failures_key = f"breaker:{name}:failures"
+        self.open_key = f"breaker:{name}:open_until"
+        self.probe_key = f"breaker:{name}:probe"
+        self._last_state = CLOSED
+        self._local = threading.local()   # .probe: this thread's half-open probe token, if it won one
+        BREAKER_STATE.set(name, value=STATE_VALUES[CLOSED])
+
+    def _observe(self, state):
+        """Exports the state and counts transitions seen by this worker."""
+        if state != self._last_state:
+            BREAKER_TRANSITIONS.inc(self.name, state)
+            logger.warning(f"Circuit breaker '{self.name}' is now {state.upper()}")
+            self._last_state = state
+        BREAKER_STATE.set(self.name, value=STATE_VALUES[state])
+
+    @property
+    def state(self):
+        open_until = cache.get(self.open_key)
+        if open_until is None:
+            return CLOSED
+        return OPEN if time.time() < open_until else HALF_OPEN
+
+    def allow(self):
+        """True if a call may go out now. In HALF-OPEN only one worker gets to probe."""
+        open_until = cache.get(self.open_key)
+        if open_until is None:
+            if self._last_state != CLOSED:
+                self._observe(CLOSED)
+            return True
+
+        if time.time() >= open_until:
+            token = uuid.uuid4().hex
+            if cache.add(self.probe_key, token, timeout=self.reset_timeout):
+                self._local.probe = token
+                self._observe(HALF_OPEN)
+                return True
+
+        self._observe(OPEN)
+        BREAKER_REJECTED.inc(self.name)
+        return False
+
+    def record(self, seconds, ok=True):
+        """Reports the outcome of a call that allow() let through. Slow calls count as failures."""
+        probe, self._local.probe = getattr(self._local, 'probe', None), None
+        failed = not ok or seconds > self.slow_call_seconds
+
+        if probe is not None:
+            # This was the half-open probe: it alone decides whether we close or stay open
+            if failed:
+                self._trip()
+            elif cache.get(self.probe_key) == probe:
+                cache.delete_many([self.open_key, self.probe_key, self.failures_key])
+                self._observe(CLOSED)
+            return
+
+        if not failed:
+            return
+        if cache.get(self.open_key) is not None:
+            return   # already open; this call went out before it tripped
+
+        cache.add(self.failures_key, 0, timeout=self.window_seconds)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            # The window expired between add() and incr()
+            cache.set(self.failures_key, 1, timeout=self.window_seconds)
+            failures = 1
+        if failures >= self.failure_threshold:
+            self._trip()
+
+    def _trip(self):
+        cache.set(self.open_key, time.time() + self.reset_timeout, timeout=self.reset_timeout * 10)
+        cache.delete_many([self.probe_key, self.failures_key])
+        self._observe(OPEN)
+
+
+GRAPH = CircuitBreaker(
+    'graph',
+    failure_threshold=config('BREAKER_GRAPH_FAILURES', default=10, cast=int),
+    slow_call_seconds=config('BREAKER_GRAPH_SLOW_SECONDS', default=5.0, cast=float),
+    reset_timeout=config('BREAKER_GRAPH_RESET_SECONDS', default=15, cast=int),
+)
+TELEGRAM = CircuitBreaker(
+    'telegram',
+    failure_threshold=config('BREAKER_TELEGRAM_FAILURES', default=3, cast=int),
+    slow_call_seconds=config('BREAKER_TELEGRAM_SLOW_SECONDS', default=5.0, cast=float),
+    reset_timeout=config('BREAKER_TELEGRAM_RESET_SECONDS', default=60, cast=int),
+)
+GEMINI = CircuitBreaker(
+    'gemini',
+    failure_threshold=config('BREAKER_GEMINI_FAILURES', default=3, cast=int),
+    slow_call_seconds=config('BREAKER_GEMINI_SLOW_SECONDS', default=8.0, cast=float),
+    reset_timeout=config('BREAKER_GEMINI_RESET_SECONDS', default=30, cast=int),
+)
+
+BREAKERS = {breaker.name: breaker for breaker in (GRAPH, TELEGRAM, GEMINI)}
@@ -0,0 +1,175 @@
+"""
+Cache-aside helpers on top of the shared Django cache (see CACHES in settings).
+
+Keys are namespaced and versioned:  <namespace>:v<version>:<key>
+Bumping a namespace's version (invalidate()) orphans every key in it at once,
+so we never have to enumerate or delete keys.
+
+    houses = caching.get_or_compute(caching.CATALOG, 'active', load_houses)
+
+get_or_compute() is single-flight: on a miss only one worker recomputes while
+the rest wait briefly for its result instead of stampeding the database.
+
+That, the rate limits (incr) and the circuit breakers' single half-open probe
+(add) rely on add()/incr() being atomic across processes, which only Redis
+gives us. The file and db caches do a read then a write, so with several
+gunicorn workers those guarantees become best-effort (an occasional double
+recompute, a few messages over a rate limit, two probes). gunicorn.conf.py
+warns at startup when that's the setup.
+"""
+import logging
+import time
+
+from django.core.cache import cache
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Namespace -> default TTL (seconds)
+CATALOG = 'catalog'
+QUOTES = 'quotes'
+PROFILES = 'profiles'
+DEDUP = 'dedup'
+RATELIMIT = 'ratelimit'
+CONVERSATIONS = 'conversations'
+USAGE = 'usage'
+ANSWERS = 'answers'
+KNOWLEDGE = 'knowledge'
+LEADS = 'leads'
+
+NAMESPACES = {
+    CATALOG: 60 * 60,
+    QUOTES: 60 * 60,
+    PROFILES: 60 * 60 * 24,
+    DEDUP: 60 * 60 * 24,
+    RATELIMIT: 60,
+    CONVERSATIONS: 60 * 60 * 6,
+    USAGE: 60 * 60 * 48,
+    ANSWERS: 60 * 60 * 24,
+    KNOWLEDGE: 60 * 60 * 24,
+    LEADS: 60 * 30,
+}
+
+# How long a worker trusts its copy of a namespace version before re-reading it.
+# Invalidations from another worker take at most this long to be seen.
+VERSION_MEMO_SECONDS = 2.0
+LOCK_SECONDS = 10
+WAIT_SECONDS = 2.0
+WAIT_STEP = 0.02
+
+CACHE_REQUESTS = metrics.register(metrics.Counter('bot_cache_requests_total', 'Cache lookups by namespace and result', ('namespace', 'result')))
+
+_MISSING = object()
+_versions = {}   # namespace -> (version, read_at)
+
+
+def version(namespace):
+    """Current version of a namespace (memoized per worker for VERSION_MEMO_SECONDS)."""
+    memo = _versions.get(namespace)
+    now = time.monotonic()
+    if memo and now - memo[1] < VERSION_MEMO_SECONDS:
+        return memo[0]
+    current = cache.get(f"{namespace}:version")
+    if current is None:
+        cache.add(f"{namespace}:version", 1, timeout=None)
+        current = cache.get(f"{namespace}:version") or 1
+    _versions[namespace] = (current, now)
+    return current
+
+
+def make_key(namespace, key):
+    if namespace not in NAMESPACES:
+        raise ValueError(f"Unknown cache namespace '{namespace}'")
+    return f"{namespace}:v{version(namespace)}:{key}"
+
+
+def invalidate(namespace):
+    """Drops every cached entry in the namespace by bumping its version."""
+    version_key = f"{namespace}:version"
+    try:
+        current = cache.incr(version_key)
+    except ValueError:
+        # The version key was evicted/cleared: restart above what this worker last saw,
+        # or things it built under that version would look current again
+        memo = _versions.get(namespace)
+        current = max(2, memo[0] + 1 if memo else 2)
+        cache.set(version_key, current, timeout=None)
+    _versions[namespace] = (current, time.monotonic())
+    logger.info(f"Cache namespace '{namespace}' invalidated (v{current})")
+    return current
+
+
+def get(namespace, key, default=None):
+    value = cache.get(make_key(namespace, key), _MISSING)
+    if value is _MISSING:
+        CACHE_REQUESTS.inc(namespace, 'miss')
+        return default
+    CACHE_REQUESTS.inc(namespace, 'hit')
+    return value
+
+
+def set(namespace, key, value, ttl=None):
+    cache.set(make_key(namespace, key), value, timeout=ttl or NAMESPACES[namespace])
+
+
+def delete(namespace, key):
+    cache.delete(make_key(namespace, key))
+
+
+def get_or_compute(namespace, key, compute, ttl=None):
+    """
+    Returns the cached value, or computes and stores it.
+    Only one caller per key recomputes at a time (single-flight); the others
+    poll for up to WAIT_SECONDS before giving up and computing it themselves.
+    """
+    full_key = make_key(namespace, key)
+    value = cache.get(full_key, _MISSING)
+    if value is not _MISSING:
+        CACHE_REQUESTS.inc(namespace, 'hit')
+        return value
+    CACHE_REQUESTS.inc(namespace, 'miss')
+
+    lock_key = f"{full_key}:lock"
+    if not cache.add(lock_key, 1, timeout=LOCK_SECONDS):
+        deadline = time.monotonic() + WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_STEP)
+            value = cache.get(full_key, _MISSING)
+            if value is not _MISSING:
+                CACHE_REQUESTS.inc(namespace, 'wait_hit')
+                return value
+        CACHE_REQUESTS.inc(namespace, 'wait_timeout')
+        lock_key = None
+
+    try:
+        value = compute()
+        cache.set(full_key, value, timeout=ttl or NAMESPACES[namespace])
+        return value
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+
+
+def first_time(namespace, key, ttl=None):
+    """True the first time a key is seen within ttl (for dedup)."""
+    return cache.add(make_key(namespace, key), 1, timeout=ttl or NAMESPACES[namespace])
+
+
+def incr(namespace, key, amount=1, ttl=None):
+    """Atomically adds to a counter (created at 0 with the namespace/ttl expiry). Returns the new value."""
+    full_key = make_key(namespace, key)
+    ttl = ttl or NAMESPACES[namespace]
+    cache.add(full_key, 0, timeout=ttl)
+    try:
+        return cache.incr(full_key, amount)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(full_key, amount, timeout=ttl)
+        return amount
+
+
+def hit_rate_limit(namespace, key, limit, window=None, hits=1):
+    """Counts `hits` against key; True once more than `limit` hits land inside the window."""
+    return incr(namespace, key, amount=hits, ttl=window) > limit
@@ -0,0 +1,263 @@
+"""
+Webhook traffic capture, for replaying real traffic shapes locally.
+
+With WEBHOOK_CAPTURE=True every verified webhook POST is appended, as one
+JSON line, to a gzip file under WEBHOOK_CAPTURE_DIR:
+
+    {"t": 1767225600.123, "sig": "sha256=...", "body": "{\"object\":\"page\",...}"}
+
+The webhook only pays for a queue put: a background thread per process does
+the JSON, the compression and the disk. If the queue is full (the disk is
+slow, or a burst) the record is dropped and counted; capture never slows down
+or breaks a reply. Each process writes its own files
+(webhook-<started>-<pid>.jsonl.gz) and starts a new one every
+WEBHOOK_CAPTURE_ROTATE_MB of JSON or WEBHOOK_CAPTURE_ROTATE_MINUTES.
+
+With WEBHOOK_CAPTURE_ANONYMIZE (the default) PSIDs, commenter ids/names and
+phone numbers in the text are swapped for stable fakes (an HMAC of the real
+value, so the same sender is the same fake sender across files). The body
+then no longer matches Meta's signature, so "sig" is null; replay re-signs
+everything with its own secret anyway.
+
+    manage.py replay_webhook captures/ --speed 10
+"""
+import atexit
+import gzip
+import hashlib
+import hmac
+import heapq
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+
+from decouple import config
+from django.conf import settings
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+ENABLED = config('WEBHOOK_CAPTURE', default=False, cast=bool)
+DIRECTORY = config('WEBHOOK_CAPTURE_DIR', default=str(Path(settings.BASE_DIR) / 'captures'))
+ANONYMIZE = config('WEBHOOK_CAPTURE_ANONYMIZE', default=True, cast=bool)
+ROTATE_BYTES = config('WEBHOOK_CAPTURE_ROTATE_MB', default=64, cast=int) * 1024 * 1024
+ROTATE_SECONDS = config('WEBHOOK_CAPTURE_ROTATE_MINUTES', default=60, cast=int) * 60
+QUEUE_SIZE = config('WEBHOOK_CAPTURE_QUEUE', default=1000, cast=int)
+FLUSH_SECONDS = 5
+
+CAPTURED = metrics.register(metrics.Counter(
+    'bot_webhook_captured_total', 'Webhook bodies captured for replay, or dropped because the writer fell behind', ('result',),
+))
+
+PHONE_RE = re.compile(r'(?:\+?63|0)9\d{2}[\s-]?\d{3}[\s-]?\d{4}')
+
+
+# --- ANONYMIZATION ---
+
+def _digest(value):
+    salt = config('WEBHOOK_CAPTURE_SALT', default=settings.SECRET_KEY)
+    return hmac.new(salt.encode('utf-8'), str(value).encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def fake_id(real_id):
+    """Same-length, all-digit stand-in for a PSID or user id."""
+    digits = str(int(_digest(real_id), 16))
+    return ('9' + digits)[:max(len(str(real_id)), 8)]
+
+
+def fake_phone(match):
+    return '09' + str(int(_digest(re.sub(r'\D', '', match.group())), 16))[:9]
+
+
+def _scrub_text(container, key):
+    if isinstance(container.get(key), str):
+        container[key] = PHONE_RE.sub(fake_phone, container[key])
+
+
+def anonymize(data):
+    """Swaps sender ids, commenter ids/names and phone numbers in a parsed webhook body (in place)."""
+    for entry in data.get('entry', []):
+        page_id = str(entry.get('id'))
+        for event in entry.get('messaging', []):
+            for side in ('sender', 'recipient'):
+                person = event.get(side) or {}
+                if person.get('id') and str(person['id']) != page_id:
+                    person['id'] = fake_id(person['id'])
+            _scrub_text(event.get('message') or {}, 'text')
+        for change in entry.get('changes', []):
+            value = change.get('value') or {}
+            author = value.get('from') or {}
+            if author.get('id') and str(author['id']) != page_id:
+                author['id'] = fake_id(author['id'])
+                author['name'] = 'Anonymous'
+            _scrub_text(value, 'message')
+    return data
+
+
+def make_record(raw_body, signature, captured_at, anonymized=ANONYMIZE):
+    body = raw_body.decode('utf-8', 'replace')
+    if anonymized:
+        try:
+            body = json.dumps(anonymize(json.loads(body)), ensure_ascii=False)
+        except ValueError:
+            return None
+        signature = None
+    return {'t': round(captured_at, 3), 'sig': signature, 'body': body}
+
+
+# --- WRITER ---
+
+class CaptureWriter:
+    """Drains the capture queue into rotating .jsonl.gz files on a daemon thread."""
+
+    def __init__(self, directory, rotate_bytes=ROTATE_BYTES, rotate_seconds=ROTATE_SECONDS, anonymized=ANONYMIZE):
+        self.directory = Path(directory)
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.anonymized = anonymized
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.pid = os.getpid()
+        self._file = None
+        self._opened_at = 0
+        self._written = 0
+        self._thread = threading.Thread(target=self._run, name='webhook-capture', daemon=True)
+        self._thread.start()
+
+    def put(self, raw_body, signature):
+        try:
+            self.queue.put_nowait((raw_body, signature, time.time()))
+            return True
+        except queue.Full:
+            CAPTURED.inc('dropped')
+            return False
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = self.directory / f"webhook-{stamp}-{self.pid}.jsonl.gz"
+        suffix = 1
+        while path.exists():
+            suffix += 1
+            path = self.directory / f"webhook-{stamp}-{self.pid}-{suffix}.jsonl.gz"
+        self._file = gzip.open(path, 'ab')
+        self._opened_at = time.monotonic()
+        self._written = 0
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, item):
+        record = make_record(*item, anonymized=self.anonymized)
+        if record is None:
+            CAPTURED.inc('dropped')
+            return
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        if self._file is not None and (self._written >= self.rotate_bytes
+                                       or time.monotonic() - self._opened_at >= self.rotate_seconds):
+            self._close()
+        if self._file is None:
+            self._open()
+        self._file.write(line)
+        self._written += len(line)
+        CAPTURED.inc('captured')
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=FLUSH_SECONDS)
+            except queue.Empty:
+                # Quiet period: make what we have readable even if the worker is killed later
+                if self._file is not None:
+                    self._file.flush()
+                continue
+            try:
+                if item is None:
+                    self._close()
+                    return
+                self._write(item)
+            except Exception as e:
+                logger.error(f"Webhook capture write failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def close(self, timeout=5):
+        """Writes out what's queued and closes the current file."""
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def writer():
+    """This process's writer (started on first use, and again in a forked child)."""
+    global _writer
+    if _writer is None or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                _writer = CaptureWriter(DIRECTORY)
+                atexit.register(_writer.close)
+    return _writer
+
+
+def record(raw_body, signature):
+    """Called by the webhook after the signature check. A no-op unless WEBHOOK_CAPTURE is on."""
+    if ENABLED:
+        writer().put(raw_body, signature)
+
+
+# --- READING ---
+
+def capture_files(paths):
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob('*.jsonl.gz')) if path.is_dir() else [path])
+    return files
+
+
+def read_file(path):
+    """Records from one capture file; a file cut short by a killed worker yields what made it to disk."""
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as lines:
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+    except (EOFError, OSError, ValueError) as e:
+        logger.warning(f"Stopped reading {path} early: {e}")
+
+
+def read(paths):
+    """Every record under paths (files or directories), merged into arrival order across workers."""
+    return heapq.merge(*(read_file(path) for path in capture_files(paths)), key=lambda record: record['t'])
+
+
+def label(body):
+    """Route label for a replayed body, in the same style as the bench scenarios."""
+    entries = body.get('entry', [])
+    if len(entries) > 1:
+        return 'batch'
+    entry = entries[0] if entries else {}
+    if entry.get('changes'):
+        return 'comment'
+    for event in entry.get('messaging', []):
+        if 'postback' in event:
+            return f"postback:{event['postback'].get('payload', '').split('_')[0]}"
+        message = event.get('message') or {}
+        if message.get('quick_reply'):
+            return f"quick_reply:{message['quick_reply'].get('payload', '').split('_')[0]}"
+        if message.get('attachments'):
+            return 'message:attachment'
+        if message.get('text'):
+            return 'text'
+        return 'other'
+    return 'other'
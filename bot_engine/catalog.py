@@ -0,0 +1,207 @@
+"""
+In-memory index of the active catalog for the models carousel.
+
+Every active house is filed under (location, price band, financing type), with
+ANY as a wildcard in each position, so narrowing the carousel to a lead's
+budget is one dict lookup instead of a query:
+
+    index = catalog.get_index()
+    house_ids = index.lookup('Magalang', '3_4', 'PAGIBIG')
+
+Price bands follow the budget quick replies (BUDGET_2_3, BUDGET_3_4,
+BUDGET_4_UP) and are based on the net TCP after the active promo. Every house
+is offered under every financing type today, so the financing key only picks
+which "Starts at" figure the card shows.
+
+Messenger caps a generic template at 10 elements, so carousels are paged:
+PAGE_SIZE houses plus a "See more" card whose postback carries a cursor
+(location.band.financing.offset). A page only touches its own slice of the
+index, however big the catalog gets.
+
+The index is rebuilt when the catalog cache version changes (any house, image
+or promo edit) or the day rolls over in Asia/Manila (promo start/end dates).
+"""
+from django.utils import timezone
+
+from . import caching, promos
+from .financing import house_bank_quote, house_cash_quote, house_pagibig_quote
+from .models import HouseModel
+
+
+ANY = '*'
+PAGE_SIZE = 9   # + the "See more" card = Messenger's 10 elements
+MORE_PAYLOAD = 'MORE_MODELS'
+
+# bucket -> (min net TCP, max net TCP), max exclusive
+PRICE_BANDS = {
+    '2_3': (2_000_000, 3_000_000),
+    '3_4': (3_000_000, 4_000_000),
+    '4_UP': (4_000_000, None),
+}
+# What capture_budget stores in lead.budget_range (the quick reply title)
+BUDGET_LABELS = {'2M-3M': '2_3', '3M-4M': '3_4', '4M+': '4_UP'}
+FINANCING_TYPES = ('BANK', 'PAGIBIG', 'CASH')
+LOCATIONS = [key for key, label in HouseModel._meta.get_field('location').choices]
+
+
+def price_band(net_tcp):
+    for band, (low, high) in PRICE_BANDS.items():
+        if net_tcp >= low and (high is None or net_tcp < high):
+            return band
+    return None   # Below 2M: only shown when the lead has no budget yet
+
+
+def resolve_band(budget):
+    """'3M-4M' (lead.budget_range), '3_4' or None -> band key or ANY."""
+    if not budget:
+        return ANY
+    if budget in PRICE_BANDS:
+        return budget
+    return BUDGET_LABELS.get(budget, ANY)
+
+
+def resolve_location(location_filter):
+    """Free-text location -> location key, ANY for no filter, None if nothing matches."""
+    if not location_filter:
+        return ANY
+    wanted = location_filter.strip().lower()
+    return next((key for key in LOCATIONS if wanted in key.lower()), None)
+
+
+def resolve_financing(financing_type):
+    return financing_type if financing_type in FINANCING_TYPES else ANY
+
+
+def make_cursor(location, band, financing, offset):
+    return f"{location}.{band}.{financing}.{offset}"
+
+
+def parse_cursor(cursor):
+    """'Magalang.3_4.*.9' -> ('Magalang', '3_4', ANY, 9). Raises ValueError if it's garbage."""
+    location, band, financing, offset = cursor.split('.')
+    if location != ANY and location not in LOCATIONS:
+        raise ValueError(f"Unknown location '{location}'")
+    if band != ANY and band not in PRICE_BANDS:
+        raise ValueError(f"Unknown price band '{band}'")
+    if financing != ANY and financing not in FINANCING_TYPES:
+        raise ValueError(f"Unknown financing type '{financing}'")
+    offset = int(offset)
+    if offset < 0:
+        raise ValueError("Negative offset")
+    return location, band, financing, offset
+
+
+# --- THE INDEX ---
+
+def house_card(house, discount, financing):
+    """One carousel element; the subtitle figure depends on the financing type."""
+    if financing == 'PAGIBIG':
+        monthly = house_pagibig_quote(house, discount, 30).monthly
+        subtitle = f"{house.description} | Pag-IBIG ₱{monthly:,.2f}/mo"
+    elif financing == 'CASH':
+        subtitle = f"{house.description} | Cash ₱{house_cash_quote(house, discount).cash_price:,.2f}"
+    else:
+        # 15 Yrs Bank Financing -- same as the computation card
+        monthly = house_bank_quote(house, discount, 15).monthly
+        subtitle = f"{house.description} | Starts at ₱{monthly:,.2f}/mo"
+
+    return {
+        "title": house.name,
+        "image_url": house.image_url,
+        "subtitle": subtitle,
+        "buttons": [
+            {
+                "type": "postback",
+                "title": "Computation 📊",
+                "payload": f"COMPUTE_{house.id}"
+            },
+            {
+                "type": "postback",
+                "title": "Schedule Tripping",
+                "payload": f"SCHEDULE_TRIPPING_{house.id}"
+            },
+            {
+                "type": "web_url",
+                "url": house.details_link,
+                "title": "View Details"
+            }
+        ]
+    }
+
+
+class CatalogIndex:
+    def __init__(self, houses, promo_index, today):
+        self.houses = {}    # house id -> HouseModel
+        self.cards = {}     # (house id, financing) -> carousel element
+        self.discounts = {} # house id -> active promo discount
+        self.net_tcp = {}   # house id -> net TCP after the active promo
+
+        entries = {}
+        for house in houses:
+            discount = promo_index.resolve(house.id, today).discount
+            net_tcp = house.total_contract_price - discount
+            self.houses[house.id] = house
+            self.discounts[house.id] = discount
+            self.net_tcp[house.id] = net_tcp
+
+            band = price_band(net_tcp)
+            bands = (band, ANY) if band else (ANY,)
+            for location in (house.location, ANY):
+                for band_key in bands:
+                    for financing in FINANCING_TYPES + (ANY,):
+                        entries.setdefault((location, band_key, financing), []).append(house.id)
+            for financing in FINANCING_TYPES + (ANY,):
+                self.cards[(house.id, financing)] = house_card(house, discount, financing)
+
+        # (location, band, financing) -> tuple of house ids, in catalog order
+        self.entries = {key: tuple(ids) for key, ids in entries.items()}
+        self.today = today
+
+    def lookup(self, location=ANY, band=ANY, financing=ANY):
+        return self.entries.get((location, band, financing), ())
+
+    def page(self, location=ANY, band=ANY, financing=ANY, offset=0):
+        """(carousel elements, next offset or None, total matches) for one page."""
+        ids = self.lookup(location, band, financing)
+        chunk = ids[offset:offset + PAGE_SIZE]
+        elements = [self.cards[(house_id, financing)] for house_id in chunk]
+        next_offset = offset + PAGE_SIZE if offset + PAGE_SIZE < len(ids) else None
+        return elements, next_offset, len(ids)
+
+
+def build_index():
+    promo_index = promos.get_index()
+    houses = HouseModel.objects.filter(is_active=True).order_by('id')
+    return CatalogIndex(houses, promo_index, promo_index.today)
+
+
+_index = None   # ((catalog version, date), CatalogIndex)
+
+
+def get_index():
+    global _index
+    stamp = (caching.version(caching.CATALOG), timezone.localdate())
+    if _index is None or _index[0] != stamp:
+        _index = (stamp, build_index())
+    return _index[1]
+
+
+def clear():
+    global _index
+    _index = None
+    promos.clear()
+
+
+def more_card(location, band, financing, next_offset, total):
+    remaining = total - next_offset
+    return {
+        "title": "Marami pang models! 🏡",
+        "subtitle": f"{remaining} more model{'s' if remaining != 1 else ''} available",
+        "buttons": [
+            {
+                "type": "postback",
+                "title": "See more ➡️",
+                "payload": f"{MORE_PAYLOAD}_{make_cursor(location, band, financing, next_offset)}"
+            }
+        ]
+    }
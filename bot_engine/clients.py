@@ -0,0 +1,99 @@
+"""
+Per-process SDK and HTTP clients, built on first use.
+
+Nothing here runs at import time. migrate, collectstatic and the test runner
+never load the Gemini SDK (about a second of imports), and a missing
+GEMINI_API_KEY only matters once the bot really asks Gemini, where
+get_gemini_response already falls back to the canned reply.
+
+    clients.http().request('POST', url, json=body)      # pooled keep-alive Session
+    clients.genai().GenerativeModel(...)                # configured SDK module
+    clients.get('gemini_model', build)                  # anything else per process
+
+Every client remembers the pid that built it. Under `gunicorn --preload` the
+master imports the app once and forks the workers, and a child must not
+reuse the parent's sockets or gRPC channel: the first call in a worker sees
+a new pid and builds fresh ones. gunicorn.conf.py also calls reset() in
+post_fork and, with WARM_CLIENTS, warm() so the first message doesn't pay.
+"""
+import os
+import threading
+
+from decouple import config
+from django.core.exceptions import ImproperlyConfigured
+
+
+HTTP_POOL_SIZE = config('HTTP_POOL_SIZE', default=10, cast=int)
+
+_clients = {}
+_pid = None
+_lock = threading.RLock()   # builders may call get() for the clients they need
+
+
+def get(name, build):
+    """This process's `name` client, building it with build() the first time."""
+    global _pid
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _clients.clear()
+                _pid = os.getpid()
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = build()
+    return client
+
+
+def reset():
+    """Forgets every client (after a fork, or when tests/bench repoint the endpoints)."""
+    with _lock:
+        _clients.clear()
+
+
+def _build_http():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def http():
+    return get('http', _build_http)
+
+
+def genai_configured():
+    """False without a GEMINI_API_KEY: the bot then never calls Gemini (a config problem, not an outage)."""
+    return bool(config('GEMINI_API_KEY', default=''))
+
+
+def _build_genai():
+    api_key = config('GEMINI_API_KEY', default='')
+    if not api_key:
+        raise ImproperlyConfigured("GEMINI_API_KEY is not set")
+    import google.generativeai as genai
+
+    # Endpoint override for pointing the bot at a local stub (Graph/Telegram URLs live in outbound.py)
+    endpoint = config('GEMINI_API_ENDPOINT', default='')
+    if endpoint:
+        genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': endpoint})
+    else:
+        genai.configure(api_key=api_key)
+    return genai
+
+
+def genai():
+    return get('genai', _build_genai)
+
+
+def warm():
+    """Builds the clients now (post_fork) instead of on the first message."""
+    http()
+    if genai_configured():
+        genai()
@@ -0,0 +1,240 @@
+"""
+Comment auto-reply pipeline.
+
+Page comments arrive as `feed` changes on the webhook. The webhook only does
+the cheap part and returns:
+
+    ingest(changes)   -- filters to new comments with a trigger word, drops
+                         repeats from the same commenter on the same post
+                         (DEDUP cache) and queues the rest with one bulk INSERT
+
+Replies go out from a worker (`manage.py process_comments`, or a background
+thread with COMMENT_WORKER=thread) so a viral post never slows down Messenger
+replies:
+
+    process_batch()   -- claims pending comments (lease + SKIP LOCKED where the
+                         DB supports it), sends a Private Reply keyed on the
+                         comment_id plus a short public reply, and stops when
+                         the page's reply budget for the minute is used up
+
+A comment id is only ever queued once (unique), so Meta's redeliveries are
+harmless.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from decouple import config
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import caching, metrics, outbound
+from .models import QueuedComment
+
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_WORDS = ['hm', 'how much', 'price', 'details', 'interested', 'avail']
+PRIVATE_REPLY = ("Hi! Salamat sa comment mo. 😊 Type 'house' para makita ang models at prices natin, "
+                 "o 'start' para matulungan kitang hanapin ang best home para sa'yo.")
+PUBLIC_REPLY = "Hi! I sent you a PM about our house models and prices. Check your inbox! 😊"
+
+# Page-level budget for Graph calls per minute: private + public replies count separately against Meta's limits
+REPLIES_PER_MINUTE = config('COMMENT_REPLIES_PER_MINUTE', default=120, cast=int)
+PUBLIC_REPLIES = config('COMMENT_PUBLIC_REPLIES', default=True, cast=bool)
+WORKER_MODE = config('COMMENT_WORKER', default='command')   # 'command' or 'thread'
+BATCH_SIZE = 50
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 5
+# Meta only allows a private reply within 7 days of the comment
+MAX_AGE = timedelta(days=7)
+
+COMMENTS_TOTAL = metrics.register(metrics.Counter('bot_comments_total', 'Page comments by outcome', ('outcome',)))
+
+
+# --- INGESTION (webhook side) ---
+
+def parse_change(change, page_id):
+    """A queueable comment dict from one webhook change, or None."""
+    if change.get('field') != 'feed':
+        return None
+    value = change.get('value', {})
+    if value.get('item') != 'comment' or value.get('verb') != 'add':
+        return None
+    commenter = value.get('from', {})
+    if not value.get('comment_id') or not commenter.get('id') or commenter['id'] == page_id:
+        return None
+    message = value.get('message', '')
+    if not any(word in message.lower() for word in TRIGGER_WORDS):
+        COMMENTS_TOTAL.inc('ignored')
+        return None
+    return {
+        'comment_id': value['comment_id'],
+        'commented_at': parse_created_time(value.get('created_time')),
+        'post_id': value.get('post_id', ''),
+        'commenter_id': commenter['id'],
+        'commenter_name': commenter.get('name', '')[:255],
+        'message': message,
+    }
+
+
+def parse_created_time(value):
+    """Meta sends created_time as a unix timestamp (an ISO string in some payloads); None if missing/garbage."""
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.fromtimestamp(int(value), tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('+0000', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)
+
+
+def ingest(changes):
+    """Queues the comments worth replying to. Returns how many were queued."""
+    page_id = config('FB_PAGE_ID', default='')
+    rows = []
+    for change in changes:
+        comment = parse_change(change, page_id)
+        if comment is None:
+            continue
+        # One reply per commenter per post, however many times they comment
+        if not caching.first_time(caching.DEDUP, f"comment:{comment['post_id']}:{comment['commenter_id']}"):
+            COMMENTS_TOTAL.inc('duplicate')
+            continue
+        rows.append(QueuedComment(**comment))
+
+    if rows:
+        QueuedComment.objects.bulk_create(rows, ignore_conflicts=True)
+        COMMENTS_TOTAL.inc('queued', amount=len(rows))
+        if WORKER_MODE == 'thread':
+            start_worker_thread()
+    return len(rows)
+
+
+# --- REPLIES (worker side) ---
+
+def claim_batch(limit=BATCH_SIZE):
+    """Leases up to `limit` pending comments so parallel workers don't double-reply."""
+    now = timezone.now()
+    with transaction.atomic():
+        pending = QueuedComment.objects.filter(
+            Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+            replied_at__isnull=True,
+            attempts__lt=MAX_ATTEMPTS,
+        ).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        batch = list(pending[:limit])
+        if batch:
+            QueuedComment.objects.filter(id__in=[comment.id for comment in batch]).update(
+                claimed_until=now + timedelta(seconds=LEASE_SECONDS), attempts=F('attempts') + 1,
+            )
+    return batch
+
+
+def send_private_reply(comment_id, text):
+    url = f"{outbound.GRAPH_API_URL}/v21.0/me/messages?access_token={config('FB_PAGE_ACCESS_TOKEN')}"
+    return outbound.post('graph', url, json={"recipient": {"comment_id": comment_id}, "message": {"text": text}})
+
+
+def send_public_reply(comment_id, text):
+    url = f"{outbound.GRAPH_API_URL}/v21.0/{comment_id}/comments?access_token={config('FB_PAGE_ACCESS_TOKEN')}"
+    return outbound.post('graph', url, data={"message": text})
+
+
+def reply(comment):
+    """Sends the replies for one comment. Returns True once the private reply went through."""
+    # The window runs from when they commented, not from when we queued it
+    if timezone.now() - (comment.commented_at or comment.created_at) > MAX_AGE:
+        QueuedComment.objects.filter(id=comment.id).update(attempts=MAX_ATTEMPTS, last_error="Too old for a private reply")
+        COMMENTS_TOTAL.inc('expired')
+        return False
+
+    with metrics.trace('comment') as span:
+        span.route = 'comment_reply'
+        response = send_private_reply(comment.comment_id, PRIVATE_REPLY)
+        if response.status_code != 200:
+            QueuedComment.objects.filter(id=comment.id).update(last_error=response.text[:255])
+            COMMENTS_TOTAL.inc('failed')
+            logger.error(f"Private reply to comment {comment.comment_id} failed: {response.status_code} {response.text}")
+            return False
+        if PUBLIC_REPLIES:
+            send_public_reply(comment.comment_id, PUBLIC_REPLY)
+
+    QueuedComment.objects.filter(id=comment.id).update(replied_at=timezone.now(), claimed_until=None, last_error='')
+    COMMENTS_TOTAL.inc('replied')
+    return True
+
+
+def process_batch(limit=BATCH_SIZE):
+    """Replies to one batch of queued comments. Returns (replied, rate_limited)."""
+    replied = 0
+    batch = claim_batch(limit)
+    for position, comment in enumerate(batch):
+        # Every Graph call counts: a comment is two of them when public replies are on
+        calls = 2 if PUBLIC_REPLIES else 1
+        if caching.hit_rate_limit(caching.RATELIMIT, 'comment_replies', REPLIES_PER_MINUTE, window=60, hits=calls):
+            # Hand the rest of the batch back for the next minute
+            QueuedComment.objects.filter(id__in=[c.id for c in batch[position:]]).update(
+                claimed_until=None, attempts=F('attempts') - 1,
+            )
+            COMMENTS_TOTAL.inc('rate_limited')
+            return replied, True
+        try:
+            replied += reply(comment)
+        except outbound.CircuitOpenError as e:
+            logger.warning(f"Graph circuit open, pausing comment replies: {e}")
+            QueuedComment.objects.filter(id__in=[c.id for c in batch[position:]]).update(
+                claimed_until=None, attempts=F('attempts') - 1,
+            )
+            return replied, True
+        except Exception as e:
+            QueuedComment.objects.filter(id=comment.id).update(last_error=str(e)[:255])
+            logger.error(f"Reply to comment {comment.comment_id} failed: {e}", exc_info=True)
+    return replied, False
+
+
+def pending():
+    return QueuedComment.objects.filter(replied_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+
+
+def drain(idle_exit=True, pause=5.0):
+    """Keeps processing until nothing is left to retry (or forever with idle_exit=False)."""
+    total = 0
+    while True:
+        replied, limited = process_batch()
+        total += replied
+        if replied and not limited:
+            continue
+        if idle_exit and not pending().exists():
+            return total
+        time.sleep(pause)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _run_worker():
+    try:
+        drain()
+    except Exception as e:
+        logger.error(f"Comment worker thread crashed: {e}", exc_info=True)
+    finally:
+        close_old_connections()
+        connection.close()
+
+
+def start_worker_thread():
+    """COMMENT_WORKER=thread: drain the queue in this process, one thread at a time."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name='comment-replies', daemon=True)
+            _worker.start()
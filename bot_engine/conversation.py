@@ -0,0 +1,93 @@
+"""
+Compact per-lead memory for Gemini.
+
+Gemini used to see one message at a time, so follow-ups like "eh yung end
+unit?" made no sense to it and users had to rephrase. Now each call gets:
+
+  - a one-line summary of what the funnel already knows about the lead
+    (budget, financing, timeline, house of interest...), and
+  - the last few Gemini exchanges with that lead,
+
+both trimmed to a fixed token budget so a call never grows past
+CONTEXT_TOKENS on top of the (reused) system instruction.
+
+History lives in the shared cache (CONVERSATIONS namespace), keyed by PSID,
+and expires after a few hours of silence.
+"""
+from . import caching, catalog
+
+
+MAX_TURNS = 6             # messages kept (3 question/answer pairs)
+MAX_TURN_CHARS = 400      # a single message longer than this is cut
+CONTEXT_TOKENS = 300      # budget for summary + history per call
+CHARS_PER_TOKEN = 4       # close enough for Taglish; we only need a bound
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def lead_summary(lead):
+    """'Juan | HOT | budget 3M-4M | Pag-IBIG | timeline ASAP | likes Unna' (empty if we know nothing)."""
+    if lead is None:
+        return ''
+    parts = []
+    if lead.full_name:
+        parts.append(lead.full_name.strip())
+    if lead.status and lead.status != 'COLD':
+        parts.append(lead.status)
+    if lead.budget_range:
+        parts.append(f"budget {lead.budget_range}")
+    if lead.financing_type:
+        parts.append(lead.get_financing_type_display())
+    if lead.timeline:
+        parts.append(f"timeline {lead.timeline}")
+    if lead.location_pref:
+        parts.append(f"prefers {lead.location_pref}")
+    if lead.interested_house_id:
+        house = catalog.get_index().houses.get(lead.interested_house_id)
+        if house is not None:
+            parts.append(f"likes {house.name}")
+    return ' | '.join(parts)
+
+
+def history(psid):
+    """[(role, text), ...] oldest first; role is 'user' or 'model'."""
+    return caching.get(caching.CONVERSATIONS, psid) or []
+
+
+def remember(psid, user_text, reply):
+    turns = history(psid) + [('user', user_text[:MAX_TURN_CHARS]), ('model', reply[:MAX_TURN_CHARS])]
+    caching.set(caching.CONVERSATIONS, psid, turns[-MAX_TURNS:])
+
+
+def forget(psid):
+    caching.delete(caching.CONVERSATIONS, psid)
+
+
+def build_contents(user_text, lead=None, facts=''):
+    """
+    Gemini `contents` for one call: trimmed history, then the question with the
+    retrieved facts and the lead summary in front. Oldest turns are dropped first
+    to stay under CONTEXT_TOKENS (facts are already bounded by knowledge.TOP_K).
+    """
+    summary = lead_summary(lead)
+    budget = CONTEXT_TOKENS - (estimate_tokens(summary) if summary else 0)
+
+    kept = []
+    turns = history(lead.psid) if lead is not None else []
+    # Walk back from the newest pair; a question without its answer is useless context
+    for index in range(len(turns) - 2, -1, -2):
+        pair = turns[index:index + 2]
+        cost = sum(estimate_tokens(text) for role, text in pair)
+        if cost > budget:
+            break
+        budget -= cost
+        kept[:0] = pair
+
+    contents = [{'role': role, 'parts': [text]} for role, text in kept]
+    question = f"[Lead: {summary}]\n{user_text}" if summary else user_text
+    if facts:
+        question = f"[Facts:\n{facts}]\n{question}"
+    contents.append({'role': 'user', 'parts': [question]})
+    return contents
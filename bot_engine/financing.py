@@ -0,0 +1,148 @@
+"""
+Financing calculator shared by the computation cards, the carousel and the
+affordability tables.
+
+Everything is Decimal and rounded to the centavo (ROUND_HALF_UP) at each
+step a buyer would see, so a ₱3,456,789.00 TCP doesn't drift the way it did
+with floats. Quotes are plain namedtuples and are memoized on their inputs
+(price, discount, DP %, rate, term, reservation fee):
+
+    quote = financing.bank_quote(house.total_contract_price, discount,
+                                 house.downpayment_percent, house.bank_interest_rate, 15,
+                                 house.reservation_fee)
+    quote.monthly   # Decimal('19783.51')
+"""
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+
+CENTAVO = Decimal('0.01')
+HUNDRED = Decimal(100)
+QUOTE_CACHE_SIZE = 4096
+
+BANK_LOANABLE_PERCENT = Decimal(90)
+BANK_DP_MONTHS = 12
+PAGIBIG_DP_MONTHS = 16
+DP_MONTHS = {'BANK': BANK_DP_MONTHS, 'PAGIBIG': PAGIBIG_DP_MONTHS}
+
+LoanQuote = namedtuple('LoanQuote', 'plan gross_tcp discount net_tcp dp_percent total_dp reservation_fee '
+                                    'dp_balance dp_months monthly_dp loan_amount rate years monthly')
+CashQuote = namedtuple('CashQuote', 'gross_tcp discount net_tcp cash_discount_percent cash_discount cash_price')
+
+
+def to_decimal(value):
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def pesos(value):
+    """Rounds to the centavo, the way it's printed on a computation sheet."""
+    return value.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+@lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def monthly_amortization(principal, annual_interest_rate, years):
+    """Monthly payment on principal at annual_interest_rate % over years, to the centavo."""
+    principal = to_decimal(principal)
+    total_months = years * 12
+    if to_decimal(annual_interest_rate) <= 0:
+        return pesos(principal / total_months)
+
+    monthly_rate = to_decimal(annual_interest_rate) / HUNDRED / 12
+    growth = (1 + monthly_rate) ** total_months
+    return pesos(principal * monthly_rate * growth / (growth - 1))
+
+
+def _loan_quote(plan, price, discount, dp_percent, rate, years, reservation_fee, loan_percent, dp_months):
+    gross_tcp = to_decimal(price)
+    discount = to_decimal(discount)
+    net_tcp = gross_tcp - discount
+    dp_percent = to_decimal(dp_percent)
+    reservation_fee = to_decimal(reservation_fee)
+
+    total_dp = pesos(net_tcp * dp_percent / HUNDRED)
+    dp_balance = total_dp - reservation_fee
+    monthly_dp = pesos(dp_balance / dp_months)
+    loan_amount = pesos(net_tcp * loan_percent / HUNDRED)
+    monthly = monthly_amortization(loan_amount, to_decimal(rate), years)
+    return LoanQuote(plan, gross_tcp, discount, net_tcp, dp_percent, total_dp, reservation_fee,
+                     dp_balance, dp_months, monthly_dp, loan_amount, to_decimal(rate), years, monthly)
+
+
+@lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def bank_quote(price, discount, dp_percent, rate, years, reservation_fee=0):
+    """Bank financing: DP over 12 months, 90% of the net TCP is loanable."""
+    return _loan_quote('BANK', price, discount, dp_percent, rate, years, reservation_fee,
+                       BANK_LOANABLE_PERCENT, BANK_DP_MONTHS)
+
+
+@lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def pagibig_quote(price, discount, dp_percent, rate, years, reservation_fee=0):
+    """Pag-IBIG: DP over 16 months, the rest of the net TCP is the loan."""
+    return _loan_quote('PAGIBIG', price, discount, dp_percent, rate, years, reservation_fee,
+                       HUNDRED - to_decimal(dp_percent), PAGIBIG_DP_MONTHS)
+
+
+@lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def cash_quote(price, discount, cash_discount_percent):
+    """Cash: promo first, then the cash discount on what's left."""
+    gross_tcp = to_decimal(price)
+    discount = to_decimal(discount)
+    net_tcp = gross_tcp - discount
+    cash_discount_percent = to_decimal(cash_discount_percent)
+    cash_discount = pesos(net_tcp * cash_discount_percent / HUNDRED)
+    return CashQuote(gross_tcp, discount, net_tcp, cash_discount_percent, cash_discount, net_tcp - cash_discount)
+
+
+@lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def custom_quote(plan, price, discount, dp_percent, rate, years, reservation_fee=0):
+    """A what-if quote: whatever isn't paid as DP is the loan (for both bank and Pag-IBIG)."""
+    return _loan_quote(plan, price, discount, dp_percent, rate, years, reservation_fee,
+                       HUNDRED - to_decimal(dp_percent), DP_MONTHS[plan])
+
+
+@lru_cache(maxsize=256)
+def amortization_schedule(loan_amount, annual_interest_rate, years):
+    """
+    Month-by-month schedule as ((month, payment, interest, principal, balance), ...)
+    in centavos. Runs on plain ints (rate in hundredths of a percent), so a 30-year
+    schedule is 360 integer steps; the last payment absorbs the rounding.
+    """
+    payment = int(monthly_amortization(to_decimal(loan_amount), to_decimal(annual_interest_rate), years) * 100)
+    balance = int(to_decimal(loan_amount) * 100)
+    rate = int(to_decimal(annual_interest_rate) * 100)
+    per_month = 100 * 100 * 12   # hundredths of a percent, per month
+
+    rows = []
+    total_months = years * 12
+    for month in range(1, total_months + 1):
+        interest = (balance * rate * 2 + per_month) // (per_month * 2)   # round half up
+        principal = min(payment - interest, balance)
+        if month == total_months:
+            principal = balance
+        balance -= principal
+        rows.append((month, interest + principal, interest, principal, balance))
+    return tuple(rows)
+
+
+# --- HOUSE SHORTCUTS ---
+
+def house_bank_quote(house, discount, years):
+    return bank_quote(house.total_contract_price, to_decimal(discount), house.downpayment_percent,
+                      house.bank_interest_rate, years, house.reservation_fee)
+
+
+def house_pagibig_quote(house, discount, years):
+    return pagibig_quote(house.total_contract_price, to_decimal(discount), house.pagibig_downpayment_percent,
+                         house.interest_rate, years, house.reservation_fee)
+
+
+def house_cash_quote(house, discount):
+    return cash_quote(house.total_contract_price, to_decimal(discount), house.cash_discount_percent)
+
+
+def clear():
+    for memoized in (monthly_amortization, bank_quote, pagibig_quote, cash_quote, custom_quote, amortization_schedule):
+        memoized.cache_clear()
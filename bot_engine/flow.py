@@ -0,0 +1,252 @@
+"""
+Declarative conversation flow for the Messenger funnel.
+
+A flow is a list of route dicts, e.g.
+
+    {'step': ANY_STEP, 'on': QUICK_REPLY, 'payload': 'CALC_BANK_<int:house_id>',
+     'handler': calc_bank}
+
+compile_flow() turns them into a Flow whose dispatch table is keyed on
+(step, source, payload_type). Resolving an event costs a handful of dict
+lookups no matter how many routes exist, so adding a step does not make
+every message slower.
+"""
+import logging
+import re
+from collections import namedtuple
+
+
+logger = logging.getLogger(__name__)
+
+# Special steps
+ANY_STEP = '*'    # Matches whatever step the lead is on
+ALWAYS = '!'      # Checked before the guard (e.g. GET_STARTED resets)
+
+# Where the input came from
+QUICK_REPLY = 'quick_reply'
+POSTBACK = 'postback'
+TEXT = 'text'
+SOURCES = (QUICK_REPLY, POSTBACK, TEXT)
+
+CONVERTERS = {
+    'str': str,
+    'int': int,
+}
+
+_ARG_RE = re.compile(r"^(?P<prefix>[A-Z0-9_]+?)_<(?:(?P<conv>\w+):)?(?P<name>\w+)>$")
+
+Route = namedtuple('Route', 'step source payload_type arg_name converter handler next_step status')
+
+
+class Turn:
+    """One inbound Messenger event plus the lead it belongs to."""
+
+    def __init__(self, sender_id, lead, source=None, text='', qr_payload=None, postback_payload=None, persist=None):
+        self.sender_id = sender_id
+        self.lead = lead
+        self.persist = persist    # Saves the lead at the end of the turn (default: lead.save())
+        self.source = source
+        self.text = text
+        self.text_lower = text.lower()
+        self.qr_payload = qr_payload
+        self.postback_payload = postback_payload
+        self.changed = False
+        self.route_name = None    # Set by Flow.dispatch, used for metrics
+
+    @property
+    def payload(self):
+        if self.source == QUICK_REPLY:
+            return self.qr_payload
+        if self.source == POSTBACK:
+            return self.postback_payload
+        return None
+
+    @property
+    def first_name(self):
+        return self.lead.full_name.split()[0] if self.lead.full_name else "there"
+
+    def update(self, **fields):
+        """Sets fields on the lead and marks it for saving at the end of the turn."""
+        for name, value in fields.items():
+            setattr(self.lead, name, value)
+        self.changed = True
+
+    def save(self):
+        if self.changed:
+            if self.persist:
+                self.persist(self)
+            else:
+                self.lead.save()
+            self.changed = False
+
+
+class Flow:
+    """A compiled flow. Build it with compile_flow(), not directly."""
+
+    def __init__(self, table, keywords, contains, prefixes, guard=None):
+        self.table = table          # (step, source, payload_type) -> Route
+        self.keywords = keywords    # exact text keywords that have routes
+        self.contains = contains    # step -> ((word, Route), ...) for TEXT
+        self.prefixes = prefixes    # payload prefixes that carry an argument
+        self.guard = guard
+
+    def parse_payload(self, payload):
+        """
+        Splits a payload into (payload_type, raw_arg).
+        'CALC_BANK_5' -> ('CALC_BANK', '5'), 'VIEW_MODELS' -> ('VIEW_MODELS', None)
+        Cost depends on the payload length, not on the number of routes.
+        """
+        if not payload:
+            return None, None
+        if payload in self.keywords:
+            return payload, None
+
+        cut = payload.rfind('_')
+        while cut > 0:
+            prefix = payload[:cut]
+            if prefix in self.prefixes:
+                return prefix, payload[cut + 1:]
+            cut = payload.rfind('_', 0, cut)
+        return payload, None
+
+    def _lookup(self, step, source, payload_type, text_lower):
+        table = self.table
+        for step_key in (step, ANY_STEP):
+            if payload_type is not None:
+                route = table.get((step_key, source, payload_type))
+                if route:
+                    return route
+            if source == TEXT:
+                for word, route in self.contains.get(step_key, ()):
+                    if (word in text_lower) if isinstance(word, str) else word.search(text_lower):
+                        return route
+            route = table.get((step_key, source, None))
+            if route:
+                return route
+        return None
+
+    def resolve(self, turn, step=None):
+        """Returns (route, kwargs) for the turn, or (None, None) if nothing matches."""
+        if turn.source is None:
+            return None, None
+
+        if turn.source == TEXT:
+            payload_type = turn.text_lower if turn.text_lower in self.keywords else None
+            raw_arg = None
+        else:
+            payload_type, raw_arg = self.parse_payload(turn.payload)
+
+        if step == ALWAYS:
+            route = self.table.get((ALWAYS, turn.source, payload_type))
+        else:
+            route = self._lookup(step or turn.lead.current_step, turn.source, payload_type, turn.text_lower)
+        if route is None:
+            return None, None
+
+        kwargs = {}
+        if route.arg_name:
+            try:
+                kwargs[route.arg_name] = route.converter(raw_arg)
+            except (TypeError, ValueError):
+                logger.warning(f"Malformed payload for {route.payload_type}: {turn.payload}")
+                return None, None
+        return route, kwargs
+
+    def run(self, route, kwargs, turn):
+        if route.status:
+            turn.update(status=route.status)
+        if route.next_step:
+            turn.update(current_step=route.next_step)
+        route.handler(turn, **kwargs)
+        turn.save()
+
+    def dispatch(self, turn):
+        """
+        Runs the matching handler for the turn and saves the lead if it changed.
+        Returns the route that handled it (None when nothing matched).
+        """
+        route, kwargs = self.resolve(turn, step=ALWAYS)
+        if route is None:
+            if self.guard and self.guard(turn):
+                turn.route_name = self.guard.__name__
+                turn.save()
+                return None
+            route, kwargs = self.resolve(turn)
+            if route is None:
+                return None
+
+        turn.route_name = route.handler.__name__
+        self.run(route, kwargs, turn)
+        return route
+
+
+def _parse_pattern(pattern):
+    """'CALC_BANK_<int:house_id>' -> ('CALC_BANK', 'house_id', int)"""
+    if pattern is None or '<' not in pattern:
+        return pattern, None, None
+
+    match = _ARG_RE.match(pattern)
+    if not match:
+        raise ValueError(f"Bad payload pattern: {pattern}")
+    conv = match.group('conv') or 'str'
+    if conv not in CONVERTERS:
+        raise ValueError(f"Unknown converter '{conv}' in {pattern}")
+    return match.group('prefix'), match.group('name'), CONVERTERS[conv]
+
+
+def compile_flow(routes, guard=None):
+    """
+    Compiles route dicts into a Flow. Each route accepts:
+      step      -- lead.current_step it applies to (ANY_STEP / ALWAYS allowed)
+      on        -- QUICK_REPLY, POSTBACK or TEXT
+      payload   -- exact payload, 'PREFIX_<arg>' pattern, or None for "anything"
+      keywords  -- (TEXT only) exact lowercase messages, e.g. ('hi', 'start')
+      contains  -- (TEXT only) words to look for anywhere in the message, or compiled
+                   regexes (searched) where a plain substring is too loose
+      handler   -- callable(turn, **args)
+      next_step / status -- applied to the lead before the handler runs
+    """
+    table = {}
+    keywords = set()
+    contains = {}
+    prefixes = set()
+
+    for spec in routes:
+        step = spec.get('step', ANY_STEP)
+        source = spec['on']
+        if source not in SOURCES:
+            raise ValueError(f"Unknown source '{source}'")
+        handler = spec['handler']
+
+        if source == TEXT:
+            if spec.get('payload'):
+                raise ValueError("TEXT routes use 'keywords' or 'contains', not 'payload'")
+            keys = [(word, None, None) for word in spec.get('keywords', ())]
+        else:
+            keys = [_parse_pattern(spec.get('payload'))]
+
+        words = spec.get('contains', ())
+        if words and step == ALWAYS:
+            raise ValueError("'contains' routes cannot run before the guard")
+        if not keys and not words:
+            keys = [(None, None, None)]
+
+        for payload_type, arg_name, converter in keys:
+            route = Route(step, source, payload_type, arg_name, converter, handler,
+                          spec.get('next_step'), spec.get('status'))
+            key = (step, source, payload_type)
+            if key in table:
+                raise ValueError(f"Duplicate route for {key}")
+            table[key] = route
+            if arg_name:
+                prefixes.add(payload_type)
+            elif payload_type is not None:
+                keywords.add(payload_type)
+
+        if words:
+            route = Route(step, source, None, None, None, handler,
+                          spec.get('next_step'), spec.get('status'))
+            contains.setdefault(step, ())
+            contains[step] += tuple((word, route) for word in words)
+
+    return Flow(table, frozenset(keywords), contains, frozenset(prefixes), guard)
@@ -0,0 +1,97 @@
+"""
+The Gemini fallback for typed questions the funnel has no route for.
+
+FAQ/live house answers (knowledge.py) come first, then the circuit breaker
+and the daily token budgets (usage.py); only then is Gemini called, with the
+recent conversation and the lead's funnel answers (conversation.py).
+"""
+import logging
+import time
+
+from decouple import config
+
+from . import breakers, clients, conversation, knowledge, metrics, usage
+
+
+logger = logging.getLogger(__name__)
+
+
+GEMINI_FALLBACK_REPLY = "Pasensya na, busy lang ang system. Type 'house' para sa models o 'start' para mag-simula uli."
+GEMINI_TIMEOUT = config('GEMINI_TIMEOUT', default=10, cast=int)
+
+# Facts are no longer part of the instruction: knowledge.py retrieves the relevant FAQ entries
+# and live house data per question, so the instruction is the same (and cacheable) for every call.
+SYSTEM_INSTRUCTION = """
+You are 'PHirst Bot', a helpful sales assistant for Jeric, a real estate agent for Magalang East Phirst Park Homes.
+Answer in Taglish. Be professional but friendly.
+
+CONTEXT:
+- The user's message may start with [Facts: ...], our FAQ entries and live house data (prices, reservation fees, DP, monthly) that match the question. These are the only facts you know about PHirst; if the answer isn't there, say Jeric can confirm it. Never contradict them.
+- It may also start with [Lead: ...], what we already know about them (name, budget, financing, timeline, house). Use it, don't ask for it again, and don't repeat the brackets.
+- Earlier messages in the chat are your previous answers to the same person.
+
+RULES:
+1. Keep answers under 3 sentences.
+2. If asked about price or computation, say: "Type 'house' para makita ang models at direct computations natin."
+3. Always end with a nudge to Jeric: "Gusto mo bang kausapin si Jeric? Click 'Ask Agent' sa menu."
+""".strip()
+
+def gemini_model():
+    """One GenerativeModel per process, carrying the system instruction (the SDK loads on first use)."""
+    return clients.get('gemini_model', lambda: clients.genai().GenerativeModel(
+        'gemini-2.5-flash', system_instruction=SYSTEM_INSTRUCTION,
+    ))
+
+_warned_missing_key = False
+
+def _warn_missing_key():
+    """Logs the missing key once per process instead of once per message."""
+    global _warned_missing_key
+    if not _warned_missing_key:
+        _warned_missing_key = True
+        logger.error("GEMINI_API_KEY is not set; typed questions get the fallback reply instead of Gemini")
+
+def get_gemini_response(user_text, lead=None):
+    # FAQ + live house data first: a clear match is answered without calling Gemini at all
+    found = knowledge.lookup(user_text, lead)
+    if found.reply:
+        if lead is not None:
+            conversation.remember(lead.psid, user_text, found.reply)
+        return found.reply
+
+    # Daily token budgets: heavy users get a cached/canned answer instead of another call.
+    # Checked before the breaker, so an over-budget question never takes the half-open probe.
+    psid = lead.psid if lead is not None else None
+    scope = usage.over_budget(psid)
+    if scope:
+        return usage.budget_reply(psid, user_text, scope)
+
+    # No key is a config problem, not a Gemini outage: don't count it against the breaker
+    if not clients.genai_configured():
+        _warn_missing_key()
+        return GEMINI_FALLBACK_REPLY
+
+    # Fast fallback while Gemini is failing/slow, instead of making the user wait for a timeout
+    if not breakers.GEMINI.allow():
+        return GEMINI_FALLBACK_REPLY
+
+    started = time.perf_counter()
+    try:
+        # Recent exchanges + what the funnel knows about the lead, within a fixed token budget
+        contents = conversation.build_contents(user_text, lead, found.facts)
+        with metrics.timed('gemini'):
+            response = gemini_model().generate_content(contents, request_options={'timeout': GEMINI_TIMEOUT})
+        reply = response.text
+        elapsed = time.perf_counter() - started
+        breakers.GEMINI.record(elapsed)
+    except Exception as e:
+        breakers.GEMINI.record(time.perf_counter() - started, ok=False)
+        # CRITICAL FIX: exc_info=True captures the full traceback in your server logs
+        logger.error(f"Gemini API Error: {e}", exc_info=True)
+        return GEMINI_FALLBACK_REPLY
+
+    usage.record(psid, response, contents, reply, elapsed)
+    usage.remember_answer(psid, user_text, reply)
+    if lead is not None:
+        conversation.remember(lead.psid, user_text, reply)
+    return reply
@@ -0,0 +1,70 @@
+"""
+Webhook handlers, one module per concern, each loaded the first time it's needed:
+
+    funnel        greetings, budget/financing/timeline capture, models carousel
+    computations  Bank/Pag-IBIG/Cash cards, affordability, what-if quotes
+    media         photo/video requests and the Gemini fallback
+    agent         HOT/WARM phone capture, reservations, handover to Jeric
+    comments      page comments (queued for the comment worker)
+
+The central routing table (router.py) names handlers as 'module.function'
+strings instead of importing them:
+
+    {'on': QUICK_REPLY, 'payload': 'CALC_BANK_<int:house_id>', 'handler': lazy('computations.calc_bank')}
+
+so the webhook core (views, router, flow, leads, messenger) stays small, a
+worker only ever imports the handlers its traffic reaches, and a change to
+the computation cards can't break the import of the hot path. Each module
+can also be imported and timed on its own.
+"""
+import importlib
+import logging
+import sys
+import time
+
+from .. import metrics
+
+
+logger = logging.getLogger(__name__)
+
+MODULES = ('funnel', 'computations', 'media', 'agent', 'comments')
+
+MODULE_LOADS = metrics.register(metrics.Counter(
+    'bot_handler_module_loads_total', 'Handler modules imported on first use', ('module',),
+))
+
+
+def load(name):
+    """The handler module `name`, imported on first call."""
+    if name not in MODULES:
+        raise ValueError(f"Unknown handler module '{name}'")
+    path = f"{__name__}.{name}"
+    module = sys.modules.get(path)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(path)
+        MODULE_LOADS.inc(name)
+        logger.info(f"Loaded handlers.{name} in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return module
+
+
+class lazy:
+    """
+    A 'module.function' handler reference that imports its module on the first call.
+    Keeps the function's __name__, which is what shows up as the route in metrics.
+    """
+
+    def __init__(self, ref):
+        self.module, _, self.__name__ = ref.partition('.')
+        if self.module not in MODULES or not self.__name__:
+            raise ValueError(f"Bad handler reference '{ref}'")
+
+    def resolve(self):
+        # Looked up every call (a dict hit once loaded), so patching the module function works
+        return getattr(load(self.module), self.__name__)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"lazy('{self.module}.{self.__name__}')"
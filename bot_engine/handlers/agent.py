@@ -0,0 +1,107 @@
+"""
+Handing leads over to Jeric: reservations and tripping requests, phone
+capture for HOT/WARM leads (the funnel guard), Telegram alerts and passing
+the thread to the Meta inbox.
+"""
+import logging
+import re
+from datetime import timedelta
+
+from decouple import config
+from django.utils import timezone
+
+from .. import alerts, messenger, outbound
+from ..models import HouseModel
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_ph_phone_number(text):
+    # Matches 09xxxxxxxxx or +639xxxxxxxxx
+    pattern = r"^(09|\+639)\d{9}$"
+    return bool(re.match(pattern, text.strip()))
+
+def pass_to_agent(psid):
+    url = f"{outbound.GRAPH_API_URL}/v21.0/me/pass_thread_control?access_token={config('FB_PAGE_ACCESS_TOKEN')}"
+    payload = {
+        "recipient": {"id": psid},
+        "target_app_id": 263902037430900, # Fixed ID for Meta Inbox
+        "metadata": "Handover to human agent"
+    }
+    outbound.post('graph', url, json=payload)
+
+def hot_lead_guard(turn):
+    """
+    THE HARDENED GATEKEEPER & PHONE CAPTURE.
+    HOT/WARM leads only get phone capture (or silence). Returns True if the turn was consumed.
+    """
+    lead = turn.lead
+    if lead.status not in ['HOT', 'WARM']:
+        return False
+
+    # 1. Backdoor to reset the bot
+    if turn.text_lower == 'reset bot':
+        turn.update(status='COLD', current_step='START')
+        turn.save()
+        messenger.send_fb_message(turn.sender_id, "Bot has been reset. Type 'start' to begin.")
+        return True
+
+    # 2. If they already finished (Step is COMPLETED), bot stays completely silent.
+    if lead.current_step == 'COMPLETED':
+        return True
+
+    # 3. We are STILL waiting for a phone number
+    if not is_ph_phone_number(turn.text):
+        # VALIDATION FAILED: They typed text instead of a valid number
+        if turn.text: # Only reply if they actually typed something
+            messenger.send_fb_message(turn.sender_id, "Pasensya na, please enter a valid 11-digit phone number (e.g., 09171234567) para ma-forward ko kay Jeric. 😊")
+        return True
+
+    turn.update(phone_number=turn.text, current_step='COMPLETED')
+    intent = "RESERVATION" if lead.status == 'HOT' else "TRIPPING"
+
+    # --- TELEGRAM ALERT WITH COOLDOWN ---
+    now = timezone.now()
+
+    # Check if 30 mins have passed since last alert to prevent spam
+    if not lead.last_alert_sent or lead.last_alert_sent < now - timedelta(minutes=30):
+        alert_msg = (
+            f"🔥 **HOT LEAD: {intent}**\n"
+            f"👤 Name: {lead.full_name}\n"
+            f"📞 Phone: `{turn.text}`\n"
+            f"🏠 Unit: {lead.interested_house.name if getattr(lead, 'interested_house', None) else 'N/A'}"
+        )
+        alerts.send_telegram_alert(alert_msg)
+        turn.update(last_alert_sent=now)
+
+    # --- FB REPLY ---
+    messenger.send_fb_message(turn.sender_id, f"Salamat! Na-save ko na ang number mo. Tatawagan ka ni Jeric shortly. 😊")
+
+    turn.save()
+    pass_to_agent(turn.sender_id)
+    return True
+
+def reserve(turn, house_id):
+    house = HouseModel.objects.get(id=house_id)
+    turn.update(interested_house=house)
+    messenger.send_fb_message(turn.sender_id, f"Great choice! Para sa {house.name}, please provide your contact number para ma-assist ka ni Jeric sa reservation process.")
+
+def schedule_tripping(turn, house_id):
+    house = HouseModel.objects.get(id=house_id)
+    turn.update(interested_house=house)
+    messenger.send_fb_message(turn.sender_id, f"Noted! Send your phone number para ma-confirm ang tripping schedule mo para sa {house.name}.")
+
+def talk_to_agent(turn):
+    """Persistent menu 'Talk to Agent'"""
+    # Notify Jeric on Telegram
+    alerts.send_telegram_alert(f"🙋 **AGENT REQUESTED**\n👤 Name: {turn.lead.full_name}\n📍 Action: User clicked 'Talk to Agent' in the menu.")
+
+    # Inform User & Pass Control
+    messenger.send_fb_message(turn.sender_id, "Wait lang po, nililipat ko na ang chat kay Jeric. He will assist you shortly! 😊")
+    pass_to_agent(turn.sender_id)
+
+def chat_with_agent(turn):
+    alerts.send_telegram_alert(f"🙋 **AGENT REQUESTED**\nUser: {turn.lead.full_name}\nAction: Please check the Meta Inbox.")
+    messenger.send_fb_message(turn.sender_id, "Wait lang po, nililipat ko na ang chat kay Jeric. He will assist you shortly! 😊")
+    pass_to_agent(turn.sender_id)
@@ -0,0 +1,11 @@
+"""
+Page comments. Only queued here; the public reply and the DM go out from the
+comment worker (see bot_engine/comments.py), so a viral post never slows
+down Messenger replies.
+"""
+from .. import comments, metrics
+
+
+def handle_changes(changes):
+    with metrics.trace('comment') as span:
+        span.route = 'comment_queued' if comments.ingest(changes) else 'comment_skipped'
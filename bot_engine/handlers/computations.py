@@ -0,0 +1,262 @@
+"""
+Numbers: the Bank / Pag-IBIG / Cash computation cards, "kaya ko 20k a month"
+affordability answers and "what if 20% dp over 25 years" quotes.
+"""
+import logging
+import re
+from decimal import Decimal
+
+from .. import affordability, catalog, financing, messenger, payloads, promos, simulator
+from ..models import HouseModel
+from . import lazy
+
+
+logger = logging.getLogger(__name__)
+
+# Questions the simulator can't answer go to the media/Gemini fallback
+media_or_gemini = lazy('media.media_or_gemini')
+
+
+FINANCING_LABELS = {'BANK': 'Bank', 'PAGIBIG': 'Pag-IBIG'}
+
+
+def calc_bank(turn, house_id):
+    send_bank_computation(turn.sender_id, house_id)
+
+def calc_pagibig(turn, house_id):
+    send_pagibig_computation(turn.sender_id, house_id)
+
+def calc_cash(turn, house_id):
+    send_cash_computation(turn.sender_id, house_id)
+
+def choose_financing(turn, house_id):
+    """RE-TRIGGER COMPUTATION SELECTOR (Back to Options)"""
+    ask_financing_type(turn.sender_id, house_id)
+
+def ask_financing_type(recipient_id, house_id):
+    """
+    Step 1: Ask the user which financing plan they want.
+    """
+    template = payloads.cached_template(('ask_financing', int(house_id)), lambda: build_financing_question(house_id))
+    if template is None:
+        messenger.send_fb_message(recipient_id, "Error: House not found.")
+        return
+    messenger.send_payload(template.render(recipient_id))
+
+def build_financing_question(house_id):
+    try:
+        house = HouseModel.objects.get(id=house_id)
+    except HouseModel.DoesNotExist:
+        return None
+    text = f"Para sa {house.name}, anong financing plan ang gusto mong makita? 🏦"
+    return payloads.quick_reply_template(text, [
+        ("Bank Financing 🏦", f"CALC_BANK_{house_id}"),
+        ("Pag-IBIG 🏠", f"CALC_PAGIBIG_{house_id}"),
+        ("Cash Payment 💵", f"CALC_CASH_{house_id}")
+    ])
+
+def computation_buttons(house_id):
+    return [
+        {"type": "postback", "title": "Reserve Now 📝", "payload": f"RESERVE_{house_id}"},
+        {"type": "postback", "title": "Schedule Tripping 📅", "payload": f"SCHEDULE_TRIPPING_{house_id}"},
+        {"type": "postback", "title": "Back to Options 🔙", "payload": f"COMPUTE_{house_id}"}
+    ]
+
+def send_computation(recipient_id, kind, house_id, build):
+    """Sends a computation card, built once per house until the catalog changes."""
+    template = payloads.cached_template((kind, int(house_id)), lambda: build(house_id))
+    if template is None:
+        messenger.send_fb_message(recipient_id, "System Error: Cannot find house details.")
+        return
+    messenger.send_payload(template.render(recipient_id))
+
+def promo_line(resolution):
+    if not resolution.promos:
+        return ""
+    return f"\n🎉 PROMO: {promos.describe(resolution)} (-₱{resolution.discount:,.0f})"
+
+def send_bank_computation(recipient_id, house_id):
+    send_computation(recipient_id, 'bank', house_id, build_bank_computation)
+
+def build_bank_computation(house_id):
+    """Step 2: the BANK specific computation card (None if the house doesn't exist)."""
+    try:
+        house = HouseModel.objects.get(id=house_id)
+    except HouseModel.DoesNotExist:
+        return None
+    promo = promos.resolve(house.id)
+    discount = promo.discount
+
+    # Same DP/loan for every term, only the amortization changes
+    quote_15y = financing.house_bank_quote(house, discount, 15)
+    quote_10y = financing.house_bank_quote(house, discount, 10)
+    quote_05y = financing.house_bank_quote(house, discount, 5)
+
+    text = (
+        f"🏦 **BANK FINANCING COMPUTATION**\n"
+        f"🏠 Unit: {house.name}\n"
+        f"──────────────────\n"
+        f"💰 TCP: ₱{quote_15y.gross_tcp:,.2f}"
+        f"{promo_line(promo)}\n"
+        f"✅ **NET TCP: ₱{quote_15y.net_tcp:,.2f}**\n"
+        f"──────────────────\n"
+        f"📉 **DOWNPAYMENT (12 Mos):**\n"
+        f"• Required DP ({int(quote_15y.dp_percent)}%): ₱{quote_15y.total_dp:,.2f}\n"
+        f"• Less Reservation: -₱{quote_15y.reservation_fee:,.2f}\n"
+        f"👉 **Monthly DP: ₱{quote_15y.monthly_dp:,.2f}** /mo\n"
+        f"──────────────────\n"
+        f"🏦 **EST. MONTHLY AMORTIZATION:**\n"
+        f"• 15 Years: ₱{quote_15y.monthly:,.2f}\n"
+        f"• 10 Years: ₱{quote_10y.monthly:,.2f}\n"
+        f"• 05 Years: ₱{quote_05y.monthly:,.2f}\n\n"
+        "Note: Rates are subject to bank approval."
+    )
+
+    return payloads.button_template(text, computation_buttons(house_id))
+
+def send_pagibig_computation(recipient_id, house_id):
+    send_computation(recipient_id, 'pagibig', house_id, build_pagibig_computation)
+
+def build_pagibig_computation(house_id):
+    """The PAG-IBIG computation card (None if the house doesn't exist)."""
+    try:
+        house = HouseModel.objects.get(id=house_id)
+    except HouseModel.DoesNotExist:
+        return None
+    promo = promos.resolve(house.id)
+    discount = promo.discount
+
+    quote_30y = financing.house_pagibig_quote(house, discount, 30)
+    quote_20y = financing.house_pagibig_quote(house, discount, 20)
+    quote_10y = financing.house_pagibig_quote(house, discount, 10)
+
+    text = (
+        f"🏠 **PAG-IBIG COMPUTATION**\n"
+        f"Model: {house.name}\n"
+        f"──────────────────\n"
+        f"💰 TCP: ₱{quote_30y.gross_tcp:,.2f}"
+        f"{promo_line(promo)}\n"
+        f"✅ **NET TCP: ₱{quote_30y.net_tcp:,.2f}**\n"
+        f"──────────────────\n"
+        f"📉 **DOWNPAYMENT (16 Mos):**\n" # Explicitly 16 months
+        f"• Required DP ({int(quote_30y.dp_percent)}%): ₱{quote_30y.total_dp:,.2f}\n"
+        f"• Less Reservation: -₱{quote_30y.reservation_fee:,.2f}\n"
+        f"👉 **Monthly DP: ₱{quote_30y.monthly_dp:,.2f}** /mo\n"
+        f"──────────────────\n"
+        f"🏠 **EST. MONTHLY AMORTIZATION:**\n"
+        f"• 30 Years: ₱{quote_30y.monthly:,.2f}\n"
+        f"• 20 Years: ₱{quote_20y.monthly:,.2f}\n"
+        f"• 10 Years: ₱{quote_10y.monthly:,.2f}\n"
+    )
+
+    return payloads.button_template(text, computation_buttons(house_id))
+
+def send_cash_computation(recipient_id, house_id):
+    send_computation(recipient_id, 'cash', house_id, build_cash_computation)
+
+def build_cash_computation(house_id):
+    """The CASH payment computation card (None if the house doesn't exist)."""
+    try:
+        house = HouseModel.objects.get(id=house_id)
+    except HouseModel.DoesNotExist:
+        return None
+    quote = financing.house_cash_quote(house, promos.resolve(house.id).discount)
+    promo_text = f"\n🎉 Promo: -₱{quote.discount:,.2f}" if quote.discount > 0 else ""
+
+    text = (
+        f"💵 **CASH PAYMENT COMPUTATION**\n"
+        f"🏠 Model: {house.name}\n"
+        f"──────────────────\n"
+        f"💰 TCP: ₱{quote.gross_tcp:,.2f}"
+        f"{promo_text}"
+        f"\n✨ **Cash Discount ({quote.cash_discount_percent}%): -₱{quote.cash_discount:,.2f}**\n"
+        f"──────────────────\n"
+        f"💎 **FINAL CASH PRICE: ₱{quote.cash_price:,.2f}**\n"
+        f"──────────────────\n"
+        f"Note: Full payment is required within 30 days to avail this discount."
+    )
+
+    return payloads.button_template(text, computation_buttons(house_id))
+
+def parse_peso_amount(text):
+    """
+    '20k a month' -> 20000.0, 'kaya ko 18,500 monthly' -> 18500.0, None if there's no amount.
+    Takes the first plausible amount (>= 1000, or with a k), so '2 kids, 25k a month' is 25000.0.
+    """
+    for match in re.finditer(r"(\d[\d,]*(?:\.\d+)?)\s*(k\b)?", text):
+        amount = float(match.group(1).replace(',', ''))
+        if match.group(2):
+            amount *= 1000
+        if amount >= 1000:
+            return amount
+    return None
+
+def afford_monthly(turn):
+    """'Kaya ko 20k a month' -> the models that fit, best first (no Gemini, no queries once warm)."""
+    amount = parse_peso_amount(turn.text_lower)
+    if amount is None:
+        return what_if_quote(turn)
+
+    # Not `financing`: that's the quote module
+    plan = turn.lead.financing_type if turn.lead.financing_type in FINANCING_LABELS else 'BANK'
+    years = affordability.DEFAULT_TERMS[plan]
+    plan_label = f"{FINANCING_LABELS[plan]}, {years} yrs"
+    rows = affordability.recommend(amount, plan, years)
+    if not rows:
+        cheapest = affordability.get_tables()[(plan, years)].cheapest()
+        if cheapest is None:
+            return messenger.send_fb_message(turn.sender_id, "Pasensya na, wala kaming available units sa ngayon.")
+        house = catalog.get_index().houses[cheapest.house_id]
+        return messenger.send_fb_message(
+            turn.sender_id,
+            f"Pasensya na, wala pang model na pasok sa ₱{amount:,.0f}/mo ({plan_label}). "
+            f"Ang pinaka-abot kaya ay ang {house.name} sa ₱{cheapest.monthly:,.2f}/mo."
+        )
+
+    house_ids = tuple(row.house_id for row in rows)
+    template = payloads.cached_template(
+        ('afford', plan, house_ids),
+        lambda: payloads.generic_template([catalog.get_index().cards[(house_id, plan)] for house_id in house_ids]),
+    )
+    messenger.send_fb_message(turn.sender_id, f"Sa budget na ₱{amount:,.0f}/mo ({plan_label}), eto ang mga models na pasok:")
+    messenger.send_payload(template.render(turn.sender_id))
+
+def parse_what_if(text):
+    """'what if 20% dp over 25 years' -> (Decimal('20'), 25); either can be None."""
+    dp = re.search(r"(\d{1,2}(?:\.\d+)?)\s*%", text)
+    years = re.search(r"(\d{1,2})\s*(?:years?|yrs?|taon)", text)
+    return (Decimal(dp.group(1)) if dp else None), (int(years.group(1)) if years else None)
+
+def what_if_quote(turn):
+    """Custom DP/term questions get real numbers from the simulator instead of Gemini."""
+    text = turn.text_lower
+    dp_percent, years = parse_what_if(text)
+    if (dp_percent is None and years is None) or (dp_percent is not None and dp_percent > simulator.MAX_DP_PERCENT) \
+            or (years is not None and not 1 <= years <= simulator.MAX_YEARS):
+        return media_or_gemini(turn)
+
+    index = catalog.get_index()
+    house_id = next((house_id for house_id, house in index.houses.items() if house.name.lower() in text),
+                    turn.lead.interested_house_id)
+    if house_id not in index.houses:
+        return messenger.send_fb_message(turn.sender_id, "Para ma-compute ko, pakisama ang model name (e.g. '20% dp 25 years Unna'). 😊")
+
+    if 'pag-ibig' in text or 'pagibig' in text:
+        plan = 'PAGIBIG'
+    else:
+        plan = turn.lead.financing_type if turn.lead.financing_type in simulator.PLANS else 'BANK'
+    quote = simulator.simulate(house_id, plan, dp_percent, years)
+
+    message = (
+        f"📊 What-if para sa {index.houses[house_id].name} ({FINANCING_LABELS[plan]}):\n"
+        f"• DP {quote.dp_percent.normalize():f}%: ₱{quote.total_dp:,.2f} (₱{quote.monthly_dp:,.2f}/mo for {quote.dp_months} mos)\n"
+        f"• Loan: ₱{quote.loan_amount:,.2f}\n"
+        f"👉 **{quote.years} years: ₱{quote.monthly:,.2f}/mo**\n\n"
+        "Estimate lang po ito, subject to approval."
+    )
+    url = simulator.simulator_url(house_id, plan)
+    if not url:
+        return messenger.send_fb_message(turn.sender_id, message)
+    messenger.send_template(turn.sender_id, payloads.button_template(message, [
+        {"type": "web_url", "url": url, "title": "Try other DP/term 🎚️", "webview_height_ratio": "tall"},
+    ]))
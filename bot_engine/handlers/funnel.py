@@ -0,0 +1,110 @@
+"""
+The lead funnel: greetings, budget -> financing -> timeline capture, the
+re-prompts while we wait for a button, and the house models carousel.
+"""
+import logging
+
+from .. import catalog, conversation, messenger, payloads
+from ..payloads import slot
+
+
+logger = logging.getLogger(__name__)
+
+
+BUDGET_OPTIONS = [("2M-3M", "BUDGET_2_3"), ("3M-4M", "BUDGET_3_4"), ("4M+", "BUDGET_4_UP")]
+FINANCING_OPTIONS = [("Bank Financing", "FIN_BANK"), ("Cash", "FIN_CASH"), ("Pag-IBIG", "FIN_PAGIBIG")]
+TIMELINE_OPTIONS = [("ASAP", "TIME_ASAP"), ("1-3 Months", "TIME_1_3"), ("Just looking", "TIME_LOOKING")]
+FINANCING_MAP = {'BANK': 'BANK', 'CASH': 'CASH', 'PAGIBIG': 'PAGIBIG'}
+
+BUTTONS_ONLY_MSG = "Please use the buttons below para makapag-proceed tayo. 👇"
+
+# Fixed prompts, serialized once at import (see payloads.py)
+GREETING_FULL = payloads.quick_reply_template(f"Hi {slot('name')}! 👋 To help you find the best home, ano ang budget range mo?", BUDGET_OPTIONS)
+GREETING = payloads.quick_reply_template(f"Hi {slot('name')}! 👋 Ano ang budget range mo?", BUDGET_OPTIONS)
+ASK_FINANCING = payloads.quick_reply_template("Anong financing plan ang balak mo?", FINANCING_OPTIONS)
+ASK_TIMELINE = payloads.quick_reply_template("Kailan mo balak kumuha ng unit?", TIMELINE_OPTIONS)
+REPROMPT_BUDGET = payloads.quick_reply_template(f"{BUTTONS_ONLY_MSG}\n\nAno ang budget range mo?", BUDGET_OPTIONS)
+REPROMPT_FINANCING = payloads.quick_reply_template(f"{BUTTONS_ONLY_MSG}\n\nAnong financing plan ang balak mo?", FINANCING_OPTIONS)
+REPROMPT_TIMELINE = payloads.quick_reply_template(f"{BUTTONS_ONLY_MSG}\n\nKailan mo balak kumuha ng unit?", TIMELINE_OPTIONS)
+
+
+def greet_and_ask_budget(turn):
+    conversation.forget(turn.sender_id)
+    messenger.send_template(turn.sender_id, GREETING_FULL, name=turn.first_name)
+
+def greet(turn):
+    messenger.send_template(turn.sender_id, GREETING, name=turn.first_name)
+
+def capture_budget(turn, bucket):
+    turn.update(budget_range=turn.text)
+    messenger.send_template(turn.sender_id, ASK_FINANCING)
+
+def capture_financing(turn, plan):
+    turn.update(financing_type=FINANCING_MAP.get(plan))
+    messenger.send_template(turn.sender_id, ASK_TIMELINE)
+
+def capture_timeline(turn, timeline):
+    turn.update(timeline=turn.text)
+    messenger.send_fb_message(turn.sender_id, "Salamat! Narito ang mga available models:")
+    lead = turn.lead
+    send_house_models(turn.sender_id, location_filter=lead.location_pref, budget=lead.budget_range, financing_type=lead.financing_type)
+
+# MID-FUNNEL VALIDATION (The "Missing Buttons" Fix)
+def reprompt_budget(turn):
+    messenger.send_template(turn.sender_id, REPROMPT_BUDGET)
+
+def reprompt_financing(turn):
+    messenger.send_template(turn.sender_id, REPROMPT_FINANCING)
+
+def reprompt_timeline(turn):
+    messenger.send_template(turn.sender_id, REPROMPT_TIMELINE)
+
+def show_models(turn):
+    send_house_models(turn.sender_id)
+
+def more_models(turn, cursor):
+    """'See more' on the carousel: the cursor says which page comes next."""
+    try:
+        location, band, financing, offset = catalog.parse_cursor(cursor)
+    except ValueError:
+        logger.warning(f"Bad carousel cursor: {cursor}")
+        return send_house_models(turn.sender_id)
+    send_models_page(turn.sender_id, location, band, financing, offset)
+
+def send_house_models(recipient_id, location_filter=None, budget=None, financing_type=None, offset=0):
+    """
+    Sends one page of the models carousel, narrowed by location, budget and financing.
+    If nothing fits the lead's budget we show every model instead of a dead end.
+    """
+    location = catalog.resolve_location(location_filter)
+    if location is None:
+        return messenger.send_fb_message(recipient_id, f"Pasensya na, wala kaming available units sa {location_filter} sa ngayon.")
+    band = catalog.resolve_band(budget)
+    financing = catalog.resolve_financing(financing_type)
+
+    index = catalog.get_index()
+    if band != catalog.ANY and not index.lookup(location, band, financing):
+        band = catalog.ANY
+    return send_models_page(recipient_id, location, band, financing, offset)
+
+def send_models_page(recipient_id, location, band, financing, offset):
+    # Pages are the same for everyone, so each one is built once per catalog change
+    template = payloads.cached_template(
+        ('carousel', location, band, financing, offset),
+        lambda: build_models_page(location, band, financing, offset),
+    )
+    if template is None:
+        if offset:
+            return messenger.send_fb_message(recipient_id, "Yan na po lahat ng available models natin. 😊")
+        where = f" sa {location}" if location != catalog.ANY else ""
+        return messenger.send_fb_message(recipient_id, f"Pasensya na, wala kaming available units{where} sa ngayon.")
+    return messenger.send_payload(template.render(recipient_id))
+
+def build_models_page(location, band, financing, offset):
+    """One carousel page from the catalog index (None if the page is empty)."""
+    elements, next_offset, total = catalog.get_index().page(location, band, financing, offset)
+    if not elements:
+        return None
+    if next_offset is not None:
+        elements = elements + [catalog.more_card(location, band, financing, next_offset, total)]
+    return payloads.generic_template(elements)
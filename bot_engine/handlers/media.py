@@ -0,0 +1,84 @@
+"""
+Photo / video requests ("pa send ng pics ng Calista"), and Gemini for any
+other typed question the funnel has no route for.
+"""
+import logging
+
+from .. import catalog, gemini, messenger, payloads
+
+
+logger = logging.getLogger(__name__)
+
+
+MEDIA_TRIGGERS = ['pic', 'picture', 'photo', 'deliverable', 'turnover', 'mukha', 'itsura', 'model', 'video', 'vid', 'tour', 'virtual']
+VIDEO_TRIGGERS = ['video', 'vid', 'tour', 'virtual']
+TURNOVER_TRIGGERS = ['turnover', 'deliverable', 'bare']
+
+GALLERY_CATEGORIES = {
+    'DRESSED': "dressed-up model unit",
+    'TURNOVER': "turnover/deliverable unit",
+}
+GALLERY_MAX_CARDS = 10   # Messenger's cap on generic template elements
+
+
+def find_house(text_lower):
+    """The active house named in the text, from the in-memory catalog index (None if none is)."""
+    return next((house for house in catalog.get_index().houses.values() if house.name.lower() in text_lower), None)
+
+def build_gallery(house, category):
+    """
+    Every photo of house in category as one generic-template carousel, a card
+    per photo with the full gallery link as its button. None if there are no photos.
+    Cached per (house, category) by payloads.cached_template, so it's rebuilt only
+    when a house or image changes.
+    """
+    image_urls = list(house.images.filter(category=category).order_by('id').values_list('image_url', flat=True))
+    if not image_urls:
+        return None
+    category_name = GALLERY_CATEGORIES[category]
+    gallery_link = house.dressed_gallery_link if category == 'DRESSED' else house.turnover_gallery_link
+    shown = image_urls[:GALLERY_MAX_CARDS]
+
+    elements = []
+    for number, image_url in enumerate(shown, start=1):
+        card = {
+            "title": f"{house.name} ({number}/{len(image_urls)})"[:80],
+            "image_url": image_url,
+            "subtitle": f"Pictures ng {category_name}. I-swipe para sa iba pa 👉" if number == 1 else category_name,
+        }
+        if gallery_link:
+            card["default_action"] = {"type": "web_url", "url": gallery_link}
+            card["buttons"] = [{"type": "web_url", "url": gallery_link, "title": "Full gallery 📷"}]
+        elements.append(card)
+    return payloads.generic_template(elements)
+
+def media_or_gemini(turn):
+    """THE UNIFIED MEDIA INTERCEPTOR & GEMINI FALLBACK"""
+    sender_id = turn.sender_id
+    user_text_lower = turn.text_lower
+
+    if any(word in user_text_lower for word in MEDIA_TRIGGERS):
+        # No query on the way to a cached gallery; a house renamed or deactivated since just isn't matched
+        house = find_house(user_text_lower)
+
+        if house is not None:
+            # --- VIDEO LOGIC FIRST ---
+            if any(word in user_text_lower for word in VIDEO_TRIGGERS):
+                if house.virtual_tour_link:
+                    messenger.send_fb_message(sender_id, f"Eto po ang virtual tour video para sa {house.name}: {house.virtual_tour_link}")
+                else:
+                    messenger.send_fb_message(sender_id, f"Pasensya na, wala pa kaming naka-upload na video para sa {house.name}. Pwede kitang i-connect kay Jeric para ma-assist ka.")
+                return
+
+            # --- IMAGE LOGIC (one swipeable gallery, 1 Graph call) ---
+            category = 'TURNOVER' if any(word in user_text_lower for word in TURNOVER_TRIGGERS) else 'DRESSED'
+            template = payloads.cached_template(('gallery', house.id, category), lambda: build_gallery(house, category))
+            if template is None:
+                messenger.send_fb_message(sender_id, f"Pasensya na, wala pa akong hawak na picture para sa {house.name}. Pwede kitang i-connect kay Jeric.")
+            else:
+                messenger.send_payload(template.render(sender_id))
+            return
+
+    # If it's not a media request, let Gemini handle it
+    ai_reply = gemini.get_gemini_response(turn.text, turn.lead)
+    messenger.send_fb_message(sender_id, ai_reply)
@@ -0,0 +1,194 @@
+"""
+Knowledge base: FAQ records + live house data, searched before Gemini is called.
+
+The facts used to be pasted into the Gemini system instruction, and the
+per-house ones (reservation fees, DP %, monthly ranges) had drifted from
+the HouseModel rows. Now:
+
+  - general facts are FaqEntry rows that Jeric edits in the admin
+  - house facts are generated from the catalog index (same numbers as the
+    computation cards, promos included)
+
+    found = knowledge.lookup("magkano reservation ng calista end?", lead)
+    found.reply    # set when we can answer without Gemini
+    found.facts    # otherwise: the few facts worth sending to Gemini
+
+The FAQ index is a small in-memory BM25 index (question + keywords weigh
+double), rebuilt when an entry changes (KNOWLEDGE namespace version). It
+stays in memory rather than in SQLite FTS5 / Postgres tsvector because the
+FAQ is a few dozen rows, the same code works on both databases, and Taglish
+doesn't fit Postgres' stemmers anyway.
+
+A question is answered directly when most of its words are explained by the
+match: by a FAQ entry's question/keywords ("may pool ba?"), or by a house
+name plus a price/fee/DP word ("reservation fee ng calista end?"). Anything
+fuzzier goes to Gemini with only the top-k facts attached.
+"""
+import math
+import re
+from collections import Counter, namedtuple
+
+from decouple import config
+
+from . import caching, catalog, metrics
+from .affordability import DEFAULT_TERMS
+from .financing import BANK_DP_MONTHS, PAGIBIG_DP_MONTHS, house_bank_quote, house_pagibig_quote
+from .models import FaqEntry
+
+
+TOP_K = config('KB_TOP_K', default=3, cast=int)
+# Share of the question's words a match has to explain before we skip Gemini
+DIRECT_COVERAGE = config('KB_DIRECT_COVERAGE', default=0.6, cast=float)
+MAX_DIRECT_ANSWERS = 2
+TITLE_WEIGHT = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+    a an and are at ba be can do does for how i in is it me of on or the to what we you your
+    ako ang at ba din eh ho ka kayo ko lang mga mo na naman natin ng nga ni niyo nyo pa po rin
+    sa si tanong yan yun yung ito iyan iyon may meron mayroon ano paano pwede puwede hello hi
+""".split())
+
+HOUSE_TOPIC_WORDS = frozenset("""
+    reservation reserve rf fee downpayment down payment dp monthly amortization amort hulog buwanan
+    price presyo magkano much hm cost tcp contract computation compute
+""".split())
+HOUSE_NUDGE = "Type 'house' para sa full computation at promos natin."
+
+Hit = namedtuple('Hit', 'entry score coverage')
+Answer = namedtuple('Answer', 'reply facts source')
+
+ANSWERS_TOTAL = metrics.register(metrics.Counter(
+    'bot_knowledge_answers_total', 'Free-text questions by who answered them', ('source',),
+))
+
+
+def tokenize(text):
+    return [word for word in re.findall(r'\w+', text.lower()) if word not in STOPWORDS]
+
+
+def coverage(terms, explained):
+    if not terms:
+        return 0.0
+    return sum(1 for term in terms if term in explained) / len(terms)
+
+
+# --- FAQ INDEX ---
+
+class FaqIndex:
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.titles = []      # per entry: words in its question + keywords
+        self.lengths = []     # per entry: weighted document length
+        self.postings = {}    # term -> [(entry position, weighted term frequency), ...]
+
+        for position, entry in enumerate(self.entries):
+            title = tokenize(f"{entry.question} {entry.keywords}")
+            counts = Counter(title * TITLE_WEIGHT + tokenize(entry.answer))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, []).append((position, frequency))
+            self.titles.append(frozenset(title))
+            self.lengths.append(sum(counts.values()))
+
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 1
+        total = len(self.entries)
+        self.idf = {
+            term: math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+            for term, rows in self.postings.items()
+        }
+
+    def search(self, terms, k=TOP_K):
+        """Top k entries for the (already tokenized) question, best first."""
+        scores = {}
+        for term in set(terms):
+            for position, frequency in self.postings.get(term, ()):
+                norm = 1 - BM25_B + BM25_B * self.lengths[position] / self.average_length
+                gain = self.idf[term] * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * norm)
+                scores[position] = scores.get(position, 0) + gain
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [Hit(self.entries[position], score, coverage(terms, self.titles[position])) for position, score in ranked]
+
+
+def build_index():
+    return FaqIndex(FaqEntry.objects.filter(is_active=True).order_by('id'))
+
+
+_index = None   # (knowledge version, FaqIndex)
+
+
+def get_index():
+    global _index
+    stamp = caching.version(caching.KNOWLEDGE)
+    if _index is None or _index[0] != stamp:
+        _index = (stamp, build_index())
+    return _index[1]
+
+
+def clear():
+    global _index
+    _index = None
+
+
+# --- HOUSE FACTS ---
+
+def _percent(value):
+    return f"{value.normalize():f}"
+
+
+def house_facts(house, index):
+    """One line with everything a buyer usually asks about a model, from the live HouseModel row."""
+    discount = index.discounts[house.id]
+    pagibig = house_pagibig_quote(house, discount, DEFAULT_TERMS['PAGIBIG'])
+    bank = house_bank_quote(house, discount, DEFAULT_TERMS['BANK'])
+    promo = f" (less ₱{discount:,.0f} promo)" if discount else ''
+    return (
+        f"{house.name}, {house.get_location_display()}: TCP ₱{house.total_contract_price:,.0f}{promo}. "
+        f"Reservation fee ₱{house.reservation_fee:,.0f}. "
+        f"Pag-IBIG: {_percent(house.pagibig_downpayment_percent)}% DP in {PAGIBIG_DP_MONTHS} months, "
+        f"about ₱{pagibig.monthly:,.0f}/mo for {DEFAULT_TERMS['PAGIBIG']} yrs. "
+        f"Bank: {_percent(house.downpayment_percent)}% DP in {BANK_DP_MONTHS} months, "
+        f"about ₱{bank.monthly:,.0f}/mo for {DEFAULT_TERMS['BANK']} yrs."
+    )
+
+
+def mentioned_houses(text, index):
+    """Active houses named in the text. 'calista' alone means every Calista model."""
+    lowered = text.lower()
+    houses = sorted(index.houses.values(), key=lambda house: house.name)
+    named = [house for house in houses if house.name.lower() in lowered]
+    if named:
+        return named
+    words = set(re.findall(r'\w+', lowered))
+    return [house for house in houses if house.name.lower().split()[0] in words]
+
+
+# --- LOOKUP ---
+
+def lookup(text, lead=None):
+    """Answer(reply, facts, source): a direct reply when we have one, else the facts to give Gemini."""
+    terms = tokenize(text)
+    hits = get_index().search(terms)
+    index = catalog.get_index()
+    houses = mentioned_houses(text, index)
+
+    # "reservation fee ng calista end?" -- straight from the HouseModel rows
+    if houses and HOUSE_TOPIC_WORDS.intersection(terms):
+        explained = HOUSE_TOPIC_WORDS.union(*(tokenize(house.name) for house in houses))
+        if coverage(terms, explained) >= DIRECT_COVERAGE:
+            ANSWERS_TOTAL.inc('house')
+            lines = [house_facts(house, index) for house in houses]
+            return Answer('\n\n'.join(lines + [HOUSE_NUDGE]), '', 'house')
+
+    direct = [hit.entry.answer for hit in hits if hit.entry.answer_directly and hit.coverage >= DIRECT_COVERAGE]
+    if direct:
+        ANSWERS_TOTAL.inc('faq')
+        return Answer('\n\n'.join(direct[:MAX_DIRECT_ANSWERS]), '', 'faq')
+
+    # Not sure enough: let Gemini phrase it, but only with the relevant facts
+    if not houses and lead is not None and lead.interested_house_id in index.houses:
+        houses = [index.houses[lead.interested_house_id]]
+    facts = [f"{hit.entry.question} {hit.entry.answer}" for hit in hits]
+    facts += [house_facts(house, index) for house in houses]
+    ANSWERS_TOTAL.inc('gemini')
+    return Answer(None, '\n'.join(f"- {fact}" for fact in facts), 'gemini')
@@ -0,0 +1,82 @@
+"""
+Lazy Lead persistence.
+
+Every first message used to INSERT a Lead (plus an UPDATE for the profile
+name), even for ad-campaign drive-bys who send one "hm" and leave. Now a
+sender only gets a Lead row once they do something that counts:
+
+  - tap a quick reply or a postback (budget, financing, carousel, menu), or
+  - end up with a phone number, a status or a funnel answer on the lead.
+
+Until then the lead lives in the shared cache (LEADS namespace, a short TTL)
+as a dict of the few fields the funnel reads and writes, so greetings still
+know their name and step. Handlers never see the difference: they get a
+Lead either way, and Turn.save() calls persist() here.
+
+    lead = leads.load(psid)            # saved Lead, or an unsaved one rebuilt from the cache
+    leads.persist(turn)                # end of turn: save, cache, or promote to a real row
+"""
+from decouple import config
+from django.db import IntegrityError, transaction
+
+from . import caching, metrics
+from .flow import POSTBACK, QUICK_REPLY
+from .models import Lead
+
+
+EPHEMERAL_TTL = config('LAZY_LEAD_TTL', default=60 * 30, cast=int)
+
+# What an ephemeral lead remembers between messages
+FIELDS = ('full_name', 'status', 'current_step', 'budget_range', 'financing_type', 'timeline',
+          'location_pref', 'interested_house_id', 'phone_number', 'last_alert_sent')
+
+LEAD_WRITES = metrics.register(metrics.Counter(
+    'bot_lead_writes_total', 'End-of-turn lead saves by where they went', ('target',),
+))
+
+
+def load(psid):
+    lead = Lead.objects.filter(psid=psid).first()
+    if lead is not None:
+        return lead
+    return Lead(psid=psid, **(caching.get(caching.LEADS, psid) or {}))
+
+
+def is_engaged(turn):
+    """True once the sender did something worth a Lead row."""
+    lead = turn.lead
+    if turn.source in (QUICK_REPLY, POSTBACK):
+        return True
+    return bool(
+        lead.phone_number or lead.status != 'COLD' or lead.budget_range or lead.financing_type
+        or lead.timeline or lead.interested_house_id
+    )
+
+
+def _promote(lead):
+    """INSERTs an ephemeral lead; if another worker beat us to it, applies our fields to theirs."""
+    try:
+        with transaction.atomic():
+            lead.save()
+    except IntegrityError:
+        saved = Lead.objects.get(psid=lead.psid)
+        for field in FIELDS:
+            value = getattr(lead, field)
+            if value not in (None, ''):
+                setattr(saved, field, value)
+        saved.save()
+        lead.pk = saved.pk
+    caching.delete(caching.LEADS, lead.psid)
+
+
+def persist(turn):
+    lead = turn.lead
+    if lead.pk is not None:
+        lead.save()
+        LEAD_WRITES.inc('db')
+    elif is_engaged(turn):
+        _promote(lead)
+        LEAD_WRITES.inc('created')
+    else:
+        caching.set(caching.LEADS, lead.psid, {field: getattr(lead, field) for field in FIELDS}, ttl=EPHEMERAL_TTL)
+        LEAD_WRITES.inc('cache')
@@ -0,0 +1,66 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bot_engine import retention
+
+
+def human(size):
+    if size is None:
+        return 'n/a'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+
+class Command(BaseCommand):
+    help = ("Moves leads with no phone number and no activity for --days into compressed archives, "
+            "in resumable batches, then vacuums/analyzes (without locking the table) and reports the space. Safe to run from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=retention.DEFAULT_DAYS, help="Archive leads idle for longer than this")
+        parser.add_argument('--batch-size', type=int, default=retention.BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=0, help="Stop after this many batches (0 = until done)")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches (eases load on the webhook)")
+        parser.add_argument('--directory', help="Write .jsonl.gz files here instead of LeadArchive rows")
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be archived")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1")
+        if options['dry_run']:
+            count = retention.archivable(options['days']).count()
+            self.stdout.write(f"{count} lead(s) would be archived.")
+            return
+        if options['directory']:
+            os.makedirs(options['directory'], exist_ok=True)
+
+        before = retention.table_bytes()
+        archived = raw = compressed = batches = 0
+        started = time.monotonic()
+        while not options['max_batches'] or batches < options['max_batches']:
+            batch = retention.archive_batch(options['days'], options['batch_size'], options['directory'])
+            if batch is None:
+                break
+            batches += 1
+            archived += batch.count
+            raw += batch.raw_bytes
+            compressed += batch.compressed_bytes
+            self.stdout.write(f"  batch {batches}: {batch.count} lead(s) #{batch.first_id}-{batch.last_id}, "
+                              f"{human(batch.raw_bytes)} -> {human(batch.compressed_bytes)}")
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        retention.compact()
+        after = retention.table_bytes()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} lead(s) in {batches} batch(es) ({time.monotonic() - started:.1f}s), "
+            f"{human(raw)} of rows stored as {human(compressed)}."
+        ))
+        if before is not None and after is not None:
+            self.stdout.write(f"Space: {human(before)} -> {human(after)} ({human(before - after)} reclaimed). "
+                              f"Freed pages are reused by new leads; returning them to the OS needs a table "
+                              f"rewrite (VACUUM FULL / pg_repack) in a maintenance window.")
@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from bot_engine.bench import DB_MODES, DEFAULT_DB_MODES, run_db_benchmark
+from bot_engine.management.commands.bench_webhook import current_revision
+
+
+class Command(BaseCommand):
+    help = "Compares per-event webhook/DB latency across DB_CONNECTIONS modes (per-request, persistent, pool, SQLite WAL...)."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', help=f"Comma-separated, from: {', '.join(DB_MODES)} (default depends on the database)")
+        parser.add_argument('--events', type=int, default=300)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Where to save the JSON report (default: benchmarks/db-<revision>.json)")
+
+    def handle(self, *args, **options):
+        modes = options['modes'].split(',') if options['modes'] else DEFAULT_DB_MODES.get(connection.vendor, ('per-request', 'persistent'))
+        unknown = [mode for mode in modes if mode not in DB_MODES]
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(unknown)}")
+
+        results = run_db_benchmark(modes, events=options['events'], seed=options['seed'])
+
+        header = f"{'mode':<26}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}{'db ms/ev':>10}{'conn/ev':>9}{'ev/s':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for mode, s in results.items():
+            if 'error' in s:
+                self.stdout.write(f"{mode:<26}{self.style.ERROR(s['error'])}")
+                continue
+            self.stdout.write(
+                f"{mode:<26}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['mean_ms']:>10}"
+                f"{s['db_ms_per_event']:>10}{s['connections_per_event']:>9}{s['throughput_eps']:>10}"
+            )
+
+        revision = current_revision()
+        report = {
+            'revision': revision, 'created_at': timezone.now().isoformat(), 'database': connection.vendor,
+            'events': options['events'], 'modes': results,
+        }
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'benchmarks' / f"db-{revision}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Saved {output}"))
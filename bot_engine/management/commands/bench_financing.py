@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bot_engine.bench import run_financing_benchmark
+
+
+class Command(BaseCommand):
+    help = "Compares the memoized Decimal financing calculator with the old float math (µs per quote)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+        parser.add_argument('--houses', type=int, default=30, help="Distinct (price, discount, rate, term) inputs")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help="Print the raw result as JSON")
+        parser.add_argument('--check', action='store_true', help="Exit non-zero if the memoized path is slower than float")
+
+    def handle(self, *args, **options):
+        result = run_financing_benchmark(options['iterations'], options['houses'], options['seed'])
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+        else:
+            self.stdout.write(f"float (old):        {result['float_us']:>8} µs/quote")
+            self.stdout.write(f"Decimal, cold:      {result['decimal_cold_us']:>8} µs/quote")
+            self.stdout.write(f"Decimal, memoized:  {result['decimal_memo_us']:>8} µs/quote")
+            self.stdout.write(f"memoized / float:   {result['memo_vs_float']:>8}x")
+
+        if options['check'] and result['memo_vs_float'] > 1:
+            raise CommandError("Memoized Decimal quotes are slower than the float path")
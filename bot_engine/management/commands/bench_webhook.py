@@ -0,0 +1,87 @@
+import json
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from bot_engine.bench import compare, run_benchmark
+
+
+def current_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class Command(BaseCommand):
+    help = "Load-tests the Messenger webhook against a local Graph/Telegram/Gemini stub and saves the results as JSON."
+    # The URL checks import views.py, which must wait until the stub env is in place
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=500, help="Number of webhook POSTs to measure")
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--psids', type=int, default=200, help="Size of the returning-user PSID pool")
+        parser.add_argument('--graph-latency', type=float, default=0.0, help="Stub Graph API latency (ms)")
+        parser.add_argument('--telegram-latency', type=float, default=0.0, help="Stub Telegram latency (ms)")
+        parser.add_argument('--gemini-latency', type=float, default=0.0, help="Stub Gemini latency (ms)")
+        parser.add_argument('--output', help="Where to save the JSON report (default: benchmarks/<revision>.json)")
+        parser.add_argument('--compare', help="A previous JSON report to diff against")
+        parser.add_argument('--keep-db', action='store_true', help="Reuse the bench database between runs")
+
+    def handle(self, *args, **options):
+        latency = {
+            'graph': options['graph_latency'] / 1000,
+            'telegram': options['telegram_latency'] / 1000,
+            'gemini': options['gemini_latency'] / 1000,
+        }
+
+        # Never write bench leads into the real database
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keep_db'])
+        try:
+            report = run_benchmark(
+                events=options['events'], latency=latency, seed=options['seed'],
+                psid_pool=options['psids'], warmup=options['warmup'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keep_db'])
+            teardown_test_environment()
+
+        revision = current_revision()
+        report['revision'] = revision
+        report['created_at'] = timezone.now().isoformat()
+        report['database'] = connection.vendor
+
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'benchmarks' / f"{revision}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+
+        self.print_table(report)
+        self.stdout.write(self.style.SUCCESS(f"Saved {output}"))
+
+        if options['compare']:
+            baseline = json.loads(Path(options['compare']).read_text())
+            self.stdout.write(f"\nDelta vs {baseline.get('revision', options['compare'])}:")
+            for label, delta in compare(baseline, report).items():
+                self.stdout.write(f"  {label:<24} " + "  ".join(f"{k}={v:+}" for k, v in delta.items()))
+
+    def print_table(self, report):
+        header = f"{'route':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ev/s':>10}{'q/ev':>8}{'out/ev':>8}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        rows = list(report['routes'].items()) + [('OVERALL', report['overall'])]
+        for label, s in rows:
+            self.stdout.write(
+                f"{label:<24}{s['count']:>6}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}"
+                f"{s['throughput_eps']:>10}{s['queries_per_event']:>8}{s.get('outbound_per_event', 0):>8}"
+            )
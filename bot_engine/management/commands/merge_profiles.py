@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bot_engine import profiling
+
+
+class Command(BaseCommand):
+    help = ("Merges per-event profiles (.collapsed and .prof) into one collapsed-stack file "
+            "for flamegraph.pl, speedscope or inferno. Values are microseconds.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=[profiling.DIRECTORY], help="Profile files or directories")
+        parser.add_argument('--route', help="Only profiles of this route")
+        parser.add_argument('--output', help="Write here instead of stdout")
+        parser.add_argument('--top', type=int, default=10, help="Also print this many hottest leaf functions (to stderr)")
+
+    def handle(self, *args, **options):
+        files = profiling.profile_files(options['paths'], options['route'])
+        if not files:
+            raise CommandError("No profiles found")
+        stacks = profiling.merge(files)
+        lines = [f"{stack} {micros}" for stack, micros in sorted(stacks.items())]
+
+        if options['output']:
+            Path(options['output']).write_text('\n'.join(lines) + '\n')
+        else:
+            self.stdout.write('\n'.join(lines))
+
+        total = sum(stacks.values()) or 1
+        leaves = {}
+        for stack, micros in stacks.items():
+            leaf = stack.rsplit(';', 1)[-1]
+            leaves[leaf] = leaves.get(leaf, 0) + micros
+        # Summary on stderr so stdout stays a clean collapsed file
+        self.stderr.write(f"{len(files)} profile(s), {len(stacks)} stacks, {total / 1000:.1f} ms in total")
+        for leaf, micros in sorted(leaves.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stderr.write(f"  {micros / total:6.1%}  {leaf}")
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Saved {options['output']}"))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bot_engine import comments
+
+
+class Command(BaseCommand):
+    help = "Sends private replies to queued page comments (run with --loop as a worker process)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep running and poll for new comments")
+        parser.add_argument('--pause', type=float, default=5.0, help="Seconds to wait when idle or rate-limited")
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            self.stdout.write("Waiting for comments... (Ctrl+C to stop)")
+            try:
+                comments.drain(idle_exit=False, pause=options['pause'])
+            except KeyboardInterrupt:
+                pass
+            return
+
+        started = time.monotonic()
+        replied = comments.drain(idle_exit=True, pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(f"Replied to {replied} comment(s) in {time.monotonic() - started:.1f}s."))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bot_engine import profiling
+
+
+class Command(BaseCommand):
+    help = ("Switches webhook profiling on for every worker for a few minutes (a share of events, "
+            "some PSIDs or some funnel routes), or off with --off. Without options, shows what's on.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=float, default=0.0, help="Share of events to profile, 0-1")
+        parser.add_argument('--psid', action='append', default=[], help="Always profile this sender (repeatable)")
+        parser.add_argument('--route', action='append', default=[], help="Keep profiles of this route, e.g. calc_pagibig (repeatable)")
+        parser.add_argument('--mode', choices=profiling.MODES, default=profiling.MODE)
+        parser.add_argument('--minutes', type=float, default=10, help="Turns itself off after this long")
+        parser.add_argument('--off', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['off']:
+            profiling.disable()
+            self.stdout.write(self.style.SUCCESS("Profiling switch removed (env settings apply again)."))
+            return
+        if not (options['rate'] or options['psid'] or options['route']):
+            current = profiling.active_settings()
+            state = 'on' if profiling.is_on(current) else 'off'
+            until = f" until {time.strftime('%H:%M:%S', time.localtime(current['until']))}" if 'until' in current else ''
+            self.stdout.write(f"Profiling is {state}{until}: rate={current['rate']} psids={current['psids'] or '-'} "
+                              f"routes={current['routes'] or '-'} mode={current['mode']}")
+            return
+        if not 0 <= options['rate'] <= 1:
+            raise CommandError("--rate is a share between 0 and 1")
+        if options['minutes'] <= 0 or options['minutes'] > 120:
+            raise CommandError("--minutes must be between 0 and 120; this is meant to be brief")
+
+        profiling.enable(options['rate'], options['psid'], options['route'], options['mode'], options['minutes'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Profiling on for {options['minutes']:g} min ({options['mode']}); workers pick it up within "
+            f"{profiling.OVERRIDE_MEMO_SECONDS:g}s. Profiles go to {profiling.DIRECTORY}."
+        ))
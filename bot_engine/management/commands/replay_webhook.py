@@ -0,0 +1,85 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from bot_engine import capture
+from bot_engine.bench import compare, run_replay
+from bot_engine.management.commands.bench_webhook import Command as BenchCommand, current_revision
+
+
+class Command(BenchCommand):
+    help = ("Replays captured webhook traffic (WEBHOOK_CAPTURE files) at its original or an accelerated pace, "
+            "with Graph/Telegram/Gemini stubbed, and saves a bench_webhook-style report.")
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Capture files or directories of them")
+        parser.add_argument('--speed', type=float, default=1.0, help="1 = original pace, 10 = ten times faster, 0 = as fast as possible")
+        parser.add_argument('--limit', type=int, default=0, help="Stop after this many bodies")
+        parser.add_argument('--url', help="Send to a running server (e.g. http://127.0.0.1:8000/messenger/webhook/) instead of in-process")
+        parser.add_argument('--secret', help="App secret that server checks signatures with (default: META_APP_SECRET)")
+        parser.add_argument('--stub-port', type=int, default=0, help="Port for the Graph/Telegram/Gemini stub (fix it when using --url)")
+        parser.add_argument('--graph-latency', type=float, default=0.0, help="Stub Graph API latency (ms)")
+        parser.add_argument('--telegram-latency', type=float, default=0.0, help="Stub Telegram latency (ms)")
+        parser.add_argument('--gemini-latency', type=float, default=0.0, help="Stub Gemini latency (ms)")
+        parser.add_argument('--output', help="Where to save the JSON report (default: benchmarks/replay-<revision>.json)")
+        parser.add_argument('--compare', help="A previous replay report to diff against")
+
+    def handle(self, *args, **options):
+        if options['speed'] < 0:
+            raise CommandError("--speed can't be negative")
+        files = capture.capture_files(options['paths'])
+        if not files:
+            raise CommandError("No capture files found")
+        latency = {
+            'graph': options['graph_latency'] / 1000,
+            'telegram': options['telegram_latency'] / 1000,
+            'gemini': options['gemini_latency'] / 1000,
+        }
+        if options['url'] and options['stub_port']:
+            self.stdout.write(f"Stub on http://127.0.0.1:{options['stub_port']}; start the server with "
+                              f"GRAPH_API_URL, TELEGRAM_API_URL and GEMINI_API_ENDPOINT pointing there.")
+
+        replay = dict(speed=options['speed'], limit=options['limit'], latency=latency, url=options['url'],
+                      secret=options['secret'], stub_port=options['stub_port'])
+        if options['url']:
+            report = run_replay(capture.read(files), **replay)
+        else:
+            # Same as bench_webhook: replayed leads never touch the real database
+            setup_test_environment()
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                report = run_replay(capture.read(files), **replay)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        revision = current_revision()
+        report['revision'] = revision
+        report['created_at'] = timezone.now().isoformat()
+        report['files'] = [str(path) for path in files]
+
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'benchmarks' / f"replay-{revision}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+
+        self.print_table(report)
+        overall = report['overall']
+        if overall['behind_schedule']:
+            self.stdout.write(self.style.WARNING(
+                f"{overall['behind_schedule']} bodies went out late (max {overall['max_lag_ms']} ms): "
+                f"the replay couldn't keep up with --speed {options['speed']}"
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Saved {output}"))
+
+        if options['compare']:
+            baseline = json.loads(Path(options['compare']).read_text())
+            self.stdout.write(f"\nDelta vs {baseline.get('revision', options['compare'])}:")
+            for label, delta in compare(baseline, report).items():
+                self.stdout.write(f"  {label:<24} " + "  ".join(f"{k}={v:+}" for k, v in delta.items()))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from bot_engine.models import QueuedAlert
+from bot_engine.alerts import send_queued_alerts
+
+
+class Command(BaseCommand):
+    help = "Retries Telegram alerts that were queued while Telegram was unavailable. Safe to run from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50)
+
+    def handle(self, *args, **options):
+        sent = send_queued_alerts(limit=options['limit'])
+        pending = QueuedAlert.objects.filter(sent_at__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} queued alert(s), {pending} still pending."))
@@ -0,0 +1,113 @@
+"""
+Messenger Send API / Graph helpers shared by the webhook and every handler.
+
+Handlers call these through the module (messenger.send_fb_message(...)), so
+tests can stub the Graph side in one place.
+"""
+import hashlib
+import hmac
+import logging
+
+import requests
+from decouple import config
+
+from . import caching, outbound, payloads
+from .payloads import slot
+
+
+logger = logging.getLogger(__name__)
+
+
+# Plain text reply; only the recipient and the text change per send
+TEXT_MESSAGE = payloads.PayloadTemplate({"text": slot('text')}, messaging_type="RESPONSE")
+
+def send_payload(body):
+    """POSTs a pre-rendered Send API body (bytes from payloads.PayloadTemplate.render)."""
+    url = f"{outbound.GRAPH_API_URL}/v21.0/me/messages?access_token={config('FB_PAGE_ACCESS_TOKEN')}"
+    response = outbound.post('graph', url, data=body, headers={'Content-Type': 'application/json'})
+    return response.json()
+
+def send_template(recipient_id, template, **slots):
+    return send_payload(template.render(recipient_id, **slots))
+
+def send_fb_message(recipient_id, message_text):
+    return send_template(recipient_id, TEXT_MESSAGE, text=message_text)
+
+def send_quick_reply(recipient_id, text, options):
+    """
+    options should be a list of tuples: [("Title", "PAYLOAD"), ...]
+    For fixed prompts, prefer a pre-built payloads.quick_reply_template + send_template.
+    """
+    return send_template(recipient_id, payloads.quick_reply_template(text, options))
+
+def send_fb_image(psid, image_url):
+    """
+    Sends a standalone image attachment via Meta Graph API.
+    The image_url must be publicly accessible.
+    """
+    access_token = config('FB_PAGE_ACCESS_TOKEN')
+    url = f"{outbound.GRAPH_API_URL}/v18.0/me/messages?access_token={access_token}"
+    
+    payload = {
+        "recipient": {"id": psid},
+        "message": {
+            "attachment": {
+                "type": "image",
+                "payload": {
+                    "url": image_url,
+                    "is_reusable": True
+                }
+            }
+        }
+    }
+    
+    try:
+        response = outbound.post('graph', url, json=payload, timeout=10)
+        
+        # Log failures instead of printing them
+        if response.status_code != 200:
+            logger.error(f"Failed to send image to {psid}. Status: {response.status_code} | Error: {response.text}")
+            
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Meta API Image Request Failed for {psid}: {e}", exc_info=True)
+
+def get_user_profile(psid):
+    """Fetches user's name and profile pic from Facebook (cached per PSID)."""
+    profile = caching.get(caching.PROFILES, psid)
+    if profile is not None:
+        return profile
+
+    url = f"{outbound.GRAPH_API_URL}/{psid}"
+    params = {
+        'fields': 'first_name,last_name',
+        'access_token': config('FB_PAGE_ACCESS_TOKEN')
+    }
+    response = outbound.get('graph', url, params=params)
+    profile = response.json()
+    if 'first_name' in profile:
+        caching.set(caching.PROFILES, psid, profile)
+    return profile
+
+def verify_meta_signature(raw_payload, signature_header):
+    """
+    Validates the X-Hub-Signature-256 header sent by Meta using HMAC-SHA256.
+    """
+    if not signature_header:
+        return False
+        
+    app_secret = config('META_APP_SECRET', default='')
+    if not app_secret:
+        logger.error("META_APP_SECRET is missing from environment variables.")
+        return False
+
+    # Meta requires the hash to be prefixed with 'sha256='
+    expected_hash = hmac.new(
+        app_secret.encode('utf-8'), 
+        raw_payload, 
+        hashlib.sha256
+    ).hexdigest()
+    
+    expected_signature = f"sha256={expected_hash}"
+    
+    # Strictly use compare_digest to prevent timing attacks
+    return hmac.compare_digest(expected_signature, signature_header)
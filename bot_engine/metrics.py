@@ -0,0 +1,245 @@
+"""
+Lightweight per-turn tracing and Prometheus-style metrics.
+
+    with metrics.trace('messaging') as span:
+        ...
+        span.route = 'capture_budget'
+
+Every trace counts DB queries/time (via execute_wrapper on every database
+alias, so admin reads routed to the replica count too) and the outbound calls
+made while it is open, logs one JSON line when it closes and feeds the
+histograms served at /metrics. Everything lives in process memory and costs a
+few perf_counter() calls per query/request, so it is safe to leave on in
+production. With several gunicorn workers each worker exposes its own
+numbers; scrape them all or sum them in Prometheus.
+
+/metrics shows traffic, latency, funnel and Gemini spend, so it only exists
+with BOT_METRICS_TOKEN set (scrape with `Authorization: Bearer <token>`);
+without one it's a 404.
+"""
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from decouple import config
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+
+logger = logging.getLogger('bot_engine.metrics')
+
+METRICS_ENABLED = config('BOT_METRICS_ENABLED', default=True, cast=bool)
+METRICS_TOKEN = config('BOT_METRICS_TOKEN', default='')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+
+# --- REGISTRY ---
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, *labels, value):
+        with self._lock:
+            self.values[labels] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.values = {}    # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, *labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self.values.get(labels)
+            if row is None:
+                row = self.values[labels] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, row in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), row[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {row[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+REGISTRY = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+EVENT_SECONDS = register(Histogram('bot_event_seconds', 'Time spent handling one webhook event', ('kind', 'route')))
+EVENT_DB_QUERIES = register(Histogram('bot_event_db_queries', 'DB queries per webhook event', ('kind', 'route'), COUNT_BUCKETS))
+EVENT_DB_SECONDS = register(Histogram('bot_event_db_seconds', 'DB time per webhook event', ('kind', 'route')))
+OUTBOUND_SECONDS = register(Histogram('bot_outbound_seconds', 'Outbound call latency', ('service', 'status')))
+REQUEST_SECONDS = register(Histogram('bot_request_seconds', 'Total HTTP request handling time', ('view', 'status')))
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --- TRACER ---
+
+_current = ContextVar('bot_engine_trace', default=None)
+
+
+class Trace:
+    __slots__ = ('kind', 'route', 'fields', 'parent', 'started', 'db_queries', 'db_seconds', 'outbound')
+
+    def __init__(self, kind, parent=None, **fields):
+        self.kind = kind
+        self.route = None
+        self.fields = fields
+        self.parent = parent
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.outbound = []
+
+    def add_outbound(self, service, seconds, status):
+        self.outbound.append((service, seconds, status))
+        if self.parent:
+            self.parent.add_outbound(service, seconds, status)
+
+    def as_dict(self, elapsed):
+        return {
+            'kind': self.kind,
+            'route': self.route,
+            'total_ms': round(elapsed * 1000, 2),
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_seconds * 1000, 2),
+            'outbound': [
+                {'service': service, 'ms': round(seconds * 1000, 2), 'status': status}
+                for service, seconds, status in self.outbound
+            ],
+            **self.fields,
+        }
+
+
+def current():
+    return _current.get()
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        span = _current.get()
+        while span is not None:
+            span.db_queries += 1
+            span.db_seconds += elapsed
+            span = span.parent
+
+
+@contextmanager
+def trace(kind, log=True, **fields):
+    """Opens a trace for one request/event. Nested traces roll up into their parent."""
+    if not METRICS_ENABLED:
+        yield Trace(kind, **fields)
+        return
+
+    parent = _current.get()
+    span = Trace(kind, parent=parent, **fields)
+    token = _current.set(span)
+    try:
+        if parent is None:
+            with ExitStack() as wrappers:
+                for alias in connections:
+                    wrappers.enter_context(connections[alias].execute_wrapper(_db_wrapper))
+                yield span
+        else:
+            yield span
+    finally:
+        _current.reset(token)
+        elapsed = time.perf_counter() - span.started
+        if kind != 'request':
+            route = span.route or 'none'
+            EVENT_SECONDS.observe(kind, route, value=elapsed)
+            EVENT_DB_QUERIES.observe(kind, route, value=span.db_queries)
+            EVENT_DB_SECONDS.observe(kind, route, value=span.db_seconds)
+        if log:
+            logger.info(json.dumps(span.as_dict(elapsed)))
+
+
+def record_outbound(service, seconds, status):
+    OUTBOUND_SECONDS.observe(service, str(status), value=seconds)
+    span = _current.get()
+    if span is not None:
+        span.add_outbound(service, seconds, status)
+
+
+@contextmanager
+def timed(service):
+    """Times an outbound call made through an SDK (e.g. Gemini) rather than requests."""
+    started = time.perf_counter()
+    status = 'error'
+    try:
+        yield
+        status = 'ok'
+    finally:
+        record_outbound(service, time.perf_counter() - started, status)
+
+
+# --- /metrics ---
+
+def metrics_view(request):
+    if not METRICS_TOKEN:
+        raise Http404
+    if request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return HttpResponseForbidden("Forbidden")
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
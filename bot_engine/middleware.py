@@ -0,0 +1,35 @@
+import json
+import time
+
+from . import metrics
+
+
+# Views whose request-level trace is worth a JSON log line (the rest only feed /metrics)
+LOGGED_VIEWS = {'messenger_webhook'}
+
+
+class RequestMetricsMiddleware:
+    """
+    Opens the outermost trace for every request so DB queries and outbound calls
+    made anywhere in the view are counted, then records the total handling time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.METRICS_ENABLED:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with metrics.trace('request', log=False, method=request.method) as span:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view = request.resolver_match.url_name if request.resolver_match else 'unresolved'
+        metrics.REQUEST_SECONDS.observe(view or 'unnamed', str(response.status_code), value=elapsed)
+
+        if view in LOGGED_VIEWS:
+            span.route = view
+            metrics.logger.info(json.dumps(dict(span.as_dict(elapsed), status=response.status_code)))
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0013_housemodel_dressed_gallery_link_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
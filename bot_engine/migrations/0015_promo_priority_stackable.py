@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0014_queuedalert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promo',
+            name='priority',
+            field=models.IntegerField(default=0, help_text='Higher wins when promos overlap'),
+        ),
+        migrations.AddField(
+            model_name='promo',
+            name='stackable',
+            field=models.BooleanField(default=False, help_text='Add this discount on top of the winning promo'),
+        ),
+    ]
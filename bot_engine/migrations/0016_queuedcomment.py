@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0015_promo_priority_stackable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedComment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comment_id', models.CharField(max_length=100, unique=True)),
+                ('post_id', models.CharField(db_index=True, max_length=100)),
+                ('commenter_id', models.CharField(max_length=100)),
+                ('commenter_name', models.CharField(blank=True, max_length=255)),
+                ('message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_until', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('replied_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('last_error', models.CharField(blank=True, max_length=255)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0016_queuedcomment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeminiUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('psid', models.CharField(blank=True, max_length=100)),
+                ('day', models.DateField(db_index=True)),
+                ('calls', models.IntegerField(default=0)),
+                ('input_tokens', models.BigIntegerField(default=0)),
+                ('output_tokens', models.BigIntegerField(default=0)),
+                ('latency_ms', models.BigIntegerField(default=0, help_text='Total across calls')),
+                ('cost', models.DecimalField(decimal_places=6, default=0, help_text='Estimated, in USD', max_digits=12)),
+                ('budget_hits', models.IntegerField(default=0, help_text='Questions answered from cache/canned reply instead')),
+            ],
+            options={
+                'verbose_name_plural': 'Gemini usage',
+                'unique_together': {('psid', 'day')},
+            },
+        ),
+    ]
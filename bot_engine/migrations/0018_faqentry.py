@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0017_geminiusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaqEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.CharField(help_text="How a buyer would ask it, e.g. 'Saan ang location?'", max_length=255)),
+                ('keywords', models.CharField(blank=True, help_text='Other words buyers use for this, separated by spaces', max_length=255)),
+                ('answer', models.TextField()),
+                ('answer_directly', models.BooleanField(default=True, help_text='Reply with this answer as-is when the question clearly matches (no Gemini call)')),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'FAQ entry',
+                'verbose_name_plural': 'FAQ entries',
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+# The facts that used to live in the Gemini system instruction. The per-house
+# ones (reservation fees, DP %, monthly ranges) are left out on purpose: they
+# come from the HouseModel rows now.
+FAQ = [
+    ("Anong amenities meron?",
+     "amenities amenity facilities clubhouse pool swimming basketball court cinema security guard",
+     "May Clubhouse, swimming pool, basketball court, outdoor cinema, at 24/7 security ang Magalang East PHirst Park Homes."),
+    ("Saan ang location?",
+     "location saan where address magalang pampanga layo malapit town market",
+     "Nasa Magalang, Pampanga po, 5-10 mins lang from the town proper at public market."),
+    ("Kailan ang turnover?",
+     "turnover kailan when lipat move 2027 quarter",
+     "Ang earliest turnover natin ay first quarter of 2027."),
+    ("Ready for occupancy ba or pre-selling?",
+     "rfo ready occupancy preselling pre selling available",
+     "Meron tayong ready for occupancy at pre-selling units."),
+    ("Ano ang kasama pag turnover?",
+     "finished gate fence bakod bare furnished kasama deliverable",
+     "Fully finished po upon turnover, may gate at fence na."),
+    ("Ano ang requirements para sa locally employed?",
+     "requirements requirement documents papers docs local locally employed employee",
+     "For locally employed: two valid IDs, proof of billing, 6 months latest payroll bank statement, "
+     "6 months latest payslips, CENOMAR or marriage certificate, at COEC."),
+    ("Ano ang requirements para sa OFW?",
+     "requirements requirement documents papers docs ofw abroad spa seaman",
+     "For OFW/abroad: two valid IDs, 8 copies of notarized or consularized SPA, 6 months latest payslips, "
+     "6 months latest bank statement, proof of billing, COEC, at entry and exit stamps."),
+]
+
+
+def seed(apps, schema_editor):
+    FaqEntry = apps.get_model('bot_engine', 'FaqEntry')
+    FaqEntry.objects.bulk_create([FaqEntry(question=q, keywords=k, answer=a) for q, k, a in FAQ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0018_faqentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+# Admin search on Lead is `icontains`, i.e. UPPER(col) LIKE UPPER('%term%'), which
+# no btree index can serve. On Postgres a pg_trgm GIN index on the same expression
+# can. SQLite has no trigram support, so this is a no-op there.
+INDEXES = {
+    'bot_engine_lead_full_name_trgm': 'full_name',
+    'bot_engine_lead_phone_number_trgm': 'phone_number',
+}
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON bot_engine_lead USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0019_seed_faq'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
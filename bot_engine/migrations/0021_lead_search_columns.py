@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:08
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Frozen copies of bot_engine.pagination's normalizers as they were when this ran,
+# so later changes there don't change what this migration backfills.
+def normalize_name(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())[:255]
+
+
+def normalize_phone(text):
+    text = (text or '').strip()
+    digits = re.sub(r'\D', '', text)
+    if digits.startswith('63') and (text.startswith('+') or len(digits) > 10):
+        digits = digits[2:]
+    elif digits.startswith('0'):
+        digits = digits[1:]
+    return digits[:20]
+
+
+def backfill(apps, schema_editor):
+    Lead = apps.get_model('bot_engine', 'Lead')
+    batch = []
+    for lead in Lead.objects.only('id', 'full_name', 'phone_number').iterator(chunk_size=2000):
+        lead.search_name = normalize_name(lead.full_name)
+        lead.search_phone = normalize_phone(lead.phone_number)
+        batch.append(lead)
+        if len(batch) == 2000:
+            Lead.objects.bulk_update(batch, ['search_name', 'search_phone'])
+            batch = []
+    Lead.objects.bulk_update(batch, ['search_name', 'search_phone'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0020_lead_search_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='search_name',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='search_phone',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['status', '-updated_at', '-id'], name='lead_status_updated_idx'),
+        ),
+    ]
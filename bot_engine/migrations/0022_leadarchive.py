@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0021_lead_search_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('first_lead_id', models.BigIntegerField()),
+                ('last_lead_id', models.BigIntegerField()),
+                ('lead_count', models.IntegerField()),
+                ('raw_bytes', models.IntegerField(help_text='Size of the JSON lines before compression')),
+                ('data', models.BinaryField(help_text='zlib-compressed JSON lines, one lead per line')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0022_leadarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedcomment',
+            name='commented_at',
+            field=models.DateTimeField(blank=True, help_text="When it was posted (Meta's created_time); the 7-day private reply window runs from here", null=True),
+        ),
+    ]
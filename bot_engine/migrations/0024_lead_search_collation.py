@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+# prefix_filter() matches "starts with" as `col >= 'juan ' AND col < 'juan!'`. That's only a
+# prefix match under a byte-order collation: en_US.UTF-8 and friends ignore spaces and
+# punctuation at the first level, so a prefix ending in a space or digit can pull in the
+# wrong rows. On Postgres the search columns (and their indexes, rebuilt by the ALTER) use
+# COLLATE "C". SQLite already compares with BINARY, so this is a no-op there.
+COLUMNS = {
+    'search_name': 255,
+    'search_phone': 20,
+}
+
+
+def set_collation(collation):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for column, length in COLUMNS.items():
+            schema_editor.execute(
+                f'ALTER TABLE bot_engine_lead ALTER COLUMN "{column}" TYPE varchar({length}) COLLATE "{collation}"'
+            )
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_engine', '0023_queuedcomment_commented_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_collation('C'), set_collation('default')),
+    ]
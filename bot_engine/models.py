@@ -2,6 +2,8 @@ from django.db import models
 from django.utils import timezone
 from decimal import Decimal
 
+from .pagination import normalize_name, normalize_phone
+
 class HouseModel(models.Model):
     name = models.CharField(max_length=100, help_text="e.g., Unna Model")
     description = models.CharField(max_length=80, help_text="Short description")
@@ -65,7 +67,7 @@ class HouseModel(models.Model):
 
     # REMOVED: @property def monthly_amortization
     # Why: It calculates based on the raw price and ignores promos. 
-    # We will handle the exact calculation in views.py to ensure accuracy.
+    # We will handle the exact calculation in financing.py / handlers/computations.py to ensure accuracy.
 
     def __str__(self):
         return self.name
@@ -111,6 +113,24 @@ class Lead(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     followed_up = models.BooleanField(default=False)
 
+    # Normalized copies for the admin's indexed prefix search (see pagination.py); kept in sync by save()
+    search_name = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    search_phone = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # The HOT leads keyset view: WHERE status = 'HOT' ORDER BY updated_at DESC, id DESC
+            models.Index(fields=['status', '-updated_at', '-id'], name='lead_status_updated_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_name(self.full_name)
+        self.search_phone = normalize_phone(self.phone_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'search_name', 'search_phone'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.full_name or 'Unknown'} - {self.interested_house}"
 
@@ -126,5 +146,83 @@ class Promo(models.Model):
     end_date = models.DateField()
     is_active = models.BooleanField(default=True)
 
+    # When promos overlap: the highest priority non-stackable promo wins, stackable ones add on top
+    priority = models.IntegerField(default=0, help_text="Higher wins when promos overlap")
+    stackable = models.BooleanField(default=False, help_text="Add this discount on top of the winning promo")
+
+    def __str__(self):
+        return f"{self.name} (₱{self.discount_amount:,.0f} off)"
+
+class FaqEntry(models.Model):
+    """One fact the bot can answer with (see knowledge.py). House prices/fees/DP come from HouseModel, not from here."""
+    question = models.CharField(max_length=255, help_text="How a buyer would ask it, e.g. 'Saan ang location?'")
+    keywords = models.CharField(max_length=255, blank=True, help_text="Other words buyers use for this, separated by spaces")
+    answer = models.TextField()
+    answer_directly = models.BooleanField(default=True, help_text="Reply with this answer as-is when the question clearly matches (no Gemini call)")
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "FAQ entry"
+        verbose_name_plural = "FAQ entries"
+
+    def __str__(self):
+        return self.question
+
+class QueuedAlert(models.Model):
+    """Telegram alerts we could not deliver (Telegram down or its circuit breaker open).
+    They are retried on the next successful alert and by `manage.py send_queued_alerts`."""
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.IntegerField(default=0)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Alert #{self.pk} ({'sent' if self.sent_at else 'pending'})"
+
+class QueuedComment(models.Model):
+    """Page comments waiting for a private reply (see comments.py / `manage.py process_comments`)."""
+    comment_id = models.CharField(max_length=100, unique=True)
+    post_id = models.CharField(max_length=100, db_index=True)
+    commenter_id = models.CharField(max_length=100)
+    commenter_name = models.CharField(max_length=255, blank=True)
+    message = models.TextField(blank=True)
+    commented_at = models.DateTimeField(null=True, blank=True, help_text="When it was posted (Meta's created_time); the 7-day private reply window runs from here")
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    replied_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_error = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return f"Comment {self.comment_id} ({'replied' if self.replied_at else 'pending'})"
+
+class GeminiUsage(models.Model):
+    """Gemini spend per lead per day (see usage.py). psid is blank for calls without a lead."""
+    psid = models.CharField(max_length=100, blank=True)
+    day = models.DateField(db_index=True)
+    calls = models.IntegerField(default=0)
+    input_tokens = models.BigIntegerField(default=0)
+    output_tokens = models.BigIntegerField(default=0)
+    latency_ms = models.BigIntegerField(default=0, help_text="Total across calls")
+    cost = models.DecimalField(max_digits=12, decimal_places=6, default=0, help_text="Estimated, in USD")
+    budget_hits = models.IntegerField(default=0, help_text="Questions answered from cache/canned reply instead")
+
+    class Meta:
+        unique_together = ('psid', 'day')
+        verbose_name_plural = "Gemini usage"
+
+    def __str__(self):
+        return f"{self.psid or 'no lead'} on {self.day}: {self.calls} calls, ${self.cost:.4f}"
+
+class LeadArchive(models.Model):
+    """A batch of old phone-less leads moved out of the Lead table by `manage.py archive_leads` (see retention.py)."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    first_lead_id = models.BigIntegerField()
+    last_lead_id = models.BigIntegerField()
+    lead_count = models.IntegerField()
+    raw_bytes = models.IntegerField(help_text="Size of the JSON lines before compression")
+    data = models.BinaryField(help_text="zlib-compressed JSON lines, one lead per line")
+
     def __str__(self):
-        return f"{self.name} (₱{self.discount_amount:,.0f} off)"
\ No newline at end of file
+        return f"{self.lead_count} leads #{self.first_lead_id}-{self.last_lead_id}"
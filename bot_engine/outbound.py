@@ -0,0 +1,58 @@
+"""
+Single entry point for outbound HTTP calls (Graph, Telegram).
+Every call is timed, tagged with its service and guarded by that
+service's circuit breaker, so a degraded dependency fails fast instead
+of tying up the worker. Calls share one keep-alive Session per process
+(clients.http()).
+"""
+import time
+
+import requests
+from decouple import config
+
+from . import breakers, clients, metrics
+
+
+# Base URLs (the load-test harness points these at a local stub)
+GRAPH_API_URL = config('GRAPH_API_URL', default='https://graph.facebook.com')
+TELEGRAM_API_URL = config('TELEGRAM_API_URL', default='https://api.telegram.org')
+
+# Seconds before we give up on a dependency (callers can still pass their own timeout)
+DEFAULT_TIMEOUTS = {
+    'graph': 10,
+    'telegram': 5,
+}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a service whose breaker is open."""
+
+
+def request(service, method, url, **kwargs):
+    breaker = breakers.BREAKERS.get(service)
+    if breaker and not breaker.allow():
+        metrics.record_outbound(service, 0.0, 'circuit_open')
+        raise CircuitOpenError(f"{service} circuit is open")
+
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUTS.get(service, 10))
+    started = time.perf_counter()
+    status = 'error'
+    try:
+        response = clients.http().request(method, url, **kwargs)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.record_outbound(service, elapsed, status)
+        if breaker:
+            # 4xx means we sent something bad, not that the service is down
+            ok = isinstance(status, int) and status < 500 and status != 429
+            breaker.record(elapsed, ok=ok)
+
+
+def post(service, url, **kwargs):
+    return request(service, 'POST', url, **kwargs)
+
+
+def get(service, url, **kwargs):
+    return request(service, 'GET', url, **kwargs)
@@ -0,0 +1,118 @@
+"""
+Admin search and pagination that stay fast with 100k+ leads.
+
+    normalize_name / normalize_phone   -- what Lead.search_name / search_phone hold
+    prefix_filter(field, prefix)       -- "starts with" as an index range scan
+    EstimatedCountPaginator            -- planner estimate instead of COUNT(*) on big lists
+    keyset_page(queryset, cursor)      -- newest-updated-first pages with no OFFSET
+
+Prefix matches are written as `field >= 'juan' AND field < 'juao'` instead of
+LIKE 'juan%', which any btree index serves on both Postgres and SQLite. The
+range is only a true prefix match under a byte-order collation: SQLite's
+BINARY, or COLLATE "C", which the search columns get on Postgres (migration
+0024). Under en_US.UTF-8 and the like, spaces and punctuation are ignored at
+the first level, so a prefix ending in a space or digit could match the wrong
+rows; keep any new prefix-searched column on "C" too.
+"""
+import json
+import re
+import unicodedata
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+EXACT_COUNT_LIMIT = 10000   # below this the real COUNT(*) is cheap enough
+HOT_PAGE_SIZE = 50
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+# --- NORMALIZED SEARCH COLUMNS ---
+
+def normalize_name(text):
+    """'  José Dela-Cruz ' -> 'jose dela cruz'."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())[:255]
+
+
+def normalize_phone(text):
+    """'+63 917-123-4567', '0917 123 4567' and '9171234567' all become '9171234567'."""
+    text = (text or '').strip()
+    digits = re.sub(r'\D', '', text)
+    if digits.startswith('63') and (text.startswith('+') or len(digits) > 10):
+        digits = digits[2:]
+    elif digits.startswith('0'):
+        digits = digits[1:]
+    return digits[:20]
+
+
+def looks_like_phone(text):
+    return bool(re.fullmatch(r'[\d\s+()-]+', text)) and sum(char.isdigit() for char in text) >= 3
+
+
+def prefix_filter(field, prefix):
+    """Q for `field` starting with `prefix`, as a range the field's index can serve (byte-order collation only)."""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+
+
+# --- COUNTS ---
+
+def estimate_count(queryset):
+    """The planner's row estimate for queryset (Postgres), or None where there's no cheap estimate."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Uses the planner's estimate once a list is too big to COUNT(*) on every page view."""
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+            return estimate
+        return super().count
+
+
+# --- KEYSET PAGES ---
+
+def make_keyset_cursor(updated_at, pk):
+    return f"{(updated_at - EPOCH) // timedelta(microseconds=1)}.{pk}"
+
+
+def parse_keyset_cursor(cursor):
+    """'1767225600000000.42' -> (datetime, 42). Raises ValueError on garbage."""
+    micros, _, pk = cursor.partition('.')
+    try:
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except OverflowError:
+        # A hand-edited cursor past datetime's range is garbage too
+        raise ValueError(f"Cursor out of range: {cursor}")
+
+
+def keyset_page(queryset, cursor=None, size=HOT_PAGE_SIZE):
+    """
+    One page of queryset, most recently updated first: (rows, next cursor or None).
+    Each page is an index range scan from the cursor, so page 500 costs the same as page 1.
+    """
+    if cursor:
+        updated_at, pk = parse_keyset_cursor(cursor)
+        queryset = queryset.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, pk__lt=pk))
+    rows = list(queryset.order_by('-updated_at', '-pk')[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, make_keyset_cursor(rows[-1].updated_at, rows[-1].pk)
@@ -0,0 +1,114 @@
+"""
+Pre-rendered Send API payloads.
+
+Carousels, computation cards and quick-reply sets are identical for every
+user except for the recipient id (and sometimes a first name), so we serialize
+them to bytes once and only splice the variable parts in per send:
+
+    GREETING = PayloadTemplate({"text": f"Hi {slot('name')}! 👋", ...})
+    body = GREETING.render(psid, name="Juan")   # bytes, ready to POST
+
+Templates built from the catalog go through cached_template(), which rebuilds
+them when the catalog cache version changes (any house/image/promo edit) or
+the day rolls over (promo start/end dates).
+"""
+import json
+import re
+
+from django.utils import timezone
+
+from . import caching
+
+
+_SLOT_RE = re.compile(r'\\u0000(\w+)\\u0000')
+RECIPIENT = 'recipient'
+MAX_TEMPLATES = 500
+
+
+def slot(name):
+    """A placeholder filled in at render time, e.g. the user's first name."""
+    return f"\x00{name}\x00"
+
+
+def _escape(value):
+    """JSON-escapes a value for splicing inside an existing JSON string literal."""
+    return json.dumps(str(value), ensure_ascii=False)[1:-1].encode('utf-8')
+
+
+class PayloadTemplate:
+    """A Send API body serialized once; render() only fills in the slots."""
+
+    def __init__(self, message, messaging_type=None):
+        body = {"recipient": {"id": slot(RECIPIENT)}}
+        if messaging_type:
+            body["messaging_type"] = messaging_type
+        body["message"] = message
+
+        raw = json.dumps(body, ensure_ascii=False, separators=(',', ':'))
+        parts = _SLOT_RE.split(raw)
+        # parts alternates literal, slot name, literal, slot name, ..., literal
+        self.chunks = [part.encode('utf-8') for part in parts[0::2]]
+        self.slots = parts[1::2]
+
+    def render(self, recipient_id, **values):
+        values[RECIPIENT] = recipient_id
+        out = [self.chunks[0]]
+        for name, chunk in zip(self.slots, self.chunks[1:]):
+            out.append(_escape(values[name]))
+            out.append(chunk)
+        return b''.join(out)
+
+
+def quick_reply_template(text, options):
+    """options is a list of tuples: [("Title", "PAYLOAD"), ...]"""
+    return PayloadTemplate({
+        "text": text,
+        "quick_replies": [
+            {"content_type": "text", "title": title, "payload": payload}
+            for title, payload in options
+        ],
+    })
+
+
+def button_template(text, buttons):
+    return PayloadTemplate({
+        "attachment": {
+            "type": "template",
+            "payload": {"template_type": "button", "text": text, "buttons": buttons},
+        }
+    })
+
+
+def generic_template(elements):
+    return PayloadTemplate({
+        "attachment": {
+            "type": "template",
+            "payload": {"template_type": "generic", "elements": elements},
+        }
+    })
+
+
+# --- CATALOG-DERIVED TEMPLATES ---
+
+_built = {}   # key -> ((catalog version, date), template)
+
+
+def cached_template(key, build):
+    """
+    Returns the template for key, building it with build() only when the catalog
+    changed or it's a new day. build() may return None (e.g. no houses).
+    """
+    stamp = (caching.version(caching.CATALOG), timezone.localdate())
+    entry = _built.get(key)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+
+    if len(_built) >= MAX_TEMPLATES:
+        _built.clear()
+    template = build()
+    _built[key] = (stamp, template)
+    return template
+
+
+def clear():
+    _built.clear()
@@ -0,0 +1,325 @@
+"""
+On-demand profiling of webhook events.
+
+Off by default. Switch it on for a while, from anywhere that shares the cache:
+
+    manage.py profile_webhook --rate 0.05 --minutes 10           # 5% of events
+    manage.py profile_webhook --route calc_pagibig --minutes 10  # one funnel route
+    manage.py profile_webhook --psid 1234567890 --minutes 30     # one sender
+    manage.py profile_webhook --off
+
+or with WEBHOOK_PROFILE_RATE / _PSIDS / _ROUTES in the environment. The
+switch lives in the shared cache with a TTL, so a forgotten session turns
+itself off, and workers re-read it every few seconds.
+
+Every picked event writes one file to WEBHOOK_PROFILE_DIR, named
+<time>-<route>-<pid>-<n>, in one of two formats:
+
+  sample   (default) a sampler thread reads the event thread's stack every
+           WEBHOOK_PROFILE_INTERVAL_MS and writes a .collapsed file. The
+           request thread isn't instrumented, so this is the one for production.
+  cprofile cProfile around the event, written as a .prof. It's exact, but
+           every call gets slower, so use it locally or for one PSID.
+
+Routes are only known once the funnel has dispatched. With a route filter
+every event is profiled and only the matching ones are kept. Each process
+stops after WEBHOOK_PROFILE_MAX_FILES files no matter what's switched on.
+
+    manage.py merge_profiles profiles/ --route media_or_gemini > media.collapsed
+    flamegraph.pl media.collapsed > media.svg     # or drop it into speedscope
+"""
+import cProfile
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from decouple import config
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY = config('WEBHOOK_PROFILE_DIR', default=str(Path(settings.BASE_DIR) / 'profiles'))
+MODE = config('WEBHOOK_PROFILE_MODE', default='sample')
+INTERVAL = config('WEBHOOK_PROFILE_INTERVAL_MS', default=5, cast=int) / 1000
+MAX_FILES = config('WEBHOOK_PROFILE_MAX_FILES', default=500, cast=int)
+MODES = ('sample', 'cprofile')
+
+OVERRIDE_KEY = 'profiling:settings'
+OVERRIDE_MEMO_SECONDS = 5.0
+
+PROFILES_WRITTEN = metrics.register(metrics.Counter(
+    'bot_profiles_written_total', 'Per-event profiles written to disk', ('mode',),
+))
+
+
+def _split(value):
+    return {item.strip() for item in (value or '').split(',') if item.strip()}
+
+
+ENV_SETTINGS = {
+    'rate': config('WEBHOOK_PROFILE_RATE', default=0.0, cast=float),
+    'psids': sorted(_split(config('WEBHOOK_PROFILE_PSIDS', default=''))),
+    'routes': sorted(_split(config('WEBHOOK_PROFILE_ROUTES', default=''))),
+    'mode': MODE,
+}
+
+
+# --- SWITCH ---
+
+def enable(rate=0.0, psids=(), routes=(), mode=MODE, minutes=10):
+    """Turns profiling on for every worker for `minutes`."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode '{mode}'")
+    current = {'rate': rate, 'psids': sorted(psids), 'routes': sorted(routes), 'mode': mode,
+               'until': time.time() + minutes * 60}
+    cache.set(OVERRIDE_KEY, current, timeout=int(minutes * 60))
+    _memo.clear()
+    return current
+
+
+def disable():
+    cache.delete(OVERRIDE_KEY)
+    _memo.clear()
+
+
+_memo = {}
+
+
+def active_settings():
+    """The cache switch if one is on, else the env settings (re-read every OVERRIDE_MEMO_SECONDS)."""
+    now = time.monotonic()
+    if _memo and now - _memo['read_at'] < OVERRIDE_MEMO_SECONDS:
+        return _memo['settings']
+    current = cache.get(OVERRIDE_KEY) or ENV_SETTINGS
+    _memo.update(settings=current, read_at=now)
+    return current
+
+
+def is_on(current):
+    return bool(current['rate'] or current['psids'] or current['routes'])
+
+
+# --- SAMPLER ---
+
+def frame_name(code):
+    parts = code.co_filename.replace('\\', '/').rsplit('/', 2)[-2:]
+    return f"{code.co_name} ({'/'.join(parts)}:{code.co_firstlineno})"
+
+
+def collapse(frame, root):
+    """'outer;inner;innermost' for frame's stack, from root (inclusive) down."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame.f_code))
+        if frame is root:
+            break
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """One thread per process that samples the stacks of whichever threads are being profiled."""
+
+    def __init__(self, interval=INTERVAL):
+        self.interval = interval
+        self.pid = os.getpid()
+        self.targets = {}   # thread ident -> (root frame, Counter of stacks)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='webhook-profiler', daemon=True)
+        self._thread.start()
+
+    def start(self, ident, root):
+        stacks = Counter()
+        with self._lock:
+            self.targets[ident] = (root, stacks)
+        self._wake.set()
+        return stacks
+
+    def stop(self, ident):
+        with self._lock:
+            self.targets.pop(ident, None)
+
+    def _run(self):
+        while True:
+            if not self.targets:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, (root, stacks) in self.targets.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stacks[collapse(frame, root)] += 1
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def sampler():
+    global _sampler
+    if _sampler is None or _sampler.pid != os.getpid():
+        with _sampler_lock:
+            if _sampler is None or _sampler.pid != os.getpid():
+                _sampler = Sampler()
+    return _sampler
+
+
+# --- PER-EVENT PROFILE ---
+
+_written = 0
+_sequence = 0
+_count_lock = threading.Lock()
+
+
+def _reserve_file():
+    """Next file number for this process, or None once MAX_FILES have been written."""
+    global _written, _sequence
+    with _count_lock:
+        if _written >= MAX_FILES:
+            return None
+        _written += 1
+        _sequence += 1
+        return _sequence
+
+
+class profiled:
+    """
+    Profiles the body of the with-block if the switch picks this event:
+
+        with metrics.trace('messaging') as span, profiling.profiled(sender_id, span):
+            span.route = handle_messaging_event(sender_id, event)
+    """
+
+    def __init__(self, psid, span=None):
+        self.psid = psid
+        self.span = span
+        self.mode = None
+
+    def __enter__(self):
+        current = active_settings()
+        if not is_on(current) or _written >= MAX_FILES:
+            return self
+        self.keep_anyway = self.psid in current['psids'] or (current['rate'] and random.random() < current['rate'])
+        if not self.keep_anyway and not current['routes']:
+            return self
+        self.routes = current['routes']
+        self.mode = current.get('mode', MODE)
+        self.started = time.perf_counter()
+        if self.mode == 'cprofile':
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:
+                # Only one cProfile per process on 3.12+; another thread's event has it
+                self.mode = None
+        else:
+            self.stacks = sampler().start(threading.get_ident(), sys._getframe(1))
+        return self
+
+    def __exit__(self, *exc):
+        if self.mode is None:
+            return False
+        if self.mode == 'cprofile':
+            self.profile.disable()
+        else:
+            sampler().stop(threading.get_ident())
+        elapsed = time.perf_counter() - self.started
+        route = (self.span.route if self.span is not None else None) or 'none'
+        if self.keep_anyway or route in self.routes:
+            try:
+                self.write(route, elapsed)
+            except Exception as e:
+                logger.error(f"Couldn't write profile for {route}: {e}")
+        return False
+
+    def write(self, route, elapsed):
+        number = _reserve_file()
+        if number is None:
+            return
+        directory = Path(DIRECTORY)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{route}-{os.getpid()}-{number}"
+        if self.mode == 'cprofile':
+            self.profile.dump_stats(directory / f"{name}.prof")
+        else:
+            # Samples -> microseconds, so sampled and cProfile stacks merge on the same scale
+            weight = int(INTERVAL * 1_000_000)
+            lines = [f"{stack} {count * weight}" for stack, count in self.stacks.items()]
+            (directory / f"{name}.collapsed").write_text('\n'.join(lines) + '\n')
+        PROFILES_WRITTEN.inc(self.mode)
+        logger.info(f"Profiled {route} for {self.psid} ({elapsed * 1000:.1f} ms) -> {name}")
+
+
+# --- MERGING ---
+
+def read_collapsed(path, into):
+    for line in Path(path).read_text().splitlines():
+        stack, _, value = line.rpartition(' ')
+        if stack and value.isdigit():
+            into[stack] += int(value)
+
+
+def read_prof(path, into):
+    """
+    cProfile only keeps caller->callee edges, not whole stacks, so each
+    function's own time is hung under its heaviest chain of callers. Good
+    enough to see where the time goes; exact only where call paths don't fork.
+    """
+    stats = pstats.Stats(str(path)).stats
+
+    def name(func):
+        filename, line, function = func
+        if filename == '~':   # built-ins
+            return function
+        parts = filename.replace('\\', '/').rsplit('/', 2)[-2:]
+        return f"{function} ({'/'.join(parts)}:{line})"
+
+    for func, (_, _, tottime, _, callers) in stats.items():
+        if func[0] == __file__ or func[2] == "<method 'disable' of '_lsprof.Profiler' objects>":
+            continue   # our own __exit__
+        chain, seen, current = [name(func)], {func}, callers
+        while current:
+            caller = max(current, key=lambda c: current[c][3] if isinstance(current[c], tuple) else current[c])
+            if caller in seen:
+                break
+            seen.add(caller)
+            chain.append(name(caller))
+            current = stats.get(caller, (None,) * 5)[4]
+        micros = int(tottime * 1_000_000)
+        if micros:
+            into[';'.join(reversed(chain))] += micros
+
+
+def profile_files(paths, route=None):
+    files = []
+    for path in map(Path, paths):
+        found = sorted(path.glob('*.collapsed')) + sorted(path.glob('*.prof')) if path.is_dir() else [path]
+        files.extend(found)
+    if route:
+        files = [path for path in files if f"-{route}-" in path.name]
+    return files
+
+
+def merge(files):
+    """Every profile in files as one {collapsed stack: microseconds} dict."""
+    stacks = defaultdict(int)
+    for path in files:
+        if str(path).endswith('.prof'):
+            read_prof(path, stacks)
+        else:
+            read_collapsed(path, stacks)
+    return stacks
@@ -0,0 +1,114 @@
+"""
+Promo resolution: "which promo does house H get today?" answered from memory.
+
+All active promos that haven't ended are loaded once into an interval index
+per house (sorted by start date), so looking up today's promos is a bisect
+plus a scan of the few promos that already started.
+
+When several promos overlap the result is deterministic:
+  1. The best non-stackable promo wins: highest priority, then biggest
+     discount, then the one that started most recently, then lowest id.
+  2. Every active stackable promo is added on top of it.
+
+    resolution = promos.resolve(house.id)
+    resolution.discount   # Decimal, total off the TCP
+    resolution.promos     # (base promo, *stackables)
+
+The index is rebuilt when the catalog cache version changes (signals fire on
+any Promo edit) and when the date rolls over in Asia/Manila (TIME_ZONE), so
+promo start/end dates take effect at local midnight without a query per tap.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from decimal import Decimal
+
+from django.utils import timezone
+
+from . import caching
+from .models import Promo
+
+
+Resolution = namedtuple('Resolution', 'discount promos')
+NO_PROMO = Resolution(Decimal(0), ())
+
+
+def rank(promo):
+    """Sort key: the first promo in sorted(..., key=rank) is the one that wins."""
+    return (-promo.priority, -promo.discount_amount, -promo.start_date.toordinal(), promo.id)
+
+
+def describe(resolution):
+    """'Feb-IBIG Month + Raffle Bonus' for display (empty if there's no promo)."""
+    return ' + '.join(promo.name for promo in resolution.promos)
+
+
+class PromoIndex:
+    def __init__(self, promos, links, today):
+        by_id = {promo.id: promo for promo in promos}
+        intervals = {}
+        for promo_id, house_id in links:
+            promo = by_id.get(promo_id)
+            if promo is not None:
+                intervals.setdefault(house_id, []).append((promo.start_date, promo.end_date, promo))
+
+        self.intervals = {}   # house id -> [(start, end, promo), ...] sorted by start
+        self.starts = {}      # house id -> [start, ...] for bisecting
+        for house_id, rows in intervals.items():
+            rows.sort(key=lambda row: (row[0], row[2].id))
+            self.intervals[house_id] = rows
+            self.starts[house_id] = [row[0] for row in rows]
+        self.today = today
+        self._resolved = {}   # (house id, day) -> Resolution
+
+    def active(self, house_id, day):
+        rows = self.intervals.get(house_id)
+        if not rows:
+            return []
+        started = bisect_right(self.starts[house_id], day)
+        return [promo for start, end, promo in rows[:started] if end >= day]
+
+    def resolve(self, house_id, day):
+        key = (house_id, day)
+        resolution = self._resolved.get(key)
+        if resolution is None:
+            resolution = self._resolved[key] = self._resolve(house_id, day)
+        return resolution
+
+    def _resolve(self, house_id, day):
+        active = sorted(self.active(house_id, day), key=rank)
+        if not active:
+            return NO_PROMO
+        base = [promo for promo in active if not promo.stackable][:1]
+        stacked = [promo for promo in active if promo.stackable]
+        chosen = tuple(base + stacked)
+        return Resolution(sum((promo.discount_amount for promo in chosen), Decimal(0)), chosen)
+
+
+def build_index(today=None):
+    today = today or timezone.localdate()
+    promos = list(Promo.objects.filter(is_active=True, end_date__gte=today))
+    links = Promo.applicable_houses.through.objects.filter(
+        promo_id__in=[promo.id for promo in promos]
+    ).values_list('promo_id', 'housemodel_id')
+    return PromoIndex(promos, links, today)
+
+
+_index = None   # ((catalog version, local date), PromoIndex)
+
+
+def get_index():
+    global _index
+    stamp = (caching.version(caching.CATALOG), timezone.localdate())
+    if _index is None or _index[0] != stamp:
+        _index = (stamp, build_index(stamp[1]))
+    return _index[1]
+
+
+def resolve(house_id, day=None):
+    index = get_index()
+    return index.resolve(house_id, day or index.today)
+
+
+def clear():
+    global _index
+    _index = None
@@ -0,0 +1,114 @@
+"""
+Lead retention: old drive-by leads move out of the hot Lead table.
+
+Every first message used to create a Lead, so the table (and every index the
+webhook touches) is mostly COLD inquirers who never left a phone number.
+`manage.py archive_leads --days 90` moves leads that
+
+  - have no phone number,
+  - aren't HOT, and
+  - haven't done anything for N days (updated_at, not created_at, so an old
+    lead who came back last week stays)
+
+into LeadArchive rows (or .jsonl.gz files with --directory), batch by batch.
+Each batch is one transaction: the rows are locked, written to the archive
+and deleted together, so the command can be stopped at any point and run
+again; it just continues with whatever is still archivable.
+
+Afterwards the table is vacuumed/analyzed and the space before/after is
+reported. That's a plain VACUUM on Postgres, which runs alongside the webhook's
+writes and makes the freed pages reusable; it never rewrites the table.
+Handing the space back to the OS (VACUUM FULL, pg_repack, SQLite's VACUUM)
+locks the Lead table for the whole rewrite, so that's left to an operator in
+a maintenance window.
+"""
+import gzip
+import json
+import os
+import zlib
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Lead, LeadArchive
+
+
+DEFAULT_DAYS = 90
+BATCH_SIZE = 1000
+
+Batch = namedtuple('Batch', 'count first_id last_id raw_bytes compressed_bytes')
+
+
+def archivable(days, now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return (Lead.objects
+            .filter(Q(phone_number__isnull=True) | Q(phone_number=''), updated_at__lt=cutoff)
+            .exclude(status='HOT'))
+
+
+def encode(rows):
+    """Lead dicts -> JSON lines (bytes)."""
+    return '\n'.join(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) for row in rows).encode('utf-8')
+
+
+def decode(data):
+    """LeadArchive.data -> lead dicts."""
+    return [json.loads(line) for line in zlib.decompress(bytes(data)).decode('utf-8').splitlines()]
+
+
+def archive_batch(days, batch_size=BATCH_SIZE, directory=None):
+    """Archives and deletes one batch (oldest ids first). Returns a Batch, or None when nothing is left."""
+    with transaction.atomic():
+        rows = list(archivable(days).order_by('id').select_for_update().values()[:batch_size])
+        if not rows:
+            return None
+        first_id, last_id = rows[0]['id'], rows[-1]['id']
+        raw = encode(rows)
+
+        if directory:
+            # Same id range -> same file name, so a re-run after a crash overwrites instead of duplicating
+            path = os.path.join(directory, f"leads-{first_id:010d}-{last_id:010d}.jsonl.gz")
+            with gzip.open(path, 'wb', compresslevel=9) as archive:
+                archive.write(raw)
+            compressed = os.path.getsize(path)
+        else:
+            data = zlib.compress(raw, 9)
+            LeadArchive.objects.create(first_lead_id=first_id, last_lead_id=last_id, lead_count=len(rows),
+                                       raw_bytes=len(raw), data=data)
+            compressed = len(data)
+
+        Lead.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return Batch(len(rows), first_id, last_id, len(raw), compressed)
+
+
+# --- SPACE ---
+
+def table_bytes():
+    """Bytes used by the Lead table and its indexes (Postgres) or by the whole database file (SQLite)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_total_relation_size(%s)", [Lead._meta.db_table])
+            return cursor.fetchone()[0]
+        if connection.vendor == 'sqlite':
+            cursor.execute("PRAGMA page_size")
+            page_size = cursor.fetchone()[0]
+            cursor.execute("PRAGMA page_count")
+            pages = cursor.fetchone()[0]
+            cursor.execute("PRAGMA freelist_count")
+            free = cursor.fetchone()[0]
+            return (pages - free) * page_size
+    return None
+
+
+def compact():
+    """VACUUM (ANALYZE) on Postgres, ANALYZE on SQLite. Neither blocks the webhook's writes."""
+    table = connection.ops.quote_name(Lead._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"VACUUM (ANALYZE) {table}")
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f"ANALYZE {table}")
@@ -0,0 +1,141 @@
+"""
+The central router: which handler runs for which webhook event.
+
+    dispatch(data)                      -- one verified webhook body, entry by entry
+    ENTRY_HANDLERS                      -- entry['changes'] etc. -> handler
+    FUNNEL                              -- messaging events -> funnel handler, by step/payload
+
+Handlers are referenced as lazy('module.function') (see handlers/__init__.py),
+so nothing in bot_engine/handlers is imported until an event needs it.
+"""
+import logging
+import re
+
+from . import leads, messenger, metrics, outbound, profiling
+from .flow import ALWAYS, POSTBACK, QUICK_REPLY, TEXT, Turn, compile_flow
+from .handlers import lazy
+
+
+logger = logging.getLogger(__name__)
+
+# Routing words for typed messages (the handlers themselves load lazily)
+MONTHLY_TRIGGERS = ('a month', 'monthly', 'per month', '/mo', 'kada buwan', 'buwan-buwan')
+# A term only counts next to a number: a bare 'taon' is inside everyday words like 'pagkakataon'
+WHAT_IF_TRIGGERS = ('%', re.compile(r'\d\s*(?:years?|yrs?|taon)\b'))
+
+# --- THE FUNNEL ---
+# Adding a step = adding a route here. compile_flow() builds the dispatch table once at import.
+
+FUNNEL = compile_flow([
+    # THE GLOBAL RESET (Overrides everything else, even HOT/WARM leads)
+    {'step': ALWAYS, 'on': POSTBACK, 'payload': 'GET_STARTED', 'handler': lazy('funnel.greet_and_ask_budget'), 'status': 'COLD', 'next_step': 'ASKED_BUDGET'},
+    {'step': ALWAYS, 'on': POSTBACK, 'payload': 'START_CHATTING', 'handler': lazy('funnel.greet_and_ask_budget'), 'status': 'COLD', 'next_step': 'ASKED_BUDGET'},
+
+    # QUICK REPLIES (Financing & Funnel)
+    {'on': QUICK_REPLY, 'payload': 'CALC_BANK_<int:house_id>', 'handler': lazy('computations.calc_bank')},
+    {'on': QUICK_REPLY, 'payload': 'CALC_PAGIBIG_<int:house_id>', 'handler': lazy('computations.calc_pagibig')},
+    {'on': QUICK_REPLY, 'payload': 'CALC_CASH_<int:house_id>', 'handler': lazy('computations.calc_cash'), 'status': 'HOT'}, # Cash buyers are hot
+    {'on': QUICK_REPLY, 'payload': 'BUDGET_<bucket>', 'handler': lazy('funnel.capture_budget'), 'next_step': 'ASKED_FINANCING'}, # Skip location entirely
+    {'on': QUICK_REPLY, 'payload': 'FIN_<plan>', 'handler': lazy('funnel.capture_financing'), 'next_step': 'ASKED_TIMELINE'},
+    {'on': QUICK_REPLY, 'payload': 'TIME_<timeline>', 'handler': lazy('funnel.capture_timeline'), 'next_step': 'COMPLETED'},
+
+    # Typed text while we're waiting for a button
+    {'step': 'ASKED_BUDGET', 'on': TEXT, 'handler': lazy('funnel.reprompt_budget')},
+    {'step': 'ASKED_FINANCING', 'on': TEXT, 'handler': lazy('funnel.reprompt_financing')},
+    {'step': 'ASKED_TIMELINE', 'on': TEXT, 'handler': lazy('funnel.reprompt_timeline')},
+
+    # INITIAL TRIGGERS
+    {'on': TEXT, 'keywords': ('start', 'hello', 'hi'), 'handler': lazy('funnel.greet'), 'next_step': 'ASKED_BUDGET'},
+    {'on': TEXT, 'contains': MONTHLY_TRIGGERS, 'handler': lazy('computations.afford_monthly')},
+    {'on': TEXT, 'contains': WHAT_IF_TRIGGERS, 'handler': lazy('computations.what_if_quote')},
+    {'on': TEXT, 'contains': ('house',), 'handler': lazy('funnel.show_models')},
+    {'on': TEXT, 'handler': lazy('media.media_or_gemini')},
+
+    # POSTBACKS (Carousel buttons & persistent menu)
+    {'on': POSTBACK, 'payload': 'COMPUTE_<int:house_id>', 'handler': lazy('computations.choose_financing')},
+    {'on': POSTBACK, 'payload': 'VIEW_MODELS', 'handler': lazy('funnel.show_models')},
+    {'on': POSTBACK, 'payload': 'MORE_MODELS_<cursor>', 'handler': lazy('funnel.more_models')},
+    {'on': POSTBACK, 'payload': 'TALK_TO_AGENT', 'handler': lazy('agent.talk_to_agent'), 'status': 'WARM'},
+    {'on': POSTBACK, 'payload': 'RESERVE_<int:house_id>', 'handler': lazy('agent.reserve'), 'status': 'HOT', 'next_step': 'ASKED_PHONE'},
+    {'on': POSTBACK, 'payload': 'SCHEDULE_TRIPPING_<int:house_id>', 'handler': lazy('agent.schedule_tripping'), 'status': 'WARM', 'next_step': 'ASKED_PHONE'},
+    {'on': POSTBACK, 'payload': 'CHAT_WITH_AGENT', 'handler': lazy('agent.chat_with_agent'), 'status': 'WARM'},
+], guard=lazy('agent.hot_lead_guard'))
+
+ENTRY_HANDLERS = (
+    # Comments are only queued here; replies go out from the comment worker (see comments.py)
+    ('changes', lazy('comments.handle_changes')),
+)
+
+
+def build_turn(sender_id, lead, messaging_event, persist=None):
+    """Pulls the text/payloads out of a messaging event."""
+    safe_msg_obj = messaging_event.get('message') or {}
+    qr_payload = safe_msg_obj.get('quick_reply', {}).get('payload')
+    postback_payload = messaging_event.get('postback', {}).get('payload')
+
+    if qr_payload:
+        source = QUICK_REPLY
+    elif 'message' in messaging_event:
+        source = TEXT
+    elif postback_payload:
+        source = POSTBACK
+    else:
+        source = None # read receipts, deliveries, etc.
+
+    return Turn(
+        sender_id, lead, source=source,
+        text=safe_msg_obj.get('text', '').strip(),
+        qr_payload=qr_payload,
+        postback_payload=postback_payload,
+        persist=persist,
+    )
+
+def handle_messaging_event(sender_id, messaging_event):
+    """Runs one message/postback through the funnel. Returns the route name (for metrics)."""
+    user_msg_obj = messaging_event.get('message')
+
+    if user_msg_obj and 'attachments' in user_msg_obj:
+        messenger.send_fb_message(sender_id, "Pasensya na, text and buttons lang muna ang kaya kong basahin. Please type your message or click an option. 😊")
+        return 'attachment'
+
+    # 1. LOAD THE LEAD (no row yet for drive-bys: it's only INSERTed on a funnel action, see leads.py)
+    lead = leads.load(sender_id)
+    turn = build_turn(sender_id, lead, messaging_event, persist=leads.persist)
+
+    # 2. FETCH NAME IF MISSING (Fixes "Hi there" and "Name: None")
+    if not lead.full_name:
+        try:
+            profile = messenger.get_user_profile(sender_id)
+            if 'first_name' in profile:
+                turn.update(full_name=f"{profile['first_name']} {profile.get('last_name', '')}")
+        except Exception as e:
+            logger.error(f"Failed to fetch Meta profile for PSID {sender_id}. Error: {e}")
+
+    # 3. HAND THE EVENT TO THE FUNNEL (saves the lead at the end of the turn)
+    FUNNEL.dispatch(turn)
+    turn.save()
+    return turn.route_name
+
+def handle_messaging(events):
+    for messaging_event in events:
+        sender_id = messaging_event['sender']['id']
+        if messaging_event.get('message', {}).get('is_echo'): continue
+
+        with metrics.trace('messaging') as span, profiling.profiled(sender_id, span):
+            try:
+                span.route = handle_messaging_event(sender_id, messaging_event)
+            except outbound.CircuitOpenError as e:
+                # Graph is down: drop this reply but keep processing the batch
+                span.route = 'circuit_open'
+                logger.warning(f"Skipped reply to {sender_id}: {e}")
+
+def dispatch(data):
+    """Hands every entry of a verified page webhook body to its handlers."""
+    for entry in data.get('entry', []):
+        for key, handler in ENTRY_HANDLERS:
+            if key in entry:
+                handler(entry[key])
+
+        # Messages & postbacks: the hot path, handled right here
+        if 'messaging' in entry:
+            handle_messaging(entry['messaging'])
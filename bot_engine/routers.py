@@ -0,0 +1,86 @@
+"""
+Read/write split: admin lists, searches and reports read from the replica.
+
+The webhook is latency-sensitive and shares the primary with Jeric's admin
+(a Lead changelist search is a LIKE '%...%' scan). Reads are sent to the
+`replica` alias only inside a replica context:
+
+    with routers.reading_replica():
+        rows = list(GeminiUsage.objects.filter(day__gte=start))
+
+ReplicaMiddleware opens one for every GET of an admin changelist, so lists,
+filters, searches and the report totals on top of them never touch the
+primary. Everything else (the webhook, workers, admin edit pages and every
+write) stays on `default`. Only bot_engine models go to the replica: the
+admin's own reads in the same response (request.user, the session, content
+types, the admin log) stay on the primary, so replica lag can't log Jeric out.
+
+Without DATABASE_REPLICA_URL there is no `replica` alias and every read goes
+to `default`; in tests it's defined as a mirror of `default`, so the routing
+is still exercised. Replication lag means a changelist can be a second or so
+behind an edit.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.urls import Resolver404, resolve
+
+
+REPLICA = 'replica'
+REPLICA_APPS = {'bot_engine'}
+ADMIN_PREFIX = '/admin/'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def reading_replica():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label in REPLICA_APPS and REPLICA in settings.DATABASES:
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """Serves admin changelist GETs (list, filters, search, totals) from the replica."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # The whole response, not just the view: changelist rows are only queried while the template renders
+        if request.method == 'GET' and is_changelist(request.path_info):
+            with reading_replica():
+                return self.get_response(request)
+        return self.get_response(request)
+
+
+def is_changelist(path):
+    # Cheap prefix test first: the webhook and /metrics never pay for a resolve()
+    if not path.startswith(ADMIN_PREFIX):
+        return False
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return False
+    return match.namespace == 'admin' and (match.url_name or '').endswith('_changelist')
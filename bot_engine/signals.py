@@ -0,0 +1,37 @@
+"""
+Keeps cached/precomputed data in sync with the admin.
+Anything derived from the catalog (houses, images, promos) or the FAQ is invalidated here.
+
+The versions are bumped on commit, not when the signal fires: the admin saves
+inside a transaction, and a worker that rebuilt an index before the edit
+committed would read the old rows and store them under the new version (and
+the in-memory indexes would then serve them until the next edit or midnight).
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching
+from .models import FaqEntry, HouseImage, HouseModel, Promo
+
+
+@receiver([post_save, post_delete], sender=HouseModel)
+@receiver([post_save, post_delete], sender=HouseImage)
+@receiver([post_save, post_delete], sender=Promo)
+@receiver(m2m_changed, sender=Promo.applicable_houses.through)
+def catalog_changed(sender, **kwargs):
+    # Saved Gemini answers may quote old prices/fees
+    invalidate_on_commit(caching.CATALOG, caching.QUOTES, caching.ANSWERS)
+
+
+@receiver([post_save, post_delete], sender=FaqEntry)
+def knowledge_changed(sender, **kwargs):
+    invalidate_on_commit(caching.KNOWLEDGE, caching.ANSWERS)
+
+
+def invalidate_on_commit(*namespaces):
+    """Bumps the namespaces once the current transaction commits (right away outside one)."""
+    def invalidate():
+        for namespace in namespaces:
+            caching.invalidate(namespace)
+    transaction.on_commit(invalidate)
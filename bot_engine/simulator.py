@@ -0,0 +1,153 @@
+"""
+Quote simulator for "what if 20% DP over 25 years?" questions.
+
+    GET /messenger/quote/?house=3&financing=PAGIBIG&dp=20&years=25
+    GET /messenger/quote/?house=3&financing=BANK&schedule=0      (numbers only, for sliders)
+    GET /messenger/quote/3/simulator/                             (Messenger webview)
+
+Quotes come from the memoized calculator in financing.py and the house data
+from the catalog index, so a warm request does no queries. Finished JSON
+bodies are cached in the QUOTES namespace, which is dropped on any
+house/promo change. Gemini is never involved.
+"""
+import json
+from decimal import Decimal
+
+from decouple import config
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_GET
+
+from . import caching, catalog, financing
+
+
+PLANS = {
+    # plan -> (house DP % field, house rate field, default term)
+    'BANK': ('downpayment_percent', 'bank_interest_rate', 15),
+    'PAGIBIG': ('pagibig_downpayment_percent', 'interest_rate', 30),
+}
+MAX_YEARS = 30
+MAX_DP_PERCENT = Decimal(90)
+PUBLIC_BASE_URL = config('PUBLIC_BASE_URL', default='')
+
+
+def parse_params(params):
+    """Query params -> (house_id, plan, dp_percent or None, years or None, with_schedule). Raises ValueError."""
+    try:
+        house_id = int(params['house'])
+    except (KeyError, ValueError):
+        raise ValueError("'house' must be a house id")
+
+    plan = params.get('financing', 'BANK').upper()
+    if plan not in PLANS:
+        raise ValueError(f"'financing' must be one of {', '.join(PLANS)}")
+
+    dp_percent = None
+    if params.get('dp'):
+        try:
+            dp_percent = Decimal(params['dp'])
+        except ArithmeticError:
+            raise ValueError("'dp' must be a number")
+        if not dp_percent.is_finite() or not 0 <= dp_percent <= MAX_DP_PERCENT:
+            raise ValueError(f"'dp' must be between 0 and {MAX_DP_PERCENT}")
+        dp_percent = dp_percent.quantize(Decimal('0.01'))
+
+    years = None
+    if params.get('years'):
+        try:
+            years = int(params['years'])
+        except ValueError:
+            years = 0
+        if not 1 <= years <= MAX_YEARS:
+            raise ValueError(f"'years' must be between 1 and {MAX_YEARS}")
+
+    return house_id, plan, dp_percent, years, params.get('schedule', '1') != '0'
+
+
+def simulate(house_id, plan, dp_percent=None, years=None):
+    """The what-if quote for an active house (None if there's no such house)."""
+    index = catalog.get_index()
+    house = index.houses.get(house_id)
+    if house is None:
+        return None
+    dp_field, rate_field, default_years = PLANS[plan]
+    return financing.custom_quote(
+        plan, house.total_contract_price, index.discounts[house_id],
+        dp_percent if dp_percent is not None else getattr(house, dp_field),
+        getattr(house, rate_field), years or default_years, house.reservation_fee,
+    )
+
+
+def _centavos(value):
+    return value / 100
+
+
+def quote_body(house_id, plan, dp_percent, years, with_schedule):
+    quote = simulate(house_id, plan, dp_percent, years)
+    if quote is None:
+        return None
+    body = {
+        'house': {'id': house_id, 'name': catalog.get_index().houses[house_id].name},
+        'financing': plan,
+        'years': quote.years,
+        'rate': float(quote.rate),
+        'gross_tcp': float(quote.gross_tcp),
+        'discount': float(quote.discount),
+        'net_tcp': float(quote.net_tcp),
+        'dp_percent': float(quote.dp_percent),
+        'total_dp': float(quote.total_dp),
+        'reservation_fee': float(quote.reservation_fee),
+        'dp_months': quote.dp_months,
+        'monthly_dp': float(quote.monthly_dp),
+        'loan_amount': float(quote.loan_amount),
+        'monthly': float(quote.monthly),
+    }
+    schedule = financing.amortization_schedule(quote.loan_amount, quote.rate, quote.years)
+    body['total_interest'] = _centavos(sum(row[2] for row in schedule))
+    if with_schedule:
+        body['schedule'] = [
+            [month, _centavos(payment), _centavos(interest), _centavos(principal), _centavos(balance)]
+            for month, payment, interest, principal, balance in schedule
+        ]
+    return json.dumps(body, separators=(',', ':')).encode('utf-8')
+
+
+@require_GET
+def quote_api(request):
+    try:
+        params = parse_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    key = 'sim:' + ':'.join(str(part) for part in params)
+    body = caching.get(caching.QUOTES, key)
+    if body is None:
+        body = quote_body(*params)
+        if body is None:
+            return JsonResponse({'error': "House not found"}, status=404)
+        caching.set(caching.QUOTES, key, body)
+
+    response = HttpResponse(body, content_type='application/json')
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+@require_GET
+def quote_webview(request, house_id):
+    house = catalog.get_index().houses.get(house_id)
+    if house is None:
+        return HttpResponse("House not found", status=404)
+    plan = request.GET.get('financing', 'BANK').upper()
+    return render(request, 'bot_engine/quote_simulator.html', {
+        'house': house,
+        'financing': plan if plan in PLANS else 'BANK',
+        'max_years': MAX_YEARS,
+    })
+
+
+def simulator_url(house_id, plan=None):
+    """Absolute webview URL for buttons ('' when PUBLIC_BASE_URL isn't set)."""
+    if not PUBLIC_BASE_URL:
+        return ''
+    url = f"{PUBLIC_BASE_URL.rstrip('/')}/messenger/quote/{house_id}/simulator/"
+    return f"{url}?financing={plan}" if plan else url
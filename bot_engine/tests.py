@@ -1,3 +1,1075 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from .flow import ALWAYS, ANY_STEP, POSTBACK, QUICK_REPLY, TEXT, Turn, compile_flow
+from .models import HouseModel, Lead
+
+
+def make_turn(source, step='START', status='COLD', text='', payload=None):
+    lead = Lead(psid='123', current_step=step, status=status, full_name='Juan Dela Cruz')
+    return Turn(
+        '123', lead, source=source, text=text,
+        qr_payload=payload if source == QUICK_REPLY else None,
+        postback_payload=payload if source == POSTBACK else None,
+    )
+
+
+class FlowCompilerTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = []
+        record = lambda name: (lambda turn, **kw: self.calls.append((name, kw)))
+        self.flow = compile_flow([
+            {'step': ALWAYS, 'on': POSTBACK, 'payload': 'GET_STARTED', 'handler': record('reset'), 'next_step': 'ASKED_BUDGET'},
+            {'on': QUICK_REPLY, 'payload': 'CALC_BANK_<int:house_id>', 'handler': record('bank')},
+            {'on': QUICK_REPLY, 'payload': 'BUDGET_<bucket>', 'handler': record('budget'), 'next_step': 'ASKED_FINANCING'},
+            {'step': 'ASKED_BUDGET', 'on': TEXT, 'handler': record('reprompt')},
+            {'on': TEXT, 'keywords': ('hi',), 'handler': record('greet')},
+            {'on': TEXT, 'contains': ('house',), 'handler': record('models')},
+            {'on': TEXT, 'handler': record('fallback')},
+        ], guard=lambda turn: turn.lead.status == 'HOT')
+
+    def resolve(self, turn):
+        route, kwargs = self.flow.resolve(turn)
+        if route is None:
+            return None
+        route.handler(turn, **kwargs)
+        return self.calls[-1]
+
+    def test_payload_arguments_are_parsed(self):
+        self.assertEqual(self.resolve(make_turn(QUICK_REPLY, payload='CALC_BANK_7')), ('bank', {'house_id': 7}))
+        self.assertEqual(self.resolve(make_turn(QUICK_REPLY, payload='BUDGET_2_3')), ('budget', {'bucket': '2_3'}))
+
+    def test_malformed_or_unknown_payload_is_ignored(self):
+        self.assertIsNone(self.resolve(make_turn(QUICK_REPLY, payload='CALC_BANK_abc')))
+        self.assertIsNone(self.resolve(make_turn(QUICK_REPLY, payload='SOMETHING_ELSE')))
+
+    def test_step_routes_win_over_any_step(self):
+        self.assertEqual(self.resolve(make_turn(TEXT, step='ASKED_BUDGET', text='hi')), ('reprompt', {}))
+        self.assertEqual(self.resolve(make_turn(TEXT, text='hi')), ('greet', {}))
+        self.assertEqual(self.resolve(make_turn(TEXT, text='may house ba kayo')), ('models', {}))
+        self.assertEqual(self.resolve(make_turn(TEXT, text='magkano')), ('fallback', {}))
+
+    def test_dispatch_applies_transition_and_guard(self):
+        turn = make_turn(QUICK_REPLY, payload='BUDGET_3_4')
+        with mock.patch.object(Lead, 'save') as save:
+            self.flow.dispatch(turn)
+        self.assertEqual(turn.lead.current_step, 'ASKED_FINANCING')
+        save.assert_called_once()
+
+        # HOT leads are swallowed by the guard, but the global reset still runs
+        self.calls.clear()
+        self.flow.dispatch(make_turn(QUICK_REPLY, status='HOT', payload='BUDGET_3_4'))
+        self.assertEqual(self.calls, [])
+        with mock.patch.object(Lead, 'save'):
+            self.flow.dispatch(make_turn(POSTBACK, status='HOT', payload='GET_STARTED'))
+        self.assertEqual(self.calls, [('reset', {})])
+
+    def test_duplicate_routes_are_rejected(self):
+        with self.assertRaises(ValueError):
+            compile_flow([
+                {'step': ANY_STEP, 'on': POSTBACK, 'payload': 'VIEW_MODELS', 'handler': print},
+                {'step': ANY_STEP, 'on': POSTBACK, 'payload': 'VIEW_MODELS', 'handler': print},
+            ])
+
+
+class FunnelTests(TestCase):
+    """Runs the real FUNNEL with the Graph senders patched out."""
+
+    def setUp(self):
+        self.house = HouseModel.objects.create(
+            name='Calista Mid', description='2BR', image_url='https://example.com/a.jpg',
+            details_link='https://example.com', total_contract_price='2500000.00',
+        )
+        self.lead = Lead.objects.create(psid='123', full_name='Juan Dela Cruz')
+
+    def dispatch(self, source, text='', payload=None):
+        from . import messenger, router
+        turn = Turn('123', self.lead, source=source, text=text,
+                    qr_payload=payload if source == QUICK_REPLY else None,
+                    postback_payload=payload if source == POSTBACK else None)
+        with mock.patch.object(messenger, 'send_payload') as send, \
+             mock.patch.object(messenger, 'send_fb_message') as msg:
+            router.FUNNEL.dispatch(turn)
+        self.lead.refresh_from_db()
+        return send, msg
+
+    def test_budget_to_financing(self):
+        self.lead.current_step = 'ASKED_BUDGET'
+        self.lead.save()
+        send, _ = self.dispatch(QUICK_REPLY, text='3M-4M', payload='BUDGET_3_4')
+        self.assertEqual(self.lead.current_step, 'ASKED_FINANCING')
+        self.assertEqual(self.lead.budget_range, '3M-4M')
+        self.assertIn(b'FIN_PAGIBIG', send.call_args.args[0])
+
+    def test_reserve_marks_lead_hot(self):
+        _, msg = self.dispatch(POSTBACK, payload=f'RESERVE_{self.house.id}')
+        self.assertEqual((self.lead.status, self.lead.current_step), ('HOT', 'ASKED_PHONE'))
+        self.assertEqual(self.lead.interested_house, self.house)
+        msg.assert_called_once()
+
+
+class BenchHarnessTests(TestCase):
+    def test_signed_payloads_pass_the_gatekeeper(self):
+        from .bench import BENCH_APP_SECRET, sign_payload
+        from .messenger import verify_meta_signature
+
+        raw = b'{"object": "page", "entry": []}'
+        with mock.patch.dict('os.environ', {'META_APP_SECRET': BENCH_APP_SECRET}):
+            self.assertTrue(verify_meta_signature(raw, sign_payload(raw)))
+            self.assertFalse(verify_meta_signature(raw, sign_payload(raw, 'wrong-secret')))
+
+    def test_small_run_reports_every_route(self):
+        from .bench import run_benchmark
+
+        report = run_benchmark(events=40, warmup=0, psid_pool=5)
+        self.assertEqual(report['overall']['count'], 40)
+        self.assertEqual(report['overall']['errors'], 0)
+        for stats in report['routes'].values():
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+            self.assertIn('queries_per_event', stats)
+
+
+class MetricsTests(TestCase):
+    def test_trace_counts_queries_and_outbound_calls(self):
+        from . import metrics
+
+        with self.assertLogs('bot_engine.metrics', 'INFO') as logs:
+            with metrics.trace('messaging') as span:
+                span.route = 'unit_test'
+                list(Lead.objects.all())
+                metrics.record_outbound('graph', 0.02, 200)
+        self.assertEqual((span.db_queries, len(span.outbound)), (1, 1))
+        self.assertIn('"route": "unit_test"', logs.output[0])
+
+        self.assertEqual(self.client.get('/metrics').status_code, 404)   # no token configured
+        with mock.patch.object(metrics, 'METRICS_TOKEN', 'scrape'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+        self.assertIn('bot_event_seconds_count{kind="messaging",route="unit_test"}', body)
+        self.assertIn('bot_outbound_seconds_bucket{service="graph",status="200",le="0.025"}', body)
+
+
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_trips_after_threshold_and_probes_once(self):
+        from .breakers import CLOSED, OPEN, CircuitBreaker
+
+        breaker = CircuitBreaker('unit', failure_threshold=2, slow_call_seconds=1.0, reset_timeout=30)
+        breaker.record(0.1, ok=False)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record(5.0)  # too slow counts as a failure
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+
+        with mock.patch('bot_engine.breakers.time.time', return_value=time.time() + 31):
+            self.assertTrue(breaker.allow())     # the half-open probe
+            self.assertFalse(breaker.allow())    # everyone else keeps failing fast
+            breaker.record(0.1)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_only_the_probe_closes_an_open_breaker(self):
+        from .breakers import CLOSED, OPEN, CircuitBreaker
+
+        breaker = CircuitBreaker('unit', failure_threshold=1, reset_timeout=30)
+        breaker._trip()
+        breaker.record(0.1)   # a call that was in flight before it tripped
+        self.assertEqual(breaker.state, OPEN)
+        with mock.patch('bot_engine.breakers.time.time', return_value=time.time() + 31):
+            self.assertTrue(breaker.allow())
+            breaker.record(0.1)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_over_budget_question_leaves_the_probe_alone(self):
+        from . import gemini, usage
+        from .breakers import GEMINI
+        from django.core.cache import cache
+
+        GEMINI._trip()
+        with mock.patch('bot_engine.breakers.time.time', return_value=time.time() + GEMINI.reset_timeout + 1), \
+                mock.patch.object(usage, 'over_budget', return_value='global'):
+            gemini.get_gemini_response('Pwede ba aso?')
+        self.assertIsNone(cache.get(GEMINI.probe_key))
+
+    def test_gemini_open_circuit_returns_canned_reply(self):
+        from . import gemini
+        from .breakers import GEMINI
+
+        GEMINI._trip()
+        with mock.patch.object(gemini, 'gemini_model') as model:
+            self.assertEqual(gemini.get_gemini_response("pwede ba mag-alaga ng aso?"), gemini.GEMINI_FALLBACK_REPLY)
+        model.assert_not_called()
+
+    def test_telegram_failures_are_queued_and_flushed(self):
+        from . import alerts
+        from .models import QueuedAlert
+
+        with mock.patch.object(alerts, 'deliver_telegram_alert', return_value=False):
+            alerts.send_telegram_alert("🔥 HOT LEAD")
+        self.assertEqual(QueuedAlert.objects.filter(sent_at__isnull=True).count(), 1)
+
+        with mock.patch.object(alerts, 'deliver_telegram_alert', return_value=True) as deliver:
+            alerts.send_telegram_alert("🙋 AGENT REQUESTED")
+        self.assertEqual(deliver.call_count, 2)
+        self.assertFalse(QueuedAlert.objects.filter(sent_at__isnull=True).exists())
+
+
+class CachingTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_get_or_compute_caches_until_invalidated(self):
+        from . import caching
+
+        compute = mock.Mock(side_effect=[['calista mid'], ['calista mid', 'unna']])
+        self.assertEqual(caching.get_or_compute(caching.CATALOG, 'names', compute), ['calista mid'])
+        self.assertEqual(caching.get_or_compute(caching.CATALOG, 'names', compute), ['calista mid'])
+        self.assertEqual(compute.call_count, 1)
+
+        # Any catalog edit in the admin bumps the namespace version once it commits
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            HouseModel.objects.create(name='Unna', description='3BR', image_url='https://example.com/u.jpg',
+                                      details_link='https://example.com', total_contract_price='3650000.00')
+            self.assertEqual(caching.get_or_compute(caching.CATALOG, 'names', compute), ['calista mid'])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(caching.get_or_compute(caching.CATALOG, 'names', compute), ['calista mid', 'unna'])
+
+    def test_waiters_reuse_the_single_flight_result(self):
+        from django.core.cache import cache
+        from . import caching
+
+        key = caching.make_key(caching.QUOTES, 'house-1')
+        cache.add(f"{key}:lock", 1)   # another worker is already computing
+        with mock.patch.object(caching.time, 'sleep', side_effect=lambda s: cache.set(key, 'quote')):
+            self.assertEqual(caching.get_or_compute(caching.QUOTES, 'house-1', mock.Mock()), 'quote')
+
+    def test_dedup_and_rate_limit(self):
+        from . import caching
+
+        self.assertTrue(caching.first_time(caching.DEDUP, 'comment-1'))
+        self.assertFalse(caching.first_time(caching.DEDUP, 'comment-1'))
+        hits = [caching.hit_rate_limit(caching.RATELIMIT, 'page', limit=2) for _ in range(3)]
+        self.assertEqual(hits, [False, False, True])
+
+
+class PayloadTemplateTests(TestCase):
+    def test_render_matches_a_fresh_json_encode(self):
+        import json
+        from .payloads import quick_reply_template, slot
+
+        template = quick_reply_template(f"Hi {slot('name')}! 👋", [("2M-3M", "BUDGET_2_3")])
+        body = json.loads(template.render('123', name='Juan "JR"'))
+        self.assertEqual(body, {
+            "recipient": {"id": "123"},
+            "message": {"text": 'Hi Juan "JR"! 👋', "quick_replies": [
+                {"content_type": "text", "title": "2M-3M", "payload": "BUDGET_2_3"}
+            ]},
+        })
+
+    def test_carousel_is_rebuilt_when_the_catalog_changes(self):
+        import json
+        from . import catalog, messenger, payloads
+        from .handlers import funnel
+        from django.core.cache import cache
+
+        cache.clear()
+        catalog.clear()
+        payloads.clear()
+        house = HouseModel.objects.create(name='Calista Mid', description='2BR', image_url='https://example.com/a.jpg',
+                                          details_link='https://example.com', total_contract_price='2500000.00')
+        with mock.patch.object(messenger, 'send_payload') as send, self.assertNumQueries(2):
+            funnel.send_house_models('1')
+            funnel.send_house_models('2')   # served from the pre-rendered template
+        self.assertEqual(json.loads(send.call_args.args[0])['recipient'], {'id': '2'})
+
+        house.name = 'Calista End'
+        with self.captureOnCommitCallbacks(execute=True):
+            house.save()
+        with mock.patch.object(messenger, 'send_payload') as send:
+            funnel.send_house_models('3')
+        self.assertIn('Calista End', send.call_args.args[0].decode())
+
+    def test_photo_request_is_one_gallery_send(self):
+        import json
+        from . import catalog, messenger, payloads
+        from .handlers import media
+        from .models import HouseImage
+        from django.core.cache import cache
+
+        cache.clear()
+        catalog.clear()
+        payloads.clear()
+        house = HouseModel.objects.create(name='Calista Mid', description='2BR', image_url='https://example.com/a.jpg',
+                                          total_contract_price='2500000.00', dressed_gallery_link='https://example.com/album')
+        for i in range(5):
+            HouseImage.objects.create(house=house, image_url=f'https://example.com/{i}.jpg', category='DRESSED')
+        HouseImage.objects.create(house=house, image_url='https://example.com/bare.jpg', category='TURNOVER')
+
+        with mock.patch.object(messenger, 'send_payload') as send, mock.patch.object(messenger, 'send_fb_message') as text:
+            media.media_or_gemini(make_turn(TEXT, text='pa send po ng pics ng calista mid'))
+        text.assert_not_called()
+        send.assert_called_once()
+        elements = json.loads(send.call_args.args[0])['message']['attachment']['payload']['elements']
+        self.assertEqual([e['image_url'] for e in elements], [f'https://example.com/{i}.jpg' for i in range(5)])
+        self.assertEqual(elements[0]['buttons'][0]['url'], 'https://example.com/album')
+
+        # Served from the catalog index and the cached template: no query at all
+        with mock.patch.object(messenger, 'send_payload') as send, self.assertNumQueries(0):
+            media.media_or_gemini(make_turn(TEXT, text='pics ng calista mid ulit'))
+        send.assert_called_once()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            HouseImage.objects.create(house=house, image_url='https://example.com/5.jpg', category='DRESSED')
+        with mock.patch.object(messenger, 'send_payload') as send:
+            media.media_or_gemini(make_turn(TEXT, text='pics ng calista mid'))
+        self.assertEqual(len(json.loads(send.call_args.args[0])['message']['attachment']['payload']['elements']), 6)
+
+
+class CatalogIndexTests(TestCase):
+    def setUp(self):
+        from . import catalog, payloads
+        from django.core.cache import cache
+        cache.clear()
+        catalog.clear()
+        payloads.clear()
+        for i in range(12):
+            HouseModel.objects.create(name=f'Model {i}', description='2BR', image_url='https://example.com/a.jpg',
+                                      details_link='https://example.com', location='Tanza' if i % 2 else 'Magalang',
+                                      total_contract_price=2_500_000 if i < 10 else 4_500_000)
+
+    def sent_payloads(self, send):
+        import json
+        return [json.loads(call.args[0])['message']['attachment']['payload']['elements'] for call in send.call_args_list]
+
+    def test_budget_narrows_the_carousel(self):
+        from . import messenger
+        from .handlers import funnel
+
+        with mock.patch.object(messenger, 'send_payload') as send:
+            funnel.send_house_models('1', budget='4M+', financing_type='CASH')
+        [elements] = self.sent_payloads(send)
+        self.assertEqual([e['title'] for e in elements], ['Model 10', 'Model 11'])
+        self.assertIn('Cash ₱', elements[0]['subtitle'])
+
+    def test_see_more_pages_past_ten_models(self):
+        from . import catalog, messenger, router
+        from .handlers import funnel
+
+        with mock.patch.object(messenger, 'send_payload') as send:
+            funnel.send_house_models('1')
+            [elements] = self.sent_payloads(send)
+            self.assertEqual(len(elements), catalog.PAGE_SIZE + 1)
+            more = elements[-1]['buttons'][0]['payload']
+            self.assertEqual(more, 'MORE_MODELS_*.*.*.9')
+
+            turn = make_turn(POSTBACK, payload=more)
+            Lead.objects.create(psid='123')
+            turn.lead = Lead.objects.get(psid='123')
+            router.FUNNEL.dispatch(turn)
+        self.assertEqual([e['title'] for e in self.sent_payloads(send)[1]], ['Model 9', 'Model 10', 'Model 11'])
+
+    def test_location_and_bad_cursor(self):
+        from . import catalog
+
+        index = catalog.get_index()
+        self.assertEqual(len(index.lookup('Tanza')), 6)
+        self.assertIsNone(catalog.resolve_location('Davao'))
+        with self.assertRaises(ValueError):
+            catalog.parse_cursor('Nowhere.*.*.0')
+
+
+class AffordabilityTests(TestCase):
+    def setUp(self):
+        from . import catalog, payloads
+        from django.core.cache import cache
+        cache.clear()
+        catalog.clear()
+        payloads.clear()
+        for name, price in [('Small', 2_000_000), ('Mid', 3_000_000), ('Big', 5_000_000)]:
+            HouseModel.objects.create(name=name, description='2BR', image_url='https://example.com/a.jpg',
+                                      details_link='https://example.com', total_contract_price=price)
+
+    def test_tables_match_the_computation_formulas(self):
+        from . import affordability
+        from decimal import Decimal
+        from .financing import monthly_amortization
+
+        table = affordability.get_tables()[('BANK', 15)]
+        self.assertEqual([row.net_tcp for row in table.by_monthly], [2_000_000, 3_000_000, 5_000_000])
+        self.assertEqual(table.by_monthly[1].monthly, monthly_amortization(Decimal(2_700_000), Decimal(8), 15))
+        self.assertEqual(len(table.in_price_range(2_500_000, 4_000_000)), 1)
+
+    def test_recommend_ranks_the_priciest_fit_first(self):
+        from . import affordability
+
+        budget = affordability.get_tables()[('BANK', 15)].by_monthly[1].monthly
+        with self.assertNumQueries(0):
+            rows = affordability.recommend(budget, 'BANK')
+        self.assertEqual([row.net_tcp for row in rows], [3_000_000, 2_000_000])
+        self.assertEqual(affordability.recommend(1000, 'BANK'), [])
+
+    def test_peso_amount_skips_small_numbers(self):
+        from .handlers.computations import parse_peso_amount
+
+        self.assertEqual(parse_peso_amount('2 kids, budget 25k a month'), 25000.0)
+        self.assertEqual(parse_peso_amount('kaya ko 18,500 monthly'), 18500.0)
+        self.assertIsNone(parse_peso_amount('mga 3 a month lang'))
+
+    def test_monthly_budget_message_gets_a_carousel(self):
+        import json
+        from . import gemini, messenger, router
+
+        lead = Lead.objects.create(psid='123', financing_type='PAGIBIG')
+        turn = make_turn(TEXT, text='Kaya ko 25k a month')
+        turn.lead = lead
+        with mock.patch.object(messenger, 'send_payload') as send, mock.patch.object(messenger, 'send_fb_message') as message, \
+                mock.patch.object(gemini, 'get_gemini_response') as gemini:
+            router.FUNNEL.dispatch(turn)
+        gemini.assert_not_called()
+        self.assertIn('₱25,000/mo (Pag-IBIG, 30 yrs)', message.call_args.args[1])
+        elements = json.loads(send.call_args.args[0])['message']['attachment']['payload']['elements']
+        self.assertEqual([e['title'] for e in elements], ['Mid', 'Small'])
+
+
+class FinancingTests(SimpleTestCase):
+    def test_quotes_are_exact_to_the_centavo(self):
+        from decimal import Decimal
+        from . import financing
+
+        quote = financing.bank_quote(Decimal('3456789.00'), Decimal('120000'), Decimal('10'), Decimal('8'), 15, Decimal('15000'))
+        self.assertEqual(quote.net_tcp, Decimal('3336789.00'))
+        self.assertEqual(quote.total_dp, Decimal('333678.90'))
+        self.assertEqual(quote.monthly_dp, Decimal('26556.58'))
+        self.assertEqual(quote.loan_amount, Decimal('3003110.10'))
+        self.assertEqual(quote.monthly, Decimal('28699.28'))
+
+        cash = financing.cash_quote(Decimal('2000000'), Decimal('0'), Decimal('8'))
+        self.assertEqual(cash.cash_price, Decimal('1840000.00'))
+
+    def test_quotes_are_memoized(self):
+        from decimal import Decimal
+        from . import financing
+
+        financing.clear()
+        args = (Decimal('2500000'), Decimal('0'), Decimal('15'), Decimal('6.25'), 30, Decimal('15000'))
+        self.assertIs(financing.pagibig_quote(*args), financing.pagibig_quote(*args))
+        self.assertEqual(financing.pagibig_quote.cache_info().hits, 1)
+
+    def test_repeat_inputs_skip_the_decimal_math(self):
+        # Timings live in `manage.py bench_financing`; here we only check the memo is what serves repeats
+        from decimal import Decimal
+        from . import financing
+
+        financing.clear()
+        args = (Decimal('3456789.00'), Decimal('120000'), Decimal('10'), Decimal('8'), 15, Decimal('15000'))
+        financing.bank_quote(*args)
+        misses = financing.monthly_amortization.cache_info().misses
+        for _ in range(3):
+            financing.bank_quote(*args)
+            financing.cash_quote(Decimal('2000000'), Decimal('0'), Decimal('8'))
+        self.assertEqual(financing.bank_quote.cache_info().hits, 3)
+        self.assertEqual(financing.cash_quote.cache_info().hits, 2)
+        self.assertEqual(financing.monthly_amortization.cache_info().misses, misses)
+
+
+class QuoteSimulatorTests(TestCase):
+    def setUp(self):
+        from . import catalog
+        from django.core.cache import cache
+        cache.clear()
+        catalog.clear()
+        self.house = HouseModel.objects.create(name='Unna', description='2BR', image_url='https://example.com/a.jpg',
+                                               details_link='https://example.com', total_contract_price='2500000.00')
+
+    def test_quote_api_returns_amortization_and_schedule(self):
+        import json
+
+        response = self.client.get('/messenger/quote/', {'house': self.house.id, 'financing': 'pagibig', 'dp': '20', 'years': '25'})
+        self.assertEqual(response.status_code, 200)
+        quote = json.loads(response.content)
+        self.assertEqual((quote['dp_percent'], quote['years'], quote['loan_amount']), (20.0, 25, 2_000_000.0))
+        self.assertEqual(len(quote['schedule']), 300)
+        self.assertEqual(quote['schedule'][0][1], quote['monthly'])
+        self.assertEqual(quote['schedule'][-1][4], 0)
+        self.assertAlmostEqual(sum(row[3] for row in quote['schedule']), 2_000_000.0, places=2)
+
+        with self.assertNumQueries(0):
+            again = self.client.get('/messenger/quote/', {'house': self.house.id, 'financing': 'pagibig', 'dp': '20', 'years': '25'})
+        self.assertEqual(again.content, response.content)
+
+    def test_quote_api_rejects_bad_input(self):
+        for params in ({}, {'house': self.house.id, 'financing': 'CASH'}, {'house': self.house.id, 'dp': '95'},
+                       {'house': self.house.id, 'years': '40'}, {'house': self.house.id, 'dp': 'nan'}):
+            self.assertEqual(self.client.get('/messenger/quote/', params).status_code, 400, params)
+        self.assertEqual(self.client.get('/messenger/quote/', {'house': 999}).status_code, 404)
+        self.assertContains(self.client.get(f'/messenger/quote/{self.house.id}/simulator/'), 'Unna')
+
+    def test_what_if_message_skips_gemini(self):
+        from . import gemini, messenger, router
+
+        lead = Lead.objects.create(psid='123')
+        turn = make_turn(TEXT, text='What if 20% DP over 25 years sa Unna?')
+        turn.lead = lead
+        with mock.patch.object(messenger, 'send_fb_message') as message, mock.patch.object(gemini, 'get_gemini_response') as gemini:
+            router.FUNNEL.dispatch(turn)
+        gemini.assert_not_called()
+        self.assertIn('DP 20%', message.call_args.args[1])
+        self.assertIn('25 years', message.call_args.args[1])
+
+    def test_everyday_taon_is_not_a_what_if(self):
+        from . import router
+
+        route, _ = router.FUNNEL.resolve(make_turn(TEXT, text='may pagkakataon po ba mag site visit?'))
+        self.assertNotEqual(route.handler.__name__, 'what_if_quote')
+        route, _ = router.FUNNEL.resolve(make_turn(TEXT, text='pano kung 20 taon ang hulog'))
+        self.assertEqual(route.handler.__name__, 'what_if_quote')
+
+
+class PromoEngineTests(TestCase):
+    def setUp(self):
+        from . import promos
+        from django.core.cache import cache
+        cache.clear()
+        promos.clear()
+        self.house = HouseModel.objects.create(name='Unna', description='2BR', image_url='https://example.com/a.jpg',
+                                               details_link='https://example.com', total_contract_price='2500000.00')
+
+    def add_promo(self, name, discount, start, end, **fields):
+        from .models import Promo
+        promo = Promo.objects.create(name=name, description=name, discount_amount=discount, start_date=start, end_date=end, **fields)
+        promo.applicable_houses.add(self.house)
+        return promo
+
+    def test_overlapping_promos_resolve_deterministically(self):
+        from datetime import timedelta
+        from decimal import Decimal
+        from django.utils import timezone
+        from . import promos
+
+        today = timezone.localdate()
+        self.add_promo('Small', 50_000, today, today)
+        self.add_promo('Big', 120_000, today - timedelta(days=3), today + timedelta(days=3))
+        self.add_promo('Pinned', 10_000, today, today, priority=5)
+        self.add_promo('Bonus', 5_000, today, today + timedelta(days=1), stackable=True)
+        self.add_promo('Next week', 300_000, today + timedelta(days=7), today + timedelta(days=9))
+
+        with self.assertNumQueries(2):
+            resolution = promos.resolve(self.house.id)
+        self.assertEqual([p.name for p in resolution.promos], ['Pinned', 'Bonus'])
+        self.assertEqual(resolution.discount, Decimal('15000'))
+        self.assertEqual(promos.describe(resolution), 'Pinned + Bonus')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(promos.resolve(self.house.id, today + timedelta(days=2)).promos[0].name, 'Big')
+            self.assertEqual(promos.resolve(self.house.id, today + timedelta(days=8)).discount, 300_000)
+            self.assertEqual(promos.resolve(self.house.id, today + timedelta(days=30)), promos.NO_PROMO)
+
+    def test_promo_changes_rebuild_the_index(self):
+        from django.utils import timezone
+        from . import promos
+
+        today = timezone.localdate()
+        self.assertEqual(promos.resolve(self.house.id), promos.NO_PROMO)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_promo('Flash Sale', 80_000, today, today)
+        self.assertEqual(promos.resolve(self.house.id).discount, 80_000)
+
+
+class CommentPipelineTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def change(self, comment_id, user_id='u1', post_id='p1', message='hm po?'):
+        return {'field': 'feed', 'value': {'item': 'comment', 'verb': 'add', 'comment_id': comment_id, 'post_id': post_id,
+                                           'from': {'id': user_id, 'name': 'Juan'}, 'message': message}}
+
+    def test_ingest_queues_one_comment_per_commenter_per_post(self):
+        from . import comments
+        from .models import QueuedComment
+
+        queued = comments.ingest([
+            self.change('c1'), self.change('c2'),                  # same person, same post
+            self.change('c3', post_id='p2'),                       # same person, another post
+            self.change('c4', user_id='u2', message='nice house'), # no trigger word
+            {'field': 'comment', 'value': {}},                     # not a feed change
+        ])
+        self.assertEqual(queued, 2)
+        self.assertEqual(sorted(QueuedComment.objects.values_list('comment_id', flat=True)), ['c1', 'c3'])
+
+    def test_private_replies_are_keyed_on_comment_id_and_rate_limited(self):
+        from . import comments
+        from .models import QueuedComment
+
+        comments.ingest([self.change('c1'), self.change('c2', user_id='u2')])
+        ok = mock.Mock(status_code=200)
+        with mock.patch.object(comments.outbound, 'post', return_value=ok) as post, \
+                mock.patch.object(comments, 'REPLIES_PER_MINUTE', 2):   # private + public = one comment's worth
+            replied, limited = comments.process_batch()
+
+        self.assertEqual((replied, limited), (1, True))
+        private = post.call_args_list[0]
+        self.assertEqual(private.kwargs['json']['recipient'], {'comment_id': 'c1'})
+        self.assertIn('/c1/comments', post.call_args_list[1].args[1])
+        second = QueuedComment.objects.get(comment_id='c2')
+        self.assertEqual((second.replied_at, second.attempts, second.claimed_until), (None, 0, None))
+        self.assertIsNotNone(QueuedComment.objects.get(comment_id='c1').replied_at)
+
+    def test_reply_window_runs_from_the_comment_time(self):
+        from . import comments
+        from .models import QueuedComment
+
+        old = self.change('c1')
+        old['value']['created_time'] = int(time.time()) - 8 * 24 * 60 * 60   # queued now, posted 8 days ago
+        comments.ingest([old])
+        with mock.patch.object(comments.outbound, 'post') as post:
+            self.assertEqual(comments.process_batch(), (0, False))
+        post.assert_not_called()
+        self.assertEqual(QueuedComment.objects.get(comment_id='c1').last_error, "Too old for a private reply")
+
+
+@mock.patch.dict('os.environ', {'GEMINI_API_KEY': 'test'})   # model is mocked; the key only has to be set
+class ConversationContextTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_gemini_sees_the_lead_and_the_previous_exchange(self):
+        from . import gemini
+
+        lead = Lead.objects.create(psid='123', full_name='Juan Dela Cruz', budget_range='3M-4M', financing_type='PAGIBIG')
+        model = mock.Mock()
+        model.generate_content.side_effect = [mock.Mock(text='Pwede po ang aso.'), mock.Mock(text='Pwede rin po.')]
+        with mock.patch.object(gemini, 'gemini_model', return_value=model):
+            gemini.get_gemini_response('Pwede ba mag-alaga ng aso?', lead)
+            gemini.get_gemini_response('Eh pusa?', lead)
+
+        contents = model.generate_content.call_args.args[0]
+        self.assertEqual([c['role'] for c in contents], ['user', 'model', 'user'])
+        self.assertEqual(contents[1]['parts'], ['Pwede po ang aso.'])
+        self.assertEqual(contents[-1]['parts'], ['[Lead: Juan Dela Cruz | budget 3M-4M | Pag-IBIG]\nEh pusa?'])
+
+    def test_history_is_token_bounded(self):
+        from . import conversation
+
+        lead = Lead(psid='456')
+        for i in range(10):
+            conversation.remember('456', 'q' * 1000, 'a' * 1000)
+        contents = conversation.build_contents('last question', lead)
+        used = sum(conversation.estimate_tokens(part) for c in contents[:-1] for part in c['parts'])
+        self.assertLessEqual(used, conversation.CONTEXT_TOKENS)
+        self.assertLessEqual(len(conversation.history('456')), conversation.MAX_TURNS)
+
+
+@mock.patch.dict('os.environ', {'GEMINI_API_KEY': 'test'})   # model is mocked; the key only has to be set
+class GeminiUsageTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def reply(self, text, tokens=(1000, 200)):
+        return mock.Mock(text=text, usage_metadata=mock.Mock(prompt_token_count=tokens[0], candidates_token_count=tokens[1]))
+
+    def test_calls_are_accounted_per_lead_per_day(self):
+        from . import gemini, usage
+        from .models import GeminiUsage
+
+        lead = Lead.objects.create(psid='123')
+        model = mock.Mock()
+        model.generate_content.side_effect = [self.reply('Opo.'), self.reply('Meron po.')]
+        with mock.patch.object(gemini, 'gemini_model', return_value=model):
+            gemini.get_gemini_response('Pwede ba aso?', lead)
+            gemini.get_gemini_response('Pwede ba pusa?', lead)
+
+        row = GeminiUsage.objects.get(psid='123')
+        self.assertEqual((row.calls, row.input_tokens, row.output_tokens), (2, 2000, 400))
+        self.assertEqual(row.cost, usage.cost(2000, 400))
+        self.assertEqual(usage.tokens_today('123'), 2400)
+
+    def test_lead_over_budget_gets_cached_or_canned_answers(self):
+        from . import gemini, usage
+        from .models import GeminiUsage
+
+        lead = Lead.objects.create(psid='123')
+        model = mock.Mock()
+        model.generate_content.return_value = self.reply('Opo, pwede ang aso.', tokens=(30000, 100))
+        with mock.patch.object(usage, 'LEAD_DAILY_TOKENS', 20000), \
+                mock.patch.object(gemini, 'gemini_model', return_value=model):
+            gemini.get_gemini_response('Pwede ba aso?', lead)
+            # Same question (different punctuation) comes from the cache, a new one gets the canned reply
+            self.assertEqual(gemini.get_gemini_response('pwede ba aso', lead), 'Opo, pwede ang aso.')
+            self.assertEqual(gemini.get_gemini_response('Pwede ba pusa?', lead), usage.BUDGET_REPLY)
+            # Other leads still get real answers
+            other = Lead.objects.create(psid='456')
+            gemini.get_gemini_response('Pwede ba pusa?', other)
+            # ...and never 123's personalized reply once they're over budget too
+            self.assertEqual(gemini.get_gemini_response('Pwede ba aso?', other), usage.BUDGET_REPLY)
+
+        self.assertEqual(model.generate_content.call_count, 2)
+        self.assertEqual(GeminiUsage.objects.get(psid='123').budget_hits, 2)
+
+
+@mock.patch.dict('os.environ', {'GEMINI_API_KEY': 'test'})   # model is mocked; the key only has to be set
+class KnowledgeBaseTests(TestCase):
+    def setUp(self):
+        from . import catalog, knowledge
+        from django.core.cache import cache
+        cache.clear()
+        catalog.clear()
+        knowledge.clear()
+        self.house = HouseModel.objects.create(
+            name='Calista End', description='2BR', image_url='https://example.com/a.jpg', details_link='https://example.com',
+            total_contract_price=2_800_000, reservation_fee=25_000, pagibig_downpayment_percent=20,
+        )
+
+    def answer(self, text, lead=None):
+        from . import gemini
+        model = mock.Mock()
+        model.generate_content.return_value = mock.Mock(text='Si Jeric na po ang mag-confirm.')
+        with mock.patch.object(gemini, 'gemini_model', return_value=model):
+            return gemini.get_gemini_response(text, lead), model
+
+    def test_faq_questions_skip_gemini(self):
+        reply, model = self.answer('Saan ang location niyo?')
+        self.assertIn('Magalang, Pampanga', reply)
+        model.generate_content.assert_not_called()
+
+    def test_house_facts_come_from_the_house_row(self):
+        reply, model = self.answer('Magkano reservation fee ng calista end?')
+        model.generate_content.assert_not_called()
+        # Not the ₱20,000 / 15% from the old hardcoded prompt
+        self.assertIn('Reservation fee ₱25,000', reply)
+        self.assertIn('Pag-IBIG: 20% DP', reply)
+
+    def test_fuzzy_questions_send_only_the_top_facts(self):
+        from . import knowledge
+
+        reply, model = self.answer('Pwede ba mag-jogging sa clubhouse at pool area?', Lead(psid='1', interested_house=self.house))
+        self.assertEqual(reply, 'Si Jeric na po ang mag-confirm.')
+        question = model.generate_content.call_args.args[0][-1]['parts'][0]
+        self.assertIn('swimming pool', question)
+        self.assertIn('Calista End', question)
+        self.assertLessEqual(question.count('\n- '), knowledge.TOP_K + 1)
+
+    def test_admin_edits_are_picked_up(self):
+        from .models import FaqEntry
+
+        FaqEntry.objects.create(question='Pet friendly ba?', keywords='pets aso pusa dog cat', answer='Opo, pet friendly!')
+        reply, model = self.answer('Pwede ba aso?')
+        self.assertEqual(reply, 'Opo, pet friendly!')
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_connection_modes(self):
+        from core.settings import database_settings
+
+        persistent = database_settings('postgres://bot:pw@db/phirst', 'persistent')
+        self.assertEqual((persistent['CONN_MAX_AGE'], persistent['CONN_HEALTH_CHECKS']), (600, True))
+        self.assertTrue(database_settings('postgres://bot:pw@db/phirst', 'pooler')['DISABLE_SERVER_SIDE_CURSORS'])
+        pooled = database_settings('postgres://bot:pw@db/phirst', 'pool')
+        self.assertEqual((pooled['CONN_MAX_AGE'], pooled['OPTIONS']['pool']['max_size']), (0, 10))
+        with self.assertRaises(ValueError):
+            database_settings('sqlite:///tmp/x.sqlite3', 'pool')
+
+    def test_sqlite_gets_wal(self):
+        from core.settings import database_settings
+
+        options = database_settings('sqlite:///tmp/x.sqlite3')['OPTIONS']
+        self.assertIn('journal_mode=WAL', options['init_command'])
+        self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+
+
+class ReadReplicaTests(TransactionTestCase):
+    # Committed rows, so the replica connection (a mirror of default in tests) can see them
+    databases = {'default', 'replica'}
+    serialized_rollback = True   # keep the seeded FAQ rows for later tests
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser('jeric', 'jeric@example.com', 'pw'))
+        Lead.objects.create(psid='123', full_name='Juan Dela Cruz', phone_number='09171234567')
+
+    def test_admin_search_reads_from_the_replica(self):
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get('/admin/bot_engine/lead/', {'q': 'dela'})
+        self.assertContains(response, 'Juan Dela Cruz')
+        self.assertGreater(len(replica.captured_queries), 0)
+        # Only the session/user lookups hit the primary, never the Lead list or search
+        self.assertFalse([q for q in primary.captured_queries if 'bot_engine_' in q['sql']])
+        self.assertFalse([q for q in replica.captured_queries if 'django_session' in q['sql'] or 'auth_user' in q['sql']])
+
+    def test_hot_leads_view_reads_from_the_replica(self):
+        Lead.objects.filter(psid='123').update(status='HOT')
+        response = self.client.get('/admin/bot_engine/lead/hot/')
+        self.assertContains(response, 'Juan Dela Cruz')
+        self.assertEqual(self.client.get('/admin/bot_engine/lead/hot/', {'after': 'nope'}).status_code, 404)
+        self.assertEqual(self.client.get('/admin/bot_engine/lead/hot/', {'after': '9' * 30 + '.1'}).status_code, 404)
+
+    def test_webhook_and_edits_stay_on_the_primary(self):
+        from . import routers
+
+        self.assertEqual(routers.ReadReplicaRouter().db_for_read(Lead), 'default')
+        with routers.reading_replica():
+            self.assertEqual(routers.ReadReplicaRouter().db_for_read(Lead), 'replica')
+            self.assertEqual(routers.ReadReplicaRouter().db_for_write(Lead), 'default')
+            # Auth/session reads in the same admin response never see replica lag
+            from django.contrib.auth.models import User
+            self.assertEqual(routers.ReadReplicaRouter().db_for_read(User), 'default')
+        self.assertFalse(routers.is_changelist('/admin/bot_engine/lead/1/change/'))
+        self.assertFalse(routers.is_changelist('/messenger/webhook/'))
+
+
+class LeadAdminSearchTests(TestCase):
+    def test_phone_formats_normalize_the_same(self):
+        from .pagination import normalize_phone
+
+        for phone in ('+63 917-123-4567', '09171234567', '639171234567', '9171234567'):
+            self.assertEqual(normalize_phone(phone), '9171234567')
+
+    def test_prefix_search_uses_the_normalized_columns(self):
+        from django.contrib.admin.sites import site
+
+        lead = Lead.objects.create(psid='123', full_name='José Dela Cruz', phone_number='+639171234567')
+        Lead.objects.create(psid='456', full_name='Maria Santos', phone_number='09181112222')
+        admin = site._registry[Lead]
+        for term in ('jose dela', 'José', '0917 123', '+63917'):
+            results, _ = admin.get_search_results(None, Lead.objects.all(), term)
+            self.assertEqual(list(results), [lead], term)
+
+    def test_keyset_pages_cover_every_hot_lead_once(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .pagination import keyset_page
+
+        now = timezone.now()
+        for i in range(7):
+            lead = Lead.objects.create(psid=str(i), status='HOT')
+            # Two leads share a timestamp so the id tiebreak matters
+            Lead.objects.filter(pk=lead.pk).update(updated_at=now - timedelta(minutes=i // 2))
+        Lead.objects.create(psid='cold')
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(Lead.objects.filter(status='HOT'), cursor, size=3)
+            seen += [lead.psid for lead in rows]
+            if cursor is None:
+                break
+        self.assertEqual(seen, ['1', '0', '3', '2', '5', '4', '6'])
+
+
+class LeadRetentionTests(TestCase):
+    def make_lead(self, psid, days_idle, **fields):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        lead = Lead.objects.create(psid=psid, **fields)
+        Lead.objects.filter(pk=lead.pk).update(updated_at=timezone.now() - timedelta(days=days_idle))
+        return lead
+
+    def test_only_idle_phoneless_leads_are_archived(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from . import retention
+        from .models import LeadArchive
+
+        for i in range(5):
+            self.make_lead(f'old{i}', 200, full_name=f'Drive By {i}')
+        self.make_lead('phone', 200, phone_number='09171234567')
+        self.make_lead('hot', 200, status='HOT')
+        self.make_lead('recent', 3)
+
+        out = StringIO()
+        call_command('archive_leads', days=90, batch_size=2, stdout=out)
+
+        self.assertEqual(set(Lead.objects.values_list('psid', flat=True)), {'phone', 'hot', 'recent'})
+        self.assertEqual(LeadArchive.objects.count(), 3)
+        archived = [row for batch in LeadArchive.objects.order_by('id') for row in retention.decode(batch.data)]
+        self.assertEqual([row['psid'] for row in archived], [f'old{i}' for i in range(5)])
+        self.assertIn('Archived 5 lead(s) in 3 batch(es)', out.getvalue())
+
+        # Resumable: a second run finds nothing left to do
+        self.assertIsNone(retention.archive_batch(90))
+
+
+class LazyLeadTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def event(self, sender, text, payload=None):
+        message = {'mid': 'm1', 'text': text}
+        if payload:
+            message['quick_reply'] = {'payload': payload}
+        return {'sender': {'id': sender}, 'recipient': {'id': 'page'}, 'message': message}
+
+    def handle(self, sender, text, payload=None):
+        from . import messenger, router
+        with mock.patch.object(messenger, 'send_payload'), mock.patch.object(messenger, 'send_fb_message'), \
+                mock.patch.object(messenger, 'get_user_profile', return_value={'first_name': 'Juan', 'last_name': 'Cruz'}) as profile:
+            router.handle_messaging_event(sender, self.event(sender, text, payload))
+        return profile
+
+    def test_drive_bys_never_touch_the_lead_table(self):
+        with self.assertNumQueries(1):   # just the lookup
+            self.handle('123', 'hi')
+        self.assertFalse(Lead.objects.exists())
+
+        # The second message still knows their name and step, without another profile fetch
+        profile = self.handle('123', 'hello')
+        profile.assert_not_called()
+
+    def test_funnel_action_creates_the_lead_with_what_we_knew(self):
+        self.handle('123', 'hi')
+        self.handle('123', '3M-4M', payload='BUDGET_3_4')
+
+        lead = Lead.objects.get(psid='123')
+        self.assertEqual((lead.full_name, lead.budget_range, lead.current_step), ('Juan Cruz', '3M-4M', 'ASKED_FINANCING'))
+
+
+class WebhookCaptureTests(TestCase):
+    def test_capture_anonymizes_and_replays(self):
+        import json
+        import tempfile
+        from . import capture
+        from .bench import EventFactory, run_replay
+
+        factory = EventFactory([1])
+        bodies = [
+            factory.body([factory.text('1234567890123456', 'call me 0917 123 4567')]),
+            factory.body(changes=[factory.comment('7000000000000001', 'hm po')]),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            writer = capture.CaptureWriter(directory, anonymized=True)
+            for body in bodies:
+                writer.put(json.dumps(body).encode('utf-8'), 'sha256=abc')
+            writer.close()
+            records = list(capture.read([directory]))
+
+            self.assertEqual(len(records), 2)
+            self.assertIsNone(records[0]['sig'])
+            text = records[0]['body'] + records[1]['body']
+            for secret in ('1234567890123456', '0917 123 4567', '7000000000000001', 'Bench Commenter'):
+                self.assertNotIn(secret, text)
+            # Stable fakes: the same sender maps to the same PSID every time
+            event = json.loads(records[0]['body'])['entry'][0]['messaging'][0]
+            self.assertEqual(event['sender']['id'], capture.fake_id('1234567890123456'))
+            self.assertRegex(event['message']['text'], r'call me 09\d{9}$')
+
+            report = run_replay(capture.read([directory]), speed=0)
+        self.assertEqual(report['overall']['count'], 2)
+        self.assertEqual(report['overall']['errors'], 0)
+        self.assertEqual(set(report['routes']), {'text', 'comment'})
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def run_profiled(self, psid, route, seconds=0.03):
+        from types import SimpleNamespace
+        from . import profiling
+
+        span = SimpleNamespace(route=None)
+        with profiling.profiled(psid, span):
+            time.sleep(seconds)
+            span.route = route
+
+    def test_route_switch_keeps_only_matching_events_and_merges(self):
+        import tempfile
+        from io import StringIO
+        from pathlib import Path
+        from django.core.management import call_command
+        from . import profiling
+
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(profiling, 'DIRECTORY', directory):
+            self.run_profiled('1', 'calc_pagibig')   # switch is off: nothing
+            call_command('profile_webhook', route=['calc_pagibig'], minutes=1, stdout=StringIO())
+            self.run_profiled('2', 'calc_pagibig')
+            self.run_profiled('3', 'greet')
+            profiling.enable(psids=['4'], mode='cprofile', minutes=1)
+            self.run_profiled('4', 'greet')
+
+            files = sorted(path.name for path in Path(directory).iterdir())
+            self.assertEqual(len(files), 2)
+            self.assertTrue(any('-calc_pagibig-' in name and name.endswith('.collapsed') for name in files))
+            self.assertTrue(any('-greet-' in name and name.endswith('.prof') for name in files))
+
+            output = Path(directory) / 'merged.collapsed'
+            call_command('merge_profiles', directory, output=str(output), stdout=StringIO(), stderr=StringIO())
+            stacks = output.read_text().splitlines()
+            self.assertTrue(any(line.startswith('run_profiled (bot_engine/tests.py') for line in stacks))
+            self.assertTrue(any('time.sleep' in line for line in stacks))
+            for line in stacks:
+                self.assertRegex(line, r' \d+$')
+
+        profiling.disable()
+        self.assertFalse(profiling.is_on(profiling.active_settings()))
+
+
+class StartupTests(SimpleTestCase):
+    # views.py used to import and configure the Gemini SDK (~1s) at import time
+
+    def test_views_import_is_cheap_and_needs_no_gemini_key(self):
+        import os
+        import subprocess
+        import sys
+        from django.conf import settings
+
+        script = ("import django, sys; django.setup(); import bot_engine.views; "
+                  "print('google.generativeai' in sys.modules, any(m.startswith('bot_engine.handlers.') for m in sys.modules))")
+        env = {key: value for key, value in os.environ.items() if key != 'GEMINI_API_KEY'}
+        env['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+        result = subprocess.run([sys.executable, '-c', script],
+                                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        # Neither the SDK nor any handler module is loaded until an event needs it
+        self.assertEqual(result.stdout.strip(), 'False False')
+
+    def test_lazy_handlers_keep_their_route_name(self):
+        from . import router
+        from .handlers import lazy
+
+        route, kwargs = router.FUNNEL.resolve(make_turn(QUICK_REPLY, payload='CALC_PAGIBIG_7'))
+        self.assertEqual((route.handler.__name__, kwargs), ('calc_pagibig', {'house_id': 7}))
+        self.assertEqual(route.handler.resolve().__module__, 'bot_engine.handlers.computations')
+        with self.assertRaises(ValueError):
+            lazy('views.messenger_webhook')
+
+    def test_clients_are_rebuilt_after_a_fork(self):
+        from . import clients
+
+        first = clients.get('unit', object)
+        self.assertIs(clients.get('unit', object), first)
+        with mock.patch('bot_engine.clients.os.getpid', return_value=-1):
+            self.assertIsNot(clients.get('unit', object), first)
+        clients.reset()
+
+    def test_missing_key_falls_back_instead_of_crashing(self):
+        from . import clients, gemini
+
+        clients.reset()
+        with mock.patch.dict('os.environ', {'GEMINI_API_KEY': ''}), \
+                mock.patch.object(gemini.knowledge, 'lookup', return_value=gemini.knowledge.Answer(None, '', None)), \
+                mock.patch.object(gemini.breakers.GEMINI, 'allow') as allow, \
+                mock.patch.object(gemini.breakers.GEMINI, 'record') as record, \
+                mock.patch.object(gemini.usage, 'over_budget', return_value=None), \
+                mock.patch.object(gemini, '_warned_missing_key', False), \
+                self.assertLogs('bot_engine.gemini', 'ERROR') as logs:
+            for _ in range(2):
+                self.assertEqual(gemini.get_gemini_response("pwede ba mag-alaga ng aso?"), gemini.GEMINI_FALLBACK_REPLY)
+        # A config problem, not an outage: the breaker never hears about it, and it's logged once
+        allow.assert_not_called()
+        record.assert_not_called()
+        self.assertEqual(len(logs.output), 1)
+        clients.reset()
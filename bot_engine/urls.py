@@ -1,6 +1,8 @@
 from django.urls import path
-from . import views
+from . import simulator, views
 
 urlpatterns = [
     path('webhook/', views.messenger_webhook, name='messenger_webhook'),
-]
\ No newline at end of file
+    path('quote/', simulator.quote_api, name='quote_api'),
+    path('quote/<int:house_id>/simulator/', simulator.quote_webview, name='quote_simulator'),
+]
@@ -0,0 +1,178 @@
+"""
+Gemini token/cost accounting and budgets.
+
+Every Gemini call is recorded with its input/output tokens (from the
+response's usage_metadata, estimated from the text when that's missing),
+latency and an estimated cost from GEMINI_*_COST_PER_M:
+
+    record(psid, response, contents, reply, elapsed)
+
+Totals go to two places:
+  - GeminiUsage rows, one per PSID per day, bumped with F() updates. This is
+    what the admin report reads.
+  - token counters in the shared cache (USAGE namespace), one per PSID per day
+    and one for the whole page per day, so the budget check before a call is
+    two cache reads instead of a SUM() query.
+
+Budgets are in tokens per local day (0 = no limit):
+
+    GEMINI_LEAD_DAILY_TOKENS   one lead chatting all day with the bot
+    GEMINI_DAILY_TOKENS        everyone together
+
+Once a budget is used up, get_gemini_response stops calling Gemini for that
+lead (or everyone) until midnight and answers from the answer cache (the same
+lead already asked this today) or with BUDGET_REPLY. Cached answers are kept
+per PSID: each reply was written with that lead's name, budget, house and chat
+history, so it's never shown to anyone else.
+"""
+import hashlib
+import logging
+import re
+from collections import namedtuple
+from decimal import Decimal
+
+from decouple import config
+from django.db import IntegrityError
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import caching, conversation, metrics
+from .models import GeminiUsage
+
+
+logger = logging.getLogger(__name__)
+
+# USD per million tokens (gemini-2.5-flash list price)
+INPUT_COST_PER_M = config('GEMINI_INPUT_COST_PER_M', default='0.30', cast=Decimal)
+OUTPUT_COST_PER_M = config('GEMINI_OUTPUT_COST_PER_M', default='2.50', cast=Decimal)
+LEAD_DAILY_TOKENS = config('GEMINI_LEAD_DAILY_TOKENS', default=20000, cast=int)
+DAILY_TOKENS = config('GEMINI_DAILY_TOKENS', default=2000000, cast=int)
+MILLION = Decimal(1000000)
+
+BUDGET_REPLY = ("Marami ka nang tanong today, salamat! 😊 Type 'house' para sa models at computations, "
+                "o click 'Ask Agent' sa menu para si Jeric na mismo ang sumagot sa'yo.")
+
+Usage = namedtuple('Usage', 'input_tokens output_tokens latency_ms cost')
+
+TOKENS_TOTAL = metrics.register(metrics.Counter('bot_gemini_tokens_total', 'Gemini tokens used', ('kind',)))
+COST_TOTAL = metrics.register(metrics.Counter('bot_gemini_cost_usd_total', 'Estimated Gemini spend in USD'))
+BUDGET_HITS = metrics.register(metrics.Counter(
+    'bot_gemini_budget_hits_total', 'Questions not sent to Gemini because a budget was used up', ('scope', 'answer'),
+))
+
+
+def cost(input_tokens, output_tokens):
+    return (input_tokens * INPUT_COST_PER_M + output_tokens * OUTPUT_COST_PER_M) / MILLION
+
+
+def _count(metadata, name):
+    value = getattr(metadata, name, 0)
+    return value if isinstance(value, int) else 0
+
+
+def measure(response, contents, reply, elapsed):
+    """Usage for one call; falls back to estimating from the text when Gemini doesn't say."""
+    metadata = getattr(response, 'usage_metadata', None)
+    input_tokens = _count(metadata, 'prompt_token_count')
+    output_tokens = _count(metadata, 'candidates_token_count')
+    if not input_tokens:
+        input_tokens = sum(conversation.estimate_tokens(part) for content in contents for part in content['parts'])
+    if not output_tokens:
+        output_tokens = conversation.estimate_tokens(reply)
+    return Usage(input_tokens, output_tokens, int(elapsed * 1000), cost(input_tokens, output_tokens))
+
+
+# --- BUDGETS ---
+
+def _day_key(psid=None):
+    day = timezone.localdate().isoformat()
+    return f"tokens:{day}:{psid}" if psid else f"tokens:{day}"
+
+
+def tokens_today(psid=None):
+    """Tokens spent today by one lead, or by everyone when psid is None."""
+    return caching.get(caching.USAGE, _day_key(psid)) or 0
+
+
+def over_budget(psid=None):
+    """'global', 'lead' or None."""
+    if DAILY_TOKENS and tokens_today() >= DAILY_TOKENS:
+        return 'global'
+    if psid and LEAD_DAILY_TOKENS and tokens_today(psid) >= LEAD_DAILY_TOKENS:
+        return 'lead'
+    return None
+
+
+# --- ANSWER CACHE ---
+
+def _question_key(psid, text):
+    normalized = ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+    return f"{psid or ''}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
+
+
+def remember_answer(psid, question, reply):
+    caching.set(caching.ANSWERS, _question_key(psid, question), reply)
+
+
+def cached_answer(psid, question):
+    return caching.get(caching.ANSWERS, _question_key(psid, question))
+
+
+def budget_reply(psid, question, scope):
+    """What to say instead of calling Gemini once a budget is used up."""
+    answer = cached_answer(psid, question)
+    BUDGET_HITS.inc(scope, 'cached' if answer else 'canned')
+    _bump(psid or '', budget_hits=F('budget_hits') + 1)
+    return answer or BUDGET_REPLY
+
+
+# --- RECORDING ---
+
+def _bump(psid, **increments):
+    """Adds to today's GeminiUsage row for psid, creating it on the first call of the day."""
+    day = timezone.localdate()
+    rows = GeminiUsage.objects.filter(psid=psid, day=day)
+    if rows.update(**increments):
+        return
+    try:
+        GeminiUsage.objects.create(psid=psid, day=day)
+    except IntegrityError:
+        pass   # another worker created it first
+    rows.update(**increments)
+
+
+def record(psid, response, contents, reply, elapsed):
+    """Accounts for one successful call. Never lets a bookkeeping error cost the user their answer."""
+    try:
+        used = measure(response, contents, reply, elapsed)
+        TOKENS_TOTAL.inc('input', amount=used.input_tokens)
+        TOKENS_TOTAL.inc('output', amount=used.output_tokens)
+        COST_TOTAL.inc(amount=float(used.cost))
+
+        tokens = used.input_tokens + used.output_tokens
+        caching.incr(caching.USAGE, _day_key(), tokens)
+        if psid:
+            caching.incr(caching.USAGE, _day_key(psid), tokens)
+        _bump(
+            psid or '', calls=F('calls') + 1,
+            input_tokens=F('input_tokens') + used.input_tokens, output_tokens=F('output_tokens') + used.output_tokens,
+            latency_ms=F('latency_ms') + used.latency_ms, cost=F('cost') + used.cost,
+        )
+        return used
+    except Exception as e:
+        logger.error(f"Could not record Gemini usage for {psid}: {e}", exc_info=True)
+        return None
+
+
+# --- REPORTING ---
+
+def totals(queryset=None):
+    """Summed calls/tokens/cost/budget hits over GeminiUsage rows (all of them by default)."""
+    queryset = GeminiUsage.objects.all() if queryset is None else queryset
+    summed = queryset.aggregate(
+        calls=Sum('calls'), input_tokens=Sum('input_tokens'), output_tokens=Sum('output_tokens'),
+        latency_ms=Sum('latency_ms'), cost=Sum('cost'), budget_hits=Sum('budget_hits'),
+    )
+    summed = {name: value or 0 for name, value in summed.items()}
+    summed['avg_latency_ms'] = summed['latency_ms'] // summed['calls'] if summed['calls'] else 0
+    return summed
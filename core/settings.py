@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from decouple import config
 import dj_database_url
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,10 +53,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'bot_engine.middleware.RequestMetricsMiddleware', # Per-request latency/query metrics (see /metrics)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'bot_engine.routers.ReplicaMiddleware', # Admin changelists read from the replica
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,12 +86,112 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# How webhook workers hold their connection (DB_CONNECTIONS):
+#   persistent    -- keep it for DB_CONN_MAX_AGE seconds, health-checked before reuse (the default)
+#   pool          -- Django's native psycopg 3 pool (Postgres only; psycopg[binary,pool] is in requirements.txt)
+#   pooler        -- behind PgBouncer/Supavisor in transaction mode: persistent, no server-side cursors
+#   per-request   -- connect on every request (Django's stock behaviour)
+# SQLite gets WAL and a few pragmas so the comment worker and the webhook don't block each other.
+# `python manage.py bench_db` compares the modes.
+
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',      # safe with WAL, skips an fsync per commit
+    'PRAGMA cache_size=-20000',       # 20 MB page cache
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=134217728',
+)
+
+def database_settings(url, mode='persistent'):
+    db = dj_database_url.parse(url)
+    postgres = 'postgresql' in db['ENGINE']
+    options = db.setdefault('OPTIONS', {})
+
+    if mode == 'pool':
+        if not postgres:
+            raise ValueError("DB_CONNECTIONS=pool needs Postgres")
+        options['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        }
+        db['CONN_MAX_AGE'] = 0   # the pool owns the connections
+    elif mode in ('persistent', 'pooler'):
+        db['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=600, cast=int)
+        db['CONN_HEALTH_CHECKS'] = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+        # Transaction-mode poolers hand each transaction to a different server connection
+        db['DISABLE_SERVER_SIDE_CURSORS'] = mode == 'pooler'
+    elif mode == 'per-request':
+        db['CONN_MAX_AGE'] = 0
+    else:
+        raise ValueError(f"Unsupported DB_CONNECTIONS mode: {mode}")
+
+    if postgres:
+        options.setdefault('connect_timeout', config('DB_CONNECT_TIMEOUT', default=5, cast=int))
+    elif 'sqlite' in db['ENGINE']:
+        options['timeout'] = config('DB_SQLITE_TIMEOUT', default=20, cast=int)   # wait on locks instead of failing
+        options['transaction_mode'] = 'IMMEDIATE'   # take the write lock up front, no upgrade deadlocks
+        if config('DB_SQLITE_WAL', default=True, cast=bool):
+            options['init_command'] = '; '.join(SQLITE_PRAGMAS)
+
+    # Lets the benchmark run against a file instead of SQLite's in-memory test database
+    test_name = config('DB_TEST_NAME', default='')
+    if test_name:
+        db['TEST'] = {'NAME': test_name}
+    return db
+
+DATABASE_URL = config('DATABASE_URL', default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
+DB_CONNECTIONS = config('DB_CONNECTIONS', default='persistent')
+
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+RUNNING_TESTS = sys.argv[1:2] == ['test']
+
 DATABASES = {
-    'default': config(
-        'DATABASE_URL',
-        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
-        cast=dj_database_url.parse
-    )
+    'default': database_settings(DATABASE_URL, DB_CONNECTIONS),
+}
+# Admin lists/searches and reports read from here (bot_engine/routers.py). Only defined when there
+# is a real replica, so we never open a second connection/pool to the primary; in tests it mirrors 'default'.
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = database_settings(DATABASE_REPLICA_URL, DB_CONNECTIONS)
+elif RUNNING_TESTS:
+    DATABASES['replica'] = database_settings(DATABASE_URL, DB_CONNECTIONS)
+if 'replica' in DATABASES:
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['bot_engine.routers.ReadReplicaRouter']
+
+
+# Cache
+# Shared by every gunicorn worker (circuit breakers, dedup, rate limits, catalog/quote caches).
+# CACHE_URL options:
+#   redis://localhost:6379/0    -- Redis or any Redis-compatible server (needs `pip install redis`)
+#   db://bot_cache              -- Postgres/SQLite table (run `python manage.py createcachetable`)
+#   file:///var/tmp/phirst      -- disk cache, no server needed (the default)
+#   locmem://                   -- per-process only, fine for tests
+# Only Redis has atomic add()/incr() across processes; single-flight, rate limits and the
+# breakers' half-open probe need that with more than one worker (see bot_engine/caching.py).
+
+def parse_cache_url(url):
+    scheme, _, location = url.partition('://')
+    backends = {
+        'redis': 'django.core.cache.backends.redis.RedisCache',
+        'rediss': 'django.core.cache.backends.redis.RedisCache',
+        'db': 'django.core.cache.backends.db.DatabaseCache',
+        'file': 'django.core.cache.backends.filebased.FileBasedCache',
+        'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+    if scheme not in backends:
+        raise ValueError(f"Unsupported CACHE_URL scheme: {scheme}")
+    return {
+        'BACKEND': backends[scheme],
+        'LOCATION': url if scheme.startswith('redis') else location,
+        'KEY_PREFIX': 'phirst',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 20000} if scheme in ('file', 'db', 'locmem') else {},
+    }
+
+CACHES = {
+    'default': parse_cache_url(config('CACHE_URL', default=f"file://{BASE_DIR / '.cache'}")),
 }
 
 
@@ -146,4 +249,12 @@ LOGGING = {
         'handlers': ['console'],
         'level': 'INFO', # Set to WARNING in strict production
     },
+    'loggers': {
+        # One JSON line per webhook event (route, DB queries, outbound calls, total ms)
+        'bot_engine.metrics': {
+            'handlers': ['console'],
+            'level': config('BOT_METRICS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
 }
\ No newline at end of file
@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
+from bot_engine.metrics import metrics_view
 
 urlpatterns = [
     # Change 'admin.site.name' to 'admin.site.urls'
     path('admin/', admin.site.urls),
     path('messenger/', include('bot_engine.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,40 @@
+"""
+gunicorn settings, picked up automatically when gunicorn runs from the project root.
+
+    gunicorn core.wsgi --preload        # or GUNICORN_PRELOAD=True
+
+With --preload the master imports Django and the whole bot once (URLconf,
+views, flow), and the forked workers share those pages instead of importing
+everything again. The SDK/HTTP clients are never built in the master (see
+bot_engine/clients.py); each worker gets its own after the fork.
+"""
+from decouple import config
+
+
+preload_app = config('GUNICORN_PRELOAD', default=False, cast=bool)
+
+
+# Cache backends whose add()/incr() are atomic across worker processes
+ATOMIC_CACHE_SCHEMES = ('redis', 'rediss')
+
+
+def when_ready(server):
+    cache_scheme = config('CACHE_URL', default='file://').partition('://')[0]
+    if server.cfg.workers > 1 and cache_scheme not in ATOMIC_CACHE_SCHEMES:
+        server.log.warning(f"{server.cfg.workers} workers share a '{cache_scheme}' cache: single-flight, rate limits "
+                           f"and circuit breaker probes are best-effort without Redis (set CACHE_URL=redis://...)")
+    if server.cfg.preload_app:
+        # Resolving the URLconf imports views.py and everything it pulls in, before the fork
+        from django.urls import get_resolver
+        get_resolver().url_patterns
+
+
+def post_fork(server, worker):
+    from bot_engine import clients
+
+    clients.reset()
+    if config('WARM_CLIENTS', default=True, cast=bool):
+        try:
+            clients.warm()
+        except Exception as e:
+            server.log.warning(f"Client warm-up failed in worker {worker.pid}, building on first use instead: {e}")